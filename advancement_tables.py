@@ -0,0 +1,198 @@
+"""
+Per-class advancement tables from advancement/*.json, compiled once.
+
+Each <class>_advancement.json file becomes an AdvancementTable: parallel
+lists of levels, XP thresholds, hit dice, base hit bonus and saving throw,
+so "what level is 12,000 XP" and "what does the next level need" are
+bisect lookups instead of linear scans. The meditation and gift tables
+(<class>_meditation_advancement.json, <class>_gift_advancement.json) are
+compiled the same way into SlotTables of slots per level.
+
+The rows come from the data snapshot (data_snapshot.py), like every other
+static dataset, and each table is compiled once per version of its
+dataset: the snapshot is checked at most every TABLES_CHECK_SECONDS, and
+only datasets it re-read are compiled again, so editing a table during a
+session takes effect within a few seconds (or, with the data watcher
+running, as soon as it is saved):
+
+    tables = get_advancement_tables()
+    pilot = tables.table("Pilot")
+    pilot.level_for_xp(12000)     # 5
+    pilot.next_level(5)["xp"]     # 20000
+    tables.slots("Star Knight", "meditation").slots(4)  # {"1st": 2, "2nd": 1, ...}
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from data_snapshot import get_data_snapshot
+from data_watcher import add_reload_hook
+
+# Configuration
+ADVANCEMENT_FOLDER = "advancement"
+TABLE_SUFFIX = "_advancement"
+SLOT_KINDS = ("meditation", "gift")
+TABLES_CHECK_SECONDS = 2.0  # How often to check the data snapshot for edited advancement files
+
+
+def class_key(char_class: str) -> str:
+    """Return the file-name key for a class name ("Star Knight" -> "star_knight")."""
+    return char_class.strip().lower().replace(" ", "_")
+
+
+class AdvancementTable:
+    """A class's levels with their XP thresholds, hit dice, base hit bonus and saving throw."""
+
+    __slots__ = ("char_class", "levels", "xp", "hd", "bhb", "st")
+
+    def __init__(self, char_class: str, rows: list):
+        rows = sorted(rows, key=lambda row: row["level"])
+        self.char_class = char_class
+        self.levels = [row["level"] for row in rows]
+        self.xp = [row["xp"] for row in rows]
+        self.hd = [str(row["hd"]) for row in rows]
+        self.bhb = [row["bhb"] for row in rows]
+        self.st = [row["st"] for row in rows]
+
+    def __len__(self):
+        return len(self.levels)
+
+    def _row(self, index: int) -> dict:
+        return {"level": self.levels[index], "xp": self.xp[index], "hd": self.hd[index],
+                "bhb": self.bhb[index], "st": self.st[index]}
+
+    def rows(self) -> list:
+        """Return every level as {"level", "xp", "hd", "bhb", "st"}, lowest first."""
+        return [self._row(index) for index in range(len(self.levels))]
+
+    def row(self, level: int) -> dict:
+        """Return one level's row, or None if the table has no such level."""
+        index = bisect_left(self.levels, level)
+        if index < len(self.levels) and self.levels[index] == level:
+            return self._row(index)
+        return None
+
+    def next_level(self, level: int) -> dict:
+        """Return the row of the first level above the given one, or None at the top of the table."""
+        index = bisect_right(self.levels, level)
+        return self._row(index) if index < len(self.levels) else None
+
+    def level_for_xp(self, xp: int) -> int:
+        """Return the highest level whose XP threshold the given XP reaches."""
+        # XP thresholds rise with level, so the XP list is sorted too
+        index = bisect_right(self.xp, xp) - 1
+        return self.levels[max(index, 0)] if self.levels else 1
+
+
+class SlotTable:
+    """Meditation or gift slots per level, by slot rank ("1st", "2nd", ...)."""
+
+    __slots__ = ("name", "levels", "ranks", "counts")
+
+    def __init__(self, name: str, rows: list):
+        rows = sorted(rows, key=lambda row: row["level"])
+        self.name = name
+        self.levels = [row["level"] for row in rows]
+        self.ranks = [key for key in rows[0] if key != "level"] if rows else []
+        self.counts = [tuple(row.get(rank, 0) for rank in self.ranks) for row in rows]
+
+    def slots(self, level: int) -> dict:
+        """Return {rank: slots} at a level (the highest listed level at or below it)."""
+        index = bisect_right(self.levels, level) - 1
+        if index < 0:
+            return {rank: 0 for rank in self.ranks}
+        return dict(zip(self.ranks, self.counts[index]))
+
+
+class AdvancementTables:
+    """Every compiled table in the snapshot's advancement datasets, recompiled per dataset when it changes."""
+
+    def __init__(self, snapshot=get_data_snapshot, folder: str = ADVANCEMENT_FOLDER):
+        """
+        Args:
+            snapshot: Returns the current DataSnapshot (default: get_data_snapshot)
+            folder: The snapshot folder holding the tables
+        """
+        self.snapshot = snapshot
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._tables = {}  # dataset name -> (dataset it was compiled from, compiled table or None)
+        self._checked = None
+        self.loads = 0
+
+    def _compile(self, name, rows):
+        stem = name[:-len(TABLE_SUFFIX)]
+        self.loads += 1
+        if not isinstance(rows, list):
+            return None  # Missing, placeholder or not a table
+        try:
+            for kind in SLOT_KINDS:
+                if stem.endswith(f"_{kind}"):
+                    return SlotTable(stem, rows)
+            return AdvancementTable(stem, rows)
+        except (KeyError, TypeError, IndexError):
+            return None
+
+    def refresh(self, force: bool = False):
+        """
+        Recompile the tables whose datasets changed in the snapshot.
+
+        The snapshot is checked at most every TABLES_CHECK_SECONDS unless
+        force is set. Tables are compiled before they are swapped in, so
+        lookups keep using the old ones meanwhile.
+        """
+        now = time.monotonic()
+        if not force and self._checked is not None and now - self._checked < TABLES_CHECK_SECONDS:
+            return
+        datasets = self.snapshot().folder(self.folder)
+        with self._lock:
+            current = dict(self._tables)
+        tables = {}
+        for name, data in datasets.items():
+            if not name.endswith(TABLE_SUFFIX):
+                continue
+            cached = current.get(name)
+            # The snapshot hands out the same object until the file changes
+            tables[name] = cached if cached and cached[0] is data else (data, self._compile(name, data))
+        with self._lock:
+            self._tables = tables
+            self._checked = now
+
+    def _get(self, stem):
+        self.refresh()
+        with self._lock:
+            entry = self._tables.get(f"{stem}{TABLE_SUFFIX}")
+        return entry[1] if entry else None
+
+    def table(self, char_class: str) -> AdvancementTable:
+        """Return a class's advancement table, or None if there is no table for it."""
+        table = self._get(class_key(char_class))
+        return table if isinstance(table, AdvancementTable) else None
+
+    def slots(self, char_class: str, kind: str) -> SlotTable:
+        """Return a class's meditation or gift table, or None if the class has none."""
+        table = self._get(f"{class_key(char_class)}_{kind}")
+        return table if isinstance(table, SlotTable) else None
+
+
+_tables = None
+_tables_lock = threading.Lock()
+
+
+def get_advancement_tables() -> AdvancementTables:
+    """Return the process-wide advancement tables."""
+    global _tables
+    if _tables is None:
+        with _tables_lock:
+            if _tables is None:
+                _tables = AdvancementTables()
+    return _tables
+
+
+def _reload(paths):
+    """Recompile edited tables in the background while the data watcher runs."""
+    if _tables is not None:
+        _tables.refresh(force=True)
+
+
+add_reload_hook((ADVANCEMENT_FOLDER,), _reload)
@@ -0,0 +1,103 @@
+"""
+Shared helpers for doing blocking file I/O without stalling the event loop.
+
+Kani streams model output and runs tool calls on one asyncio event loop, so
+a slow disk or a large JSON file read directly inside a tool freezes
+everything else. Tools hand that work to a small, bounded thread pool
+instead:
+
+    char_data = await read_json(char_path)
+    message = await run_io(apply_purchase)
+
+The pool size comes from WHITE_STAR_IO_WORKERS (default 4).
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuration
+DEFAULT_IO_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the process-wide I/O thread pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = int(os.getenv("WHITE_STAR_IO_WORKERS", DEFAULT_IO_WORKERS))
+                _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="white-star-io")
+    return _executor
+
+
+async def run_io(func, *args, **kwargs):
+    """
+    Run a blocking function on the I/O thread pool and wait for its result.
+
+    Args:
+        func: The blocking callable
+        *args, **kwargs: Passed through to func
+
+    Returns:
+        Whatever func returns; exceptions are re-raised in the caller
+    """
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context so locks it holds are seen as held
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+def _read_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def _read_text(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+def _append_text(path, text):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+async def read_json(path: str):
+    """Load a JSON file; raises FileNotFoundError/JSONDecodeError like json.load."""
+    return await run_io(_read_json, path)
+
+
+async def write_json(path: str, data):
+    """Write a JSON file in the repo's usual indented format."""
+    await run_io(_write_json, path, data)
+
+
+async def read_text(path: str) -> str:
+    """Read a whole text file."""
+    return await run_io(_read_text, path)
+
+
+async def append_text(path: str, text: str):
+    """Append text to a file, creating it if needed."""
+    await run_io(_append_text, path, text)
+
+
+def shutdown():
+    """Wait for queued I/O to finish and stop the pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
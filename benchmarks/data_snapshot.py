@@ -0,0 +1,102 @@
+"""
+Time a cold start with and without the compiled data snapshot.
+
+Writes a synthetic project.json with a number of large advancement and
+equipment files to a temporary directory, then times reading every file as JSON (what
+each start used to do), building the snapshot (the first start after a
+data change), loading the existing snapshot (every other start) and
+rebuilding it in a running session after one file is edited, which is what
+the data watcher does on each save.
+
+Usage:
+    python benchmarks/data_snapshot.py [--files 40] [--entries 2000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from data_snapshot import DataSnapshots, build_snapshot  # noqa: E402
+
+
+def make_data(directory: str, files: int, entries: int) -> str:
+    """Write the manifest and its datasets; returns the manifest path."""
+    folders = {"advancement": [], "equipment": []}
+    for index in range(files):
+        folder = "equipment" if index % 4 == 0 else "advancement"
+        name = f"{folder}_{index}"
+        folders[folder].append(name)
+        os.makedirs(os.path.join(directory, folder), exist_ok=True)
+        if folder == "equipment":
+            data = {"items": [{"name": f"Item {index}-{i}", "cost": i, "weight": 1,
+                               "description": "A well-worn piece of gear from the outer colonies."}
+                              for i in range(entries)]}
+        else:
+            data = {"rules": [{"id": i, "title": f"Rule {i}", "text": "When the void stares back, roll 1d20. " * 4}
+                              for i in range(entries)]}
+        with open(os.path.join(directory, folder, name + ".json"), "w") as f:
+            json.dump(data, f)
+    manifest_path = os.path.join(directory, "project.json")
+    with open(manifest_path, "w") as f:
+        json.dump({"folders": folders}, f)
+    return manifest_path
+
+
+def time_ms(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        manifest_path = make_data(directory, args.files, args.entries)
+        snapshot_path = os.path.join(directory, "ephemeral", "data_snapshot.pickle")
+        total_mb = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(directory) for name in names
+        ) / 1e6
+        print(f"{args.files} files, {total_mb:.1f} MB of JSON")
+
+        def read_all():
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    if name.endswith(".json"):
+                        with open(os.path.join(root, name)) as f:
+                            json.load(f)
+
+        def rebuild():
+            snapshots = DataSnapshots(manifest_path, snapshot_path)
+            snapshots._write(build_snapshot(manifest_path))
+
+        def load():
+            DataSnapshots(manifest_path, snapshot_path).get()
+
+        print(f"  read every JSON file: {time_ms(read_all, args.repeat):8.2f} ms")
+        print(f"  build snapshot:       {time_ms(rebuild, args.repeat):8.2f} ms")
+        print(f"  load snapshot:        {time_ms(load, args.repeat):8.2f} ms")
+
+        snapshots = DataSnapshots(manifest_path, snapshot_path)
+        snapshots.get()
+        edited = os.path.join(directory, "advancement", "advancement_1.json")
+
+        def rebuild_one():
+            os.utime(edited, ns=(time.time_ns(), time.time_ns()))
+            snapshots.get()
+
+        print(f"  rebuild after 1 edit: {time_ms(rebuild_one, args.repeat):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
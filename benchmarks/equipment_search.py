@@ -0,0 +1,109 @@
+"""
+Compare indexed equipment lookups with the old difflib scan.
+
+Grows the real equipment catalog 10x and 100x with generated variants
+("Laser Pistol Mk 7", "Salvaged Med Kit", ...) and times, per query, the
+difflib.SequenceMatcher loop buy_item used to run over every item against
+EquipmentCatalog.find() and EquipmentCatalog.search(). Queries are a mix of
+exact names, aliases and misspellings.
+
+Usage:
+    python benchmarks/equipment_search.py [--scales 1 10 100] [--queries 200]
+"""
+import argparse
+import difflib
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from data_snapshot import build_snapshot  # noqa: E402
+from equipment_catalog import EQUIPMENT_FOLDER, EquipmentCatalog  # noqa: E402
+
+PREFIXES = ["Salvaged", "Military", "Colonial", "Imperial", "Rebel", "Frontier", "Deluxe", "Compact", "Heavy-Duty"]
+
+
+def scaled_datasets(datasets: dict, scale: int) -> dict:
+    """Return the equipment datasets with each item repeated as scale - 1 extra variants."""
+    scaled = {}
+    for category, data in datasets.items():
+        if not data:
+            continue
+        key, items = next(iter(data.items()))
+        grown = list(items)
+        for n in range(1, scale):
+            for entry in items:
+                name = f"{PREFIXES[n % len(PREFIXES)]} {entry['name']} Mk {n}"
+                grown.append(dict(entry, name=name, cost=entry["cost"] + n))
+        scaled[category] = {key: grown}
+    return scaled
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    chars = list(name.lower())
+    for _ in range(max(1, len(chars) // 8)):
+        index = rng.randrange(len(chars))
+        if rng.random() < 0.5:
+            del chars[index]
+        else:
+            chars[index] = rng.choice("aeiourstln")
+    return "".join(chars)
+
+
+def difflib_find(datasets: dict, query: str):
+    """The lookup buy_item used to do: score every item with SequenceMatcher."""
+    best_match, best_ratio = None, 0.0
+    for data in datasets.values():
+        for category in data.values():
+            for entry in category:
+                ratio = difflib.SequenceMatcher(None, entry["name"].lower(), query.lower()).ratio()
+                if ratio > best_ratio:
+                    best_match, best_ratio = entry, ratio
+    return best_match, best_ratio
+
+
+def time_us(fn, queries: list) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) * 1e6 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    snapshot = build_snapshot(os.path.join(ROOT, "project.json"))
+    base = snapshot.folder(EQUIPMENT_FOLDER)
+    rng = random.Random(7)
+
+    print(f"{'items':>7} {'index build':>12} {'difflib scan':>13} {'find':>9} {'search k=5':>11} {'agree':>6}")
+    for scale in args.scales:
+        datasets = scaled_datasets(base, scale)
+        start = time.perf_counter()
+        catalog = EquipmentCatalog(datasets)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        names = [item.name for item in catalog.items]
+        queries = []
+        for _ in range(args.queries):
+            name = rng.choice(names)
+            kind = rng.random()
+            queries.append(name if kind < 0.3 else name.lower().replace(",", "") if kind < 0.5 else misspell(name, rng))
+
+        # The difflib loop is slow at 100x; time it on a sample
+        sample = queries[:max(5, args.queries // scale)]
+        scan_us = time_us(lambda query: difflib_find(datasets, query), sample)
+        find_us = time_us(catalog.find, queries)
+        search_us = time_us(lambda query: catalog.search(query, k=5), queries)
+        agree = sum(catalog.find(q)[0].name == difflib_find(datasets, q)[0]["name"] for q in sample) / len(sample)
+        print(f"{len(catalog):>7} {build_ms:>10.1f}ms {scan_us:>11.0f}us {find_us:>7.1f}us {search_us:>9.1f}us {agree:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Measure how long tool file I/O stalls the asyncio event loop.
+
+A ticker coroutine asks to wake up every millisecond and records how late
+it actually ran. Meanwhile a synthetic large-state workload (big character
+and scene log JSON files, read and rewritten repeatedly) runs either
+directly on the loop, as the tools used to, or through async_io.run_io.
+The worst and 99th percentile lateness show how responsive the chat would
+stay while tools work.
+
+Usage:
+    python benchmarks/event_loop_lag.py [--entries 20000] [--rounds 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from async_io import read_json, write_json, shutdown  # noqa: E402
+
+TICK_SECONDS = 0.001
+
+
+def make_state(directory: str, entries: int) -> list:
+    """Write a few large JSON files resembling long-running campaign state."""
+    paths = []
+    for index in range(4):
+        path = os.path.join(directory, f"state_{index}.json")
+        data = [
+            {
+                "timestamp": f"2025-01-01T00:00:{i % 60:02d}",
+                "title": f"Scene {i}",
+                "summary": "The crew drifted past the wreck of the Verdant, scanning for survivors. " * 2,
+                "inventory": {f"Item {j}": j for j in range(8)},
+            }
+            for i in range(entries)
+        ]
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        paths.append(path)
+    return paths
+
+
+def blocking_round(path: str):
+    with open(path, "r") as f:
+        data = json.load(f)
+    data.append({"title": "Tick"})
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+async def offloaded_round(path: str):
+    data = await read_json(path)
+    data.append({"title": "Tick"})
+    await write_json(path, data)
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run_workload(paths: list, rounds: int, offload: bool) -> tuple:
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)  # Let the ticker settle
+
+    started = time.perf_counter()
+    for round_number in range(rounds):
+        path = paths[round_number % len(paths)]
+        if offload:
+            await offloaded_round(path)
+        else:
+            blocking_round(path)
+            await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await tick_task
+    return lags, elapsed
+
+
+def report(label: str, lags: list, elapsed: float):
+    ordered = sorted(lags) or [0.0]
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{label:<22} max lag {ordered[-1] * 1000:8.1f} ms   "
+          f"p99 {p99 * 1000:7.1f} ms   ticks {len(lags):6d}   workload {elapsed:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000, help="Records per synthetic state file")
+    parser.add_argument("--rounds", type=int, default=20, help="Read/modify/write cycles to run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Building synthetic state (4 files × {args.entries} records)...")
+        paths = make_state(directory, args.entries)
+        size_mb = sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+        print(f"State size: {size_mb:.1f} MB, {args.rounds} rounds\n")
+
+        report("before (on the loop)", *asyncio.run(run_workload(paths, args.rounds, offload=False)))
+        report("after (run_io pool)", *asyncio.run(run_workload(paths, args.rounds, offload=True)))
+
+    shutdown()
+
+
+if __name__ == "__main__":
+    main()
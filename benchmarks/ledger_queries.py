@@ -0,0 +1,113 @@
+"""
+Time indexed ledger queries on a large synthetic segmented ledger.
+
+Builds a ledger of random add/spend/purchase/transfer entries in a
+temporary directory (written straight to the segment and index files, so
+building a million entries takes seconds rather than minutes), reopens it
+the way the JSON backend does and times typical lookups.
+
+Usage:
+    python benchmarks/ledger_queries.py [--entries 1000000] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ledger import SegmentedLedger, ledger_timestamp, normalize_time_bound  # noqa: E402
+
+CHARACTERS = ["Jax", "Zara Vex", "Mira", "Kel", "Oon"] + [f"NPC {i}" for i in range(200)]
+ITEMS = ["Laser Pistol", "Rope (50 ft)", "Medkit"] + [f"Item {i}" for i in range(500)]
+START = datetime(2025, 1, 1)
+YEAR_SECONDS = 365 * 24 * 3600
+JUNE_START = normalize_time_bound("2025-06-01")
+JUNE_END = normalize_time_bound("2025-06-30", end=True)
+
+
+def random_entry(index: int, total: int) -> dict:
+    # Spread the entries evenly over 2025, oldest first
+    timestamp = ledger_timestamp(START + timedelta(seconds=index * YEAR_SECONDS / total))
+    character = random.choice(CHARACTERS)
+    roll = random.random()
+    if roll < 0.4:
+        return {"type": "purchase", "character": character, "item": random.choice(ITEMS),
+                "quantity": random.randint(1, 3), "total_cost": random.randint(1, 500), "timestamp": timestamp}
+    if roll < 0.6:
+        return {"type": "transfer", "from": character, "to": random.choice(CHARACTERS), "amount": 10, "timestamp": timestamp}
+    if roll < 0.8:
+        return {"type": "spend", "character": character, "amount": 5, "timestamp": timestamp}
+    return {"type": "add", "character": character, "amount": 7, "timestamp": timestamp}
+
+
+def build(directory: str, entries: int):
+    ledger = SegmentedLedger(directory)
+    os.makedirs(directory, exist_ok=True)
+    number, size = 1, 0
+    segment = open(ledger._segment_path(number), "ab")
+    index = open(ledger._index_path(number), "a")
+    try:
+        for i in range(entries):
+            entry = random_entry(i, entries)
+            line = (json.dumps(entry) + "\n").encode("utf-8")
+            if size and size + len(line) > ledger.segment_max_bytes:
+                segment.close()
+                index.close()
+                number, size = number + 1, 0
+                segment = open(ledger._segment_path(number), "ab")
+                index = open(ledger._index_path(number), "a")
+            segment.write(line)
+            index.write(json.dumps(ledger._index_record(entry, size, size + len(line))) + "\n")
+            size += len(line)
+    finally:
+        segment.close()
+        index.close()
+
+
+def timed(label: str, query, repeat: int):
+    result = query()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        query()
+    per_call = (time.perf_counter() - started) / repeat * 1000
+    matches = result[1] if isinstance(result, tuple) else sum(bucket["count"] for bucket in result.values())
+    print(f"{label:<48} {per_call:8.3f} ms   {matches:8d} matches")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1000000, help="Ledger entries to generate")
+    parser.add_argument("--repeat", type=int, default=200, help="Runs per query")
+    args = parser.parse_args()
+    random.seed(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        build(directory, args.entries)
+        print(f"Built {args.entries} entries in {time.perf_counter() - started:.1f} s")
+
+        ledger = SegmentedLedger(directory)
+        started = time.perf_counter()
+        count = len(ledger)
+        print(f"Indexed {count} entries from the sidecar files in {time.perf_counter() - started:.1f} s (saves packs)")
+
+        ledger = SegmentedLedger(directory)
+        started = time.perf_counter()
+        count = len(ledger)
+        print(f"Reopened the index of {count} entries in {time.perf_counter() - started:.2f} s\n")
+
+        timed("last 10 for Jax", lambda: ledger.query("Jax"), args.repeat)
+        timed("purchases of Laser Pistol (page)", lambda: ledger.query(entry_type="purchase", item="laser pistol"), args.repeat)
+        timed("totals for Laser Pistol", lambda: ledger.totals(item="Laser Pistol"), args.repeat)
+        timed("Jax spends in June (page)", lambda: ledger.query("Jax", "spend", JUNE_START, JUNE_END), args.repeat)
+        timed("Jax totals in June", lambda: ledger.totals("Jax", since=JUNE_START, until=JUNE_END), args.repeat)
+        timed("everything in June (page)", lambda: ledger.query(since=JUNE_START, until=JUNE_END), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Time the starting-loadout solver on the real equipment catalog.
+
+Solves the best three loadouts for every class at every possible 3d6 x 10
+starting budget (30-180 credits) with a cold cache, then outfits a batch of
+NPCs with random classes and budgets through LoadoutOptimizer.outfit().
+
+Usage:
+    python benchmarks/loadout_solver.py [--npcs 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from data_snapshot import build_snapshot  # noqa: E402
+from equipment_catalog import EQUIPMENT_FOLDER, EquipmentCatalog  # noqa: E402
+from loadout import LoadoutOptimizer  # noqa: E402
+
+BUDGETS = range(30, 181, 10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--npcs", type=int, default=10000)
+    args = parser.parse_args()
+
+    snapshot = build_snapshot()
+    catalog = EquipmentCatalog(snapshot.folder(EQUIPMENT_FOLDER))
+    classes = snapshot.get("character_creation", "character_classes")["classes"]
+    optimizer = LoadoutOptimizer(catalog, classes)
+
+    print(f"{len(catalog)} items, {len(classes)} classes")
+    print(f"{'class':<14} {'mean':>8} {'worst':>8}  best loadout at 180 credits")
+    for char_class in classes:
+        times = []
+        for budget in BUDGETS:
+            start = time.perf_counter()
+            loadouts = optimizer.best(char_class, budget)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"{char_class:<14} {sum(times) / len(times):>6.1f}ms {max(times):>6.1f}ms  "
+              f"{loadouts[0].cost} cr: {', '.join(loadouts[0].names()[:5])}, ...")
+
+    rng = random.Random(1)
+    npcs = [(rng.choice(list(classes)), rng.randint(3, 18) * 10) for _ in range(args.npcs)]
+    fresh = LoadoutOptimizer(catalog, classes)
+    start = time.perf_counter()
+    fresh.outfit(npcs)
+    elapsed = time.perf_counter() - start
+    print(f"\nOutfitted {args.npcs} NPCs in {elapsed * 1000:.0f} ms ({elapsed * 1e6 / args.npcs:.1f} us each)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Regression check: locked async tools must not starve the I/O thread pool.
+
+award_xp, level_up, improve_attribute and log_scene used to hold a
+character's lock across several await run_io(...) calls. When at least
+WHITE_STAR_IO_WORKERS sync tools for the same character arrived at the same
+time (Kani runs a round's parallel function calls concurrently), every I/O
+worker blocked waiting for that lock and the lock holder never got a thread
+back, so the session froze. Each locked section now runs in a single
+run_io() call.
+
+This runs each of those tools alongside --calls concurrent add_inventory
+calls for the same character, in a scratch copy of the game data, and fails
+if any round does not finish within --timeout seconds.
+
+Usage:
+    python benchmarks/lock_pool_deadlock.py [--calls 6] [--timeout 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CHARACTER = "Zara Vex"
+
+
+def make_scratch(directory: str):
+    """Copy the manifest and its data folders, and add one character file."""
+    shutil.copy(os.path.join(REPO_ROOT, "project.json"), directory)
+    with open(os.path.join(REPO_ROOT, "project.json"), "r") as f:
+        folders = json.load(f).get("folders", {})
+    for folder in folders:
+        source = os.path.join(REPO_ROOT, folder)
+        if folder != "characters" and os.path.isdir(source):
+            shutil.copytree(source, os.path.join(directory, folder))
+    os.makedirs(os.path.join(directory, "characters"), exist_ok=True)
+    attributes = {name: {"base": 12, "race_mod": 0, "total": 12}
+                  for name in ("Strength", "Intelligence", "Wisdom", "Constitution", "Dexterity", "Charisma")}
+    with open(os.path.join(directory, "characters", "zara_vex.json"), "w") as f:
+        json.dump({"name": CHARACTER, "class": "Pilot", "race": "Human", "level": 4, "experience": 0,
+                   "hp": 10, "max_hp": 10, "attributes": attributes}, f, indent=2)
+
+
+async def run_rounds(calls: int, timeout: float) -> list:
+    import tools
+
+    locked_calls = {
+        "award_xp": lambda: tools.award_xp(CHARACTER, 10, "regression check"),
+        "improve_attribute": lambda: tools.improve_attribute(CHARACTER, "dexterity"),  # Eligible at level 4
+        "level_up": lambda: tools.level_up(CHARACTER),
+        "log_scene": lambda: tools.log_scene(CHARACTER, "Regression check", "Nothing happened."),
+    }
+    failures = []
+    for name, call in locked_calls.items():
+        contenders = [tools.add_inventory(CHARACTER, "Rope", 1) for _ in range(calls)]
+        try:
+            await asyncio.wait_for(asyncio.gather(call(), *contenders), timeout)
+            print(f"✅ {name} with {calls} concurrent add_inventory calls finished")
+        except asyncio.TimeoutError:
+            print(f"❌ {name} with {calls} concurrent add_inventory calls hung for {timeout:.0f} s")
+            failures.append(name)
+            break  # The pool's workers are stuck; later rounds cannot run
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=6, help="Concurrent add_inventory calls per round")
+    parser.add_argument("--timeout", type=float, default=20.0, help="Seconds before a round counts as hung")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        make_scratch(directory)
+        os.chdir(directory)
+        sys.path.insert(0, REPO_ROOT)
+        failures = asyncio.run(run_rounds(args.calls, args.timeout))
+        if failures:
+            # Worker threads are still blocked on the lock, so a normal exit would wait for them forever
+            sys.stdout.flush()
+            os._exit(1)
+        from state_store import close_store
+        close_store()
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(directory, ignore_errors=True)
+    print("\n✅ No round deadlocked.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Stress test for multi-session state: N processes hammer the same characters.
+
+Every worker runs in the same scratch directory (so they share one
+ephemeral/ state, like several run.sh sessions in one checkout) and
+repeats, ROUNDS times:
+
+    add_credits("Solo <n>", 2)          # a character only this worker uses
+    add_credits("Jax", 2)               # shared by every worker
+    add_inventory("Jax", "Token", 1)
+    transfer_credits("Jax", "Zara", 1)  # takes two character locks
+
+Afterwards the totals are checked: any lost update shows up as a mismatch.
+Each worker reports its lock-wait metrics, which are summed per lock.
+
+Usage:
+    python benchmarks/state_stress.py [--processes 8] [--rounds 50] [--backend json|sqlite]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+async def worker_rounds(index: int, rounds: int):
+    import tools
+
+    for _ in range(rounds):
+        await tools.add_credits(f"Solo {index}", 2)
+        await tools.add_credits("Jax", 2)
+        await tools.add_inventory("Jax", "Token", 1)
+        await tools.transfer_credits("Jax", "Zara", 1)
+
+
+def run_worker(index: int, rounds: int):
+    """Body of one worker process; prints its lock metrics as JSON."""
+    sys.path.insert(0, REPO_ROOT)
+    from state_store import close_store, get_locks, get_store
+
+    asyncio.run(worker_rounds(index, rounds))
+
+    stats = get_locks().stats()
+    backend = getattr(get_store(), "backend", get_store())
+    if hasattr(backend, "locks"):
+        stats.update(backend.locks.stats())
+    close_store()
+    print(json.dumps(stats))
+
+
+def check_totals(processes: int, rounds: int) -> list:
+    sys.path.insert(0, REPO_ROOT)
+    from state_store import close_store, get_store
+
+    store = get_store()
+    expected = {
+        ("credits", "Jax"): processes * rounds,
+        ("credits", "Zara"): processes * rounds,
+        ("item", "Jax"): processes * rounds,
+        ("ledger", None): processes * rounds * 3,
+    }
+    for index in range(processes):
+        expected[("credits", f"Solo {index}")] = rounds * 2
+
+    problems = []
+    for (kind, character), want in expected.items():
+        if kind == "credits":
+            got = store.get_credits(character)
+        elif kind == "item":
+            got = store.get_item_quantity(character, "Token")
+        else:
+            got = store.query_ledger(limit=0)[1]
+        if got != want:
+            problems.append(f"{kind} {character or ''}: expected {want}, found {got}")
+    close_store()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=8, help="Parallel worker processes")
+    parser.add_argument("--rounds", type=int, default=50, help="Rounds per worker")
+    parser.add_argument("--backend", default="json", help="State backend (json or sqlite)")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args.worker, args.rounds)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, WHITE_STAR_STATE_BACKEND=args.backend, PYTHONPATH=REPO_ROOT)
+        print(f"Running {args.processes} processes × {args.rounds} rounds on the {args.backend} backend...")
+        started = time.perf_counter()
+        workers = [
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--worker", str(index), "--rounds", str(args.rounds)],
+                cwd=directory, env=env, stdout=subprocess.PIPE, text=True,
+            )
+            for index in range(args.processes)
+        ]
+        outputs = [worker.communicate()[0] for worker in workers]
+        elapsed = time.perf_counter() - started
+        if any(worker.returncode for worker in workers):
+            print("❌ A worker failed.")
+            sys.exit(1)
+
+        totals = {}
+        for output in outputs:
+            for key, stats in json.loads(output.strip().splitlines()[-1]).items():
+                bucket = totals.setdefault(key, {"acquired": 0, "contended": 0, "wait_total": 0.0, "wait_max": 0.0})
+                bucket["acquired"] += stats["acquired"]
+                bucket["contended"] += stats["contended"]
+                bucket["wait_total"] += stats["wait_total"]
+                bucket["wait_max"] = max(bucket["wait_max"], stats["wait_max"])
+
+        print(f"Finished in {elapsed:.1f} s\n")
+        print(f"{'lock':<24} {'acquired':>9} {'contended':>10} {'avg wait':>10} {'max wait':>10}")
+        for key, stats in sorted(totals.items()):
+            average = stats["wait_total"] / stats["acquired"] * 1000 if stats["acquired"] else 0.0
+            print(f"{key:<24} {stats['acquired']:>9} {stats['contended']:>10} "
+                  f"{average:>8.2f}ms {stats['wait_max'] * 1000:>8.1f}ms")
+
+        os.chdir(directory)
+        os.environ["WHITE_STAR_STATE_BACKEND"] = args.backend
+        problems = check_totals(args.processes, args.rounds)
+        os.chdir(REPO_ROOT)
+
+    if problems:
+        print("\n❌ Lost updates:\n" + "\n".join(f"- {problem}" for problem in problems))
+        sys.exit(1)
+    print("\n✅ No lost updates.")
+
+
+if __name__ == "__main__":
+    main()
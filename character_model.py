@@ -0,0 +1,137 @@
+"""
+Typed, slotted in-memory model of a character file (characters/<slug>.json).
+
+Attribute keys are normalized to lowercase once, when the file is loaded,
+and every attribute's modifier ((total - 10) // 2) is computed then too, so
+hot paths like skill checks and HP rolls look values up directly instead of
+scanning the attributes case-insensitively and recomputing modifiers on
+each call. Fields the model does not know about are kept as-is, so
+Character.from_dict(data).to_dict() round-trips the JSON schema, key order
+included. The class XP bonus is compiled into an XpBonusRule at load time
+as well (see xp_bonus.py).
+"""
+from xp_bonus import compile_xp_bonus
+
+ATTRIBUTE_NAMES = ("strength", "intelligence", "wisdom", "constitution", "dexterity", "charisma")
+
+
+def attribute_modifier(total: int) -> int:
+    """Return the modifier for an attribute score."""
+    return (total - 10) // 2
+
+
+class Attribute:
+    """One attribute score with its display name, parts and modifier."""
+
+    __slots__ = ("name", "base", "race_mod", "level_mod", "total", "modifier", "extra")
+
+    def __init__(self, name: str, total: int, base: int = None, race_mod: int = 0, level_mod: int = None, extra: dict = None):
+        self.name = name
+        self.base = total if base is None else base
+        self.race_mod = race_mod
+        self.level_mod = level_mod
+        self.total = total
+        self.modifier = attribute_modifier(total)
+        self.extra = extra or {}
+
+    @classmethod
+    def from_dict(cls, name: str, data: dict) -> "Attribute":
+        extra = {key: value for key, value in data.items() if key not in ("base", "race_mod", "level_mod", "total")}
+        return cls(name, data.get("total", data.get("base", 10)), data.get("base"), data.get("race_mod", 0),
+                   data.get("level_mod"), extra)
+
+    def to_dict(self) -> dict:
+        data = {"base": self.base, "race_mod": self.race_mod}
+        if self.level_mod is not None:
+            data["level_mod"] = self.level_mod
+        data["total"] = self.total
+        data.update(self.extra)
+        return data
+
+    def improve(self, points: int = 1):
+        """Raise the score through its level modifier and recompute the total and modifier."""
+        self.level_mod = (self.level_mod or 0) + points
+        self.total = self.base + self.race_mod + self.level_mod
+        self.modifier = attribute_modifier(self.total)
+
+
+class Character:
+    """A character's stats, with attributes keyed by lowercase name."""
+
+    __slots__ = ("name", "char_class", "race", "level", "experience", "hp", "max_hp", "bhb", "st",
+                 "pronouns", "attributes", "xp_bonus", "xp_bonus_rule", "extra", "_key_order")
+
+    # JSON key -> attribute name, for the fields the model types
+    FIELDS = {
+        "name": "name",
+        "class": "char_class",
+        "race": "race",
+        "level": "level",
+        "experience": "experience",
+        "hp": "hp",
+        "max_hp": "max_hp",
+        "bhb": "bhb",
+        "st": "st",
+        "pronouns": "pronouns",
+        "xp_bonus": "xp_bonus",
+    }
+
+    def __init__(self, name: str, char_class: str = "Unknown", race: str = "Unknown", level: int = 1,
+                 experience: int = 0, hp: int = 0, max_hp: int = 0, bhb: str = "+0", st: int = 15,
+                 pronouns: dict = None, attributes: dict = None, xp_bonus: dict = None, extra: dict = None):
+        self.name = name
+        self.char_class = char_class
+        self.race = race
+        self.level = level
+        self.experience = experience
+        self.hp = hp
+        self.max_hp = max_hp
+        self.bhb = bhb
+        self.st = st
+        self.pronouns = pronouns
+        self.attributes = attributes or {}
+        self.xp_bonus = xp_bonus or {}
+        self.xp_bonus_rule = compile_xp_bonus(self.xp_bonus)
+        self.extra = extra or {}
+        self._key_order = ()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Character":
+        """Build a character from the characters/*.json schema."""
+        character = cls(data.get("name", "Unknown"))
+        for key, field in cls.FIELDS.items():
+            if key in data:
+                setattr(character, field, data[key])
+        character.pronouns = dict(character.pronouns) if character.pronouns else None
+        character.xp_bonus = character.xp_bonus or {}
+        character.xp_bonus_rule = compile_xp_bonus(character.xp_bonus)
+        character.attributes = {
+            name.lower(): Attribute.from_dict(name, values)
+            for name, values in (data.get("attributes") or {}).items()
+        }
+        character.extra = {key: value for key, value in data.items() if key not in cls.FIELDS and key != "attributes"}
+        character._key_order = tuple(data)
+        return character
+
+    def to_dict(self) -> dict:
+        """Return the character in the characters/*.json schema, keeping the original key order."""
+        values = {key: getattr(self, field) for key, field in self.FIELDS.items()}
+        if values["pronouns"] is None:
+            del values["pronouns"]
+        if not values["xp_bonus"] and "xp_bonus" not in self._key_order:
+            del values["xp_bonus"]
+        values["attributes"] = {attribute.name: attribute.to_dict() for attribute in self.attributes.values()}
+        values.update(self.extra)
+
+        data = {key: values.pop(key) for key in self._key_order if key in values}
+        data.update(values)
+        return data
+
+    def attribute(self, name: str) -> Attribute:
+        """Return an attribute by name (any case), or None."""
+        return self.attributes.get(name.lower())
+
+    def modifier(self, name: str) -> int:
+        """Return an attribute's modifier, or 0 if the character does not have it."""
+        attribute = self.attributes.get(name.lower())
+        return attribute.modifier if attribute else 0
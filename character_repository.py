@@ -0,0 +1,175 @@
+"""
+Shared, cached access to character files (characters/<slug>.json).
+
+Tools used to open and parse the character file on every call, so a
+combat round with ten skill checks parsed the same file ten times.
+CharacterRepository keeps recently used characters parsed in a small LRU
+cache and only re-reads a file when its modification time or size has
+changed, e.g. because it was edited by hand or saved by another session.
+
+    characters = get_characters()
+    char_data = characters.load("Zara Vex")   # a private copy, safe to modify
+    char_data["experience"] += 100
+    characters.save("Zara Vex", char_data)
+
+The same files are also available as typed Character models (see
+character_model.py): get_character() returns the shared cached model for
+read-only use, load_character() a private one to modify and save.
+"""
+import copy
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from character_model import Character
+from roster import RosterIndex, get_roster
+
+# Configuration
+CHARACTERS_DIR = "characters"
+DEFAULT_CACHE_SIZE = 32  # Characters kept parsed in memory
+
+DEFAULT_PRONOUNS = {
+    "subject": "they",
+    "object": "them",
+    "possessive_adjective": "their",
+    "possessive_pronoun": "theirs",
+    "reflexive": "themself"
+}
+
+
+class CharacterRepository:
+    """Load and save character files through an mtime/size-validated LRU cache."""
+
+    def __init__(self, directory: str = CHARACTERS_DIR, cache_size: int = DEFAULT_CACHE_SIZE, roster: RosterIndex = None):
+        self.directory = directory
+        self.roster = roster  # Kept up to date on every save, if given
+        self.save_listeners = []  # Called with the character name after every save
+        self.cache_size = max(1, cache_size)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # path -> [(mtime_ns, size), data, Character or None]
+        self.hits = 0
+        self.parses = 0
+
+    @staticmethod
+    def slug(character: str) -> str:
+        """Return the file-name slug for a character name (characters/<slug>.json)."""
+        return character.lower().replace(" ", "_")
+
+    def path(self, character: str) -> str:
+        """Return the file path for a character name."""
+        return os.path.join(self.directory, f"{self.slug(character)}.json")
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _entry(self, character):
+        """Return the cache entry for a character, re-reading the file only if it changed."""
+        path = self.path(character)
+        signature = self._signature(path)  # Raises FileNotFoundError like open() did
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached and cached[0] == signature:
+                self._cache.move_to_end(path)
+                self.hits += 1
+                return cached
+
+        with open(path, "r") as f:
+            data = json.load(f)
+        with self._lock:
+            self.parses += 1
+            return self._remember(path, signature, data)
+
+    def _cached(self, character):
+        return self._entry(character)[1]
+
+    def _remember(self, path, signature, data):
+        entry = self._cache[path] = [signature, data, None]
+        self._cache.move_to_end(path)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry
+
+    def load(self, character: str) -> dict:
+        """
+        Return a character's data as a private copy the caller may modify.
+
+        Raises:
+            FileNotFoundError: No file for this character
+            json.JSONDecodeError: The file is not valid JSON
+        """
+        return copy.deepcopy(self._cached(character))
+
+    def signature(self, character: str):
+        """Return (mtime_ns, size) of a character's file, or None if it has none; changes whenever the file does."""
+        try:
+            return self._signature(self.path(character))
+        except FileNotFoundError:
+            return None
+
+    def exists(self, character: str) -> bool:
+        return os.path.exists(self.path(character))
+
+    def save(self, character: str, data: dict):
+        """Write a character file atomically and keep the cache in step with it."""
+        path = self.path(character)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._remember(path, self._signature(path), copy.deepcopy(data))
+        if self.roster is not None:
+            self.roster.update(self.slug(character), data)
+        for callback in self.save_listeners:
+            callback(character)
+
+    def get_character(self, character: str) -> Character:
+        """
+        Return the shared cached Character model. Treat it as read-only; use
+        load_character() for a copy to modify.
+        """
+        entry = self._entry(character)
+        if entry[2] is None:
+            entry[2] = Character.from_dict(entry[1])
+        return entry[2]
+
+    def load_character(self, character: str) -> Character:
+        """Return a private Character model the caller may modify and pass to save_character()."""
+        return Character.from_dict(self.load(character))
+
+    def save_character(self, model: Character, character: str = None):
+        """Save a Character model (under its own name unless another is given)."""
+        self.save(character or model.name, model.to_dict())
+
+    def pronouns(self, character: str) -> dict:
+        """Return a character's pronouns, or they/them if unknown."""
+        try:
+            return dict(self._cached(character).get("pronouns", DEFAULT_PRONOUNS))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict(DEFAULT_PRONOUNS)
+
+    def invalidate(self, character: str = None):
+        """Forget one cached character, or all of them."""
+        with self._lock:
+            if character is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(self.path(character), None)
+
+
+_characters = None
+_characters_lock = threading.Lock()
+
+
+def get_characters() -> CharacterRepository:
+    """Return the process-wide character repository."""
+    global _characters
+    if _characters is None:
+        with _characters_lock:
+            if _characters is None:
+                _characters = CharacterRepository(roster=get_roster())
+    return _characters
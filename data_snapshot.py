@@ -0,0 +1,250 @@
+"""
+Compiled snapshot of the game's static data, driven by project.json.
+
+project.json lists every rules, equipment, advancement, starship, NPC,
+character creation, AI DM and plugin dataset. The snapshot holds the
+SNAPSHOT_FOLDERS the code reads (equipment, advancement and character
+creation); the rest are left out, as nothing loads them. The first time the
+data is needed, every listed file in those folders is read and validated
+once and the result is
+written to ephemeral/data_snapshot.pickle together with each source file's
+modification time and size. Later starts only stat the sources and unpickle
+the snapshot, which takes a few milliseconds however large the rule files
+grow; if any source (or project.json itself) changed, the snapshot is
+rebuilt, re-reading only the changed files, and problems found while
+validating are printed then, once. While the data watcher runs, edits to the
+watched folders are rebuilt in the background as soon as they are saved.
+
+    data = get_data_snapshot()
+    classes = data.get("character_creation", "character_classes")["classes"]
+    for category, items in data.folder("equipment").items():
+        ...
+"""
+import json
+import os
+import pickle
+import threading
+
+from data_watcher import WATCHED_FOLDERS, add_reload_hook
+
+# Configuration
+MANIFEST_PATH = "project.json"
+SNAPSHOT_PATH = "ephemeral/data_snapshot.pickle"
+SNAPSHOT_FORMAT_VERSION = 2  # Bump when the snapshot layout or validation changes
+SNAPSHOT_FOLDERS = ("equipment", "advancement", "character_creation")  # Manifest folders the code reads
+TEXT_EXTENSIONS = (".md", ".txt")
+
+
+def _validate_equipment(data) -> list:
+    """Equipment files wrap one list of items, each with a name and a numeric cost."""
+    if not isinstance(data, dict) or len(data) != 1 or not isinstance(next(iter(data.values())), list):
+        return ["expected an object wrapping one list of items"]
+    problems = []
+    for index, entry in enumerate(next(iter(data.values()))):
+        if not isinstance(entry, dict) or not entry.get("name"):
+            problems.append(f"item {index} has no name")
+        elif not isinstance(entry.get("cost"), (int, float)):
+            problems.append(f"'{entry['name']}' has no numeric cost")
+    return problems
+
+
+def _require_key(key):
+    def validate(data):
+        return [] if isinstance(data, dict) and key in data else [f"missing the '{key}' key"]
+    return validate
+
+
+# Checks for datasets code depends on, by folder or "folder/name"
+VALIDATORS = {
+    "equipment": _validate_equipment,
+    "character_creation/character_classes": _require_key("classes"),
+    "character_creation/character_races": _require_key("character_races"),
+}
+
+
+class DataSnapshot:
+    """Every dataset listed in project.json, parsed and validated."""
+
+    __slots__ = ("datasets", "sources", "problems")
+
+    def __init__(self, datasets: dict, sources: dict, problems: list):
+        """
+        Args:
+            datasets: {folder: {name: parsed JSON, text for .md/.txt files, or None
+                for empty placeholder files}}, in manifest order
+            sources: {path: [mtime_ns, size]} of every file the snapshot was built from
+            problems: Validation messages, one per problem
+        """
+        self.datasets = datasets
+        self.sources = sources
+        self.problems = problems
+
+    def folder(self, folder: str) -> dict:
+        """Return {name: data} for every dataset of a folder (empty if the manifest lists none)."""
+        return self.datasets.get(folder, {})
+
+    def get(self, folder: str, name: str, default=None):
+        """Return one dataset, or default if it is not listed or failed to load."""
+        return self.datasets.get(folder, {}).get(name, default)
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _resolve(folder: str, name: str):
+    """Return the file a manifest entry refers to (.json preferred), or None."""
+    for extension in (".json",) + TEXT_EXTENSIONS:
+        path = os.path.join(folder, name + extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _manifest_entries(manifest: dict) -> list:
+    """Return (folder, name) for every dataset of the SNAPSHOT_FOLDERS in the manifest."""
+    return [
+        (folder, name)
+        for folder, names in manifest.get("folders", {}).items() if folder in SNAPSHOT_FOLDERS
+        for name in names
+    ]
+
+
+def build_snapshot(manifest_path: str = MANIFEST_PATH, previous: DataSnapshot = None) -> DataSnapshot:
+    """
+    Read and validate every dataset listed in the manifest.
+
+    Args:
+        manifest_path: Path to project.json
+        previous: An earlier snapshot of the same manifest; datasets whose
+            source file is unchanged are reused from it instead of re-read
+
+    Returns:
+        The new DataSnapshot
+    """
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    base = os.path.dirname(manifest_path)
+
+    datasets, problems = {}, []
+    sources = {manifest_path: _signature(manifest_path)}
+    for folder, name in _manifest_entries(manifest):
+        datasets.setdefault(folder, {})
+        path = _resolve(os.path.join(base, folder), name)
+        label = f"{folder}/{name}"
+        if path is None:
+            sources[os.path.join(base, folder, name + ".json")] = None
+            problems.append(f"{label}: listed in {os.path.basename(manifest_path)} but not found")
+            continue
+        sources[path] = _signature(path)
+        if (previous is not None and previous.sources.get(path) == sources[path]
+                and name in previous.folder(folder)):
+            datasets[folder][name] = previous.datasets[folder][name]
+            problems += [problem for problem in previous.problems if problem.startswith(f"{label}: ")]
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        if path.endswith(TEXT_EXTENSIONS):
+            datasets[folder][name] = content
+            continue
+        if not content.strip():
+            datasets[folder][name] = None  # Placeholder file, not written yet
+            continue
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            if previous is not None and name in previous.folder(folder):
+                # Likely a file saved mid-edit: keep serving the last version that parsed
+                datasets[folder][name] = previous.datasets[folder][name]
+                problems.append(f"{label}: invalid JSON ({e}); keeping the previous version")
+            else:
+                problems.append(f"{label}: invalid JSON ({e})")
+            continue
+        validate = VALIDATORS.get(label) or VALIDATORS.get(folder)
+        if validate:
+            problems += [f"{label}: {problem}" for problem in validate(data)]
+        datasets[folder][name] = data
+    return DataSnapshot(datasets, sources, problems)
+
+
+class DataSnapshots:
+    """The snapshot file for one manifest, rebuilt when any source changes."""
+
+    def __init__(self, manifest_path: str = MANIFEST_PATH, snapshot_path: str = SNAPSHOT_PATH):
+        self.manifest_path = manifest_path
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self.builds = 0
+
+    def _current(self, snapshot) -> bool:
+        return snapshot is not None and all(
+            _signature(path) == signature for path, signature in snapshot.sources.items()
+        )
+
+    def _read(self):
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                version, datasets, sources, problems = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return None
+        if version != SNAPSHOT_FORMAT_VERSION:
+            return None
+        return DataSnapshot(datasets, sources, problems)
+
+    def _write(self, snapshot: DataSnapshot):
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        temp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump((SNAPSHOT_FORMAT_VERSION, snapshot.datasets, snapshot.sources, snapshot.problems),
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.snapshot_path)
+
+    def get(self) -> DataSnapshot:
+        """Return the current snapshot, loading it from disk or rebuilding it only when a source changed."""
+        with self._lock:
+            if self._current(self._snapshot):
+                return self._snapshot
+            # The file is only read on first use; after that, unchanged datasets are
+            # carried over from the snapshot in memory so indexes built on them stay valid
+            snapshot = self._read() if self._snapshot is None else None
+            if not self._current(snapshot):
+                snapshot = build_snapshot(self.manifest_path, previous=self._snapshot or snapshot)
+                self.builds += 1
+                reported = set(self._snapshot.problems) if self._snapshot is not None else set()
+                for problem in snapshot.problems:
+                    if problem not in reported:
+                        print(f"⚠️ Data: {problem}")
+                try:
+                    self._write(snapshot)
+                except OSError as e:
+                    print(f"⚠️ Could not write the data snapshot: {e}")
+            self._snapshot = snapshot
+            return snapshot
+
+
+_snapshots = None
+_snapshots_lock = threading.Lock()
+
+
+def get_data_snapshot() -> DataSnapshot:
+    """Return the process-wide data snapshot for project.json."""
+    global _snapshots
+    if _snapshots is None:
+        with _snapshots_lock:
+            if _snapshots is None:
+                _snapshots = DataSnapshots()
+    return _snapshots.get()
+
+
+def _reload(paths):
+    """Rebuild a loaded snapshot as soon as a watched data file changes."""
+    if _snapshots is not None:
+        _snapshots.get()
+
+
+add_reload_hook(WATCHED_FOLDERS, _reload)
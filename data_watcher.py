@@ -0,0 +1,125 @@
+"""
+Hot reload of the game's static data while a session is running.
+
+A daemon thread polls the modification times and sizes of the files in the
+watched data folders (equipment/ and advancement/, the folders that
+indexes are built from). When files change, it runs the reload hooks registered for
+those folders, on the watcher thread. The data snapshot, the equipment
+catalog and the advancement tables each register a hook that rebuilds only
+their own affected index. The chat loop never waits for a reload: tools keep
+using the old index until the new one is swapped in.
+
+    start_data_watcher()  # once, at startup
+
+Set WHITE_STAR_WATCH_DATA=0 to turn it off; edits are then picked up the
+next time the data is looked up. WHITE_STAR_WATCH_SECONDS sets the poll
+interval (default 1 second).
+"""
+import os
+import threading
+
+# Configuration
+WATCHED_FOLDERS = ("equipment", "advancement")
+DEFAULT_POLL_SECONDS = 1.0
+
+_hooks = []  # (folders, callback), run in registration order
+
+
+def add_reload_hook(folders, callback):
+    """
+    Register a function to run after files in any of the given folders change.
+
+    Args:
+        folders: Folder names, e.g. ("equipment",)
+        callback: Called as callback(changed_paths) on the watcher thread
+    """
+    _hooks.append((tuple(folders), callback))
+
+
+class DataWatcher:
+    """Polls the data folders and runs the reload hooks of the folders that changed."""
+
+    def __init__(self, folders=WATCHED_FOLDERS, interval: float = DEFAULT_POLL_SECONDS):
+        self.folders = tuple(folders)
+        self.interval = interval
+        self.reloads = 0
+        self._files = self.scan()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def scan(self) -> dict:
+        """Return {path: (mtime_ns, size)} of every file in the watched folders."""
+        files = {}
+        for folder in self.folders:
+            try:
+                entries = list(os.scandir(folder))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def check(self) -> list:
+        """
+        Scan once and run the hooks for whatever changed since the last scan.
+
+        Returns:
+            The paths that were added, changed or removed
+        """
+        files = self.scan()
+        changed = sorted(
+            path for path in files.keys() | self._files.keys()
+            if files.get(path) != self._files.get(path)
+        )
+        self._files = files
+        if not changed:
+            return changed
+
+        folders = {os.path.normpath(path).split(os.sep)[0] for path in changed}
+        for hook_folders, callback in _hooks:
+            if folders.intersection(hook_folders):
+                paths = [path for path in changed if os.path.normpath(path).split(os.sep)[0] in hook_folders]
+                try:
+                    callback(paths)
+                except Exception as e:  # A bad edit must never take the watcher down
+                    print(f"⚠️ Could not reload {', '.join(paths)}: {e}")
+        self.reloads += 1
+        return changed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="white-star-data-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def start_data_watcher() -> DataWatcher:
+    """Start the process-wide data watcher (unless WHITE_STAR_WATCH_DATA=0); returns it, or None if off."""
+    global _watcher
+    if os.getenv("WHITE_STAR_WATCH_DATA", "1").strip() == "0":
+        return None
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = DataWatcher(interval=float(os.getenv("WHITE_STAR_WATCH_SECONDS", DEFAULT_POLL_SECONDS)))
+        _watcher.start()
+        return _watcher
@@ -0,0 +1,119 @@
+"""
+Dice rolls as structured results.
+
+Every roll in the game (roll_dice, HP on level-up, skill checks, character
+creation) produces a RollResult holding the dice notation, each die rolled,
+the named modifiers applied and the total. Code that needs the numbers
+reads them straight off the result; turning a roll into chat text is a
+separate step done only where it is shown:
+
+    result = roll_notation("2d6+1")
+    result.total            # e.g. 9
+    format_dice_roll(result)  # "🎲 Rolling 2d6+1: [3, 5] +1 → Total: 9"
+"""
+import random
+import re
+
+# Configuration
+VALID_DIE_SIZES = {4, 6, 8, 10, 12, 20, 100}
+DICE_PATTERN = re.compile(r"(?P<num>\d*)d(?P<die>\d+)(?P<mod>[+-]\d+)?")
+
+
+class RollResult:
+    """One roll: the dice, each die's result, named modifiers and the total."""
+
+    __slots__ = ("dice", "rolls", "modifiers", "total", "seed")
+
+    def __init__(self, dice: str, rolls: list, modifiers: dict = None, total: int = None, seed: int = None):
+        """
+        Args:
+            dice: The dice rolled, in standard notation (e.g. "3d6", "1d20")
+            rolls: Each die's result
+            modifiers: Named modifiers added to the dice, in order (e.g. {"Constitution": 1})
+            total: The final result; defaults to the dice plus every modifier
+            seed: The seed the dice were rolled with, if one was given
+        """
+        self.dice = dice
+        self.rolls = rolls
+        self.modifiers = modifiers or {}
+        self.total = sum(rolls) + sum(self.modifiers.values()) if total is None else total
+        self.seed = seed
+
+    @property
+    def natural(self) -> int:
+        """The first die's face, e.g. to spot a natural 1 or 20 on a d20."""
+        return self.rolls[0] if self.rolls else 0
+
+    @property
+    def modifier(self) -> int:
+        """The sum of every modifier."""
+        return sum(self.modifiers.values())
+
+    def to_dict(self) -> dict:
+        return {"dice": self.dice, "rolls": list(self.rolls), "modifiers": dict(self.modifiers),
+                "total": self.total, "seed": self.seed}
+
+    def __repr__(self):
+        return f"RollResult({self.dice!r}, rolls={self.rolls}, modifiers={self.modifiers}, total={self.total})"
+
+
+def parse_dice(dice: str) -> tuple:
+    """
+    Parse standard dice notation.
+
+    Returns:
+        (number of dice, die size, modifier)
+
+    Raises:
+        ValueError: The notation is malformed or the die is not a White Star die
+    """
+    match = DICE_PATTERN.fullmatch(dice.replace(" ", ""))
+    if not match:
+        raise ValueError("Invalid format. Use notation like 2d6, 1d20+4, or 3d8-2.")
+    num = int(match.group("num") or 1)
+    die = int(match.group("die"))
+    if die not in VALID_DIE_SIZES:
+        raise ValueError(f"d{die} is not a valid die type in White Star.")
+    return num, die, int(match.group("mod") or 0)
+
+
+def roll(num: int, die: int, modifiers: dict = None, minimum: int = None, seed: int = None) -> RollResult:
+    """
+    Roll num dice of the given size and add the named modifiers.
+
+    Args:
+        num: Number of dice
+        die: Die size (6 for d6)
+        modifiers: Named modifiers to add, e.g. {"Dexterity": 2}
+        minimum: Lowest allowed total (e.g. 1 HP per level)
+        seed: Roll with a private generator seeded with this, for repeatable rolls
+
+    Returns:
+        The RollResult
+    """
+    rng = random.Random(seed) if seed is not None else random
+    rolls = [rng.randint(1, die) for _ in range(num)]
+    result = RollResult(f"{num}d{die}", rolls, modifiers, seed=seed)
+    if minimum is not None and result.total < minimum:
+        result.total = minimum
+    return result
+
+
+def roll_notation(dice: str, seed: int = None) -> RollResult:
+    """
+    Roll dice written in standard notation (e.g., 1d6, 2d10+3, 1d100-2).
+
+    Raises:
+        ValueError: The notation is malformed or the die is not a White Star die
+    """
+    num, die, mod = parse_dice(dice)
+    result = roll(num, die, {"modifier": mod} if mod else None, seed=seed)
+    result.dice = dice
+    return result
+
+
+def format_dice_roll(result: RollResult) -> str:
+    """Render a roll the way /roll_dice shows it."""
+    mod = result.modifier
+    mod_str = f" {mod:+}" if mod else ""
+    return f"🎲 Rolling {result.dice}: {result.rolls}{mod_str} → Total: {result.total}"
@@ -0,0 +1,332 @@
+"""
+In-memory equipment catalog with exact, normalized and trigram indexes.
+
+Every item in the equipment datasets (equipment/*.json, via the data
+snapshot) is indexed once, three ways:
+
+- by its exact name ("Laser Pistol"),
+- by normalized aliases: lowercase with punctuation dropped ("laser pistol"),
+  run together ("laserpistol", so "medkit" finds "Med Kit"), with a
+  trailing ", Long" or "(Rifle)" moved to the front ("long bow",
+  "rifle firearm") and, where only one item has it, without that suffix
+  ("rope" for "Rope (50 ft)"),
+- by the trigrams of its normalized name, in an inverted index, so a
+  misspelled name only scores the items sharing trigrams with it instead of
+  every item in the catalog.
+
+A lookup is a dictionary hit for exact or alias matches and a few set
+operations otherwise. Items are typed EquipmentItem records; character
+creation's gear menus and buy_item both read them from the one catalog:
+
+    catalog = get_equipment_catalog()
+    item, score = catalog.find("laser pistl")  # (EquipmentItem("Laser Pistol", cost=50, ...), 0.8)
+    catalog.by_category["armor"]                # [EquipmentItem("Heavy", ...), ...]
+
+The catalog is rebuilt only when an equipment file changes; with the data
+watcher running that happens in the background right after the file is saved.
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+
+from data_snapshot import get_data_snapshot
+from data_watcher import add_reload_hook
+
+# Configuration
+EQUIPMENT_FOLDER = "equipment"
+MATCH_THRESHOLD = 0.5  # Lowest trigram similarity accepted as the item meant
+SEARCH_MIN_SCORE = 0.25  # Lowest trigram similarity listed as a search candidate
+AMBIGUOUS_MARGIN = 0.1  # A fuzzy match must beat the runner-up by this much to be taken as meant
+COMMON_TRIGRAM_MIN = 64  # Posting lists up to this long are always used to find candidates
+COMMON_TRIGRAM_SHARE = 20  # ...as are lists covering up to 1/20 of the catalog
+CATALOG_CHECK_SECONDS = 2.0  # How often to check the data snapshot for edited equipment files
+CATEGORY_ALIASES = {  # Other names search() accepts for category keys (the equipment file names)
+    "weapons": ("melee_weapons", "ranged_weapons"),
+    "melee": ("melee_weapons",),
+    "ranged": ("ranged_weapons",),
+    "gear": ("standard_gear",),
+}
+_PUNCTUATION = re.compile(r"[^a-z0-9 ]+")
+_SUFFIX = re.compile(r"^(?P<head>.+?)\s*(?:,\s*(?P<comma>[^,()]+)|\((?P<paren>[^()]+)\))$")
+
+
+def normalize(name: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("Bow, Long" -> "bow long")."""
+    return " ".join(_PUNCTUATION.sub(" ", name.lower()).split())
+
+
+def trigrams(text: str) -> set:
+    """Return the trigrams of normalized text, padded so short words and word starts count."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _forms(text: str) -> set:
+    normal = normalize(text)
+    return {normal, normal.replace(" ", "")} - {""}
+
+
+def aliases(name: str) -> set:
+    """Return the normalized forms of an item's full name."""
+    forms = _forms(name)
+    match = _SUFFIX.match(name.strip())
+    if match:
+        forms |= _forms(f"{match.group('comma') or match.group('paren')} {match.group('head')}")
+    return forms
+
+
+def short_aliases(name: str) -> set:
+    """Return the normalized forms of an item's name without its ", Long" or "(50 ft)" suffix."""
+    match = _SUFFIX.match(name.strip())
+    return _forms(match.group("head")) if match else set()
+
+
+class EquipmentItem:
+    """One item from an equipment file, with the fields the game uses typed."""
+
+    __slots__ = ("name", "category", "cost", "damage", "ac", "aac", "weight", "description", "extra")
+
+    # JSON key -> attribute name, for the fields the record types
+    FIELDS = ("name", "cost", "damage", "ac", "aac", "weight", "description")
+
+    def __init__(self, name: str, category: str, cost: int = 0, damage: str = None, ac: str = None, aac: str = None,
+                 weight=None, description: str = None, extra: dict = None):
+        """
+        Args:
+            name: The item's name
+            category: The equipment file it comes from (e.g. "ranged_weapons")
+            cost: Price in credits
+            damage: Damage dice for weapons (e.g. "1d6+1")
+            ac: Descending armor class bonus for armor and shields (e.g. "-2")
+            aac: Ascending armor class bonus (e.g. "+2")
+            weight: Weight in pounds
+            description: Flavor text
+            extra: Every other field of the entry (rof, range, ...)
+        """
+        self.name = name
+        self.category = category
+        self.cost = cost
+        self.damage = damage
+        self.ac = ac
+        self.aac = aac
+        self.weight = weight
+        self.description = description
+        self.extra = extra or {}
+
+    @classmethod
+    def from_dict(cls, category: str, data: dict) -> "EquipmentItem":
+        extra = {key: value for key, value in data.items() if key not in cls.FIELDS}
+        return cls(data["name"], category, data.get("cost", 0), data.get("damage"), data.get("ac"), data.get("aac"),
+                   data.get("weight"), data.get("description"), extra)
+
+    def to_dict(self) -> dict:
+        """Return the entry in the equipment file schema (fields that were absent stay absent)."""
+        data = {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+        data.update(self.extra)
+        return data
+
+    def __repr__(self):
+        return f"EquipmentItem({self.name!r}, category={self.category!r}, cost={self.cost})"
+
+
+class EquipmentCatalog:
+    """Every equipment item, indexed by exact name, normalized alias and trigram."""
+
+    def __init__(self, datasets: dict):
+        """
+        Args:
+            datasets: {category file name: {wrapper key: [item, ...]}}, as in the data snapshot
+        """
+        self.items = []  # EquipmentItems, in file order
+        self.by_category = {}  # category -> EquipmentItems, in file order
+        self.by_name = {}
+        self.by_alias = {}
+        self.grams = []  # Trigram set of each item's normalized name
+        self.index = defaultdict(list)  # trigram -> item ids
+
+        for category, data in datasets.items():
+            if not data:
+                continue
+            self.by_category[category] = []
+            for entries in data.values():
+                for entry in entries:
+                    if isinstance(entry, dict) and entry.get("name"):
+                        self._add(EquipmentItem.from_dict(category, entry))
+
+        # Full-name aliases first, so a short alias never shadows another item's name
+        for alias_forms in (aliases, short_aliases):
+            added, ambiguous = {}, set()
+            for item_id, item in enumerate(self.items):
+                for alias in alias_forms(item.name):
+                    if alias in self.by_alias:
+                        continue
+                    if added.setdefault(alias, item_id) != item_id:
+                        ambiguous.add(alias)
+            self.by_alias.update((alias, item_id) for alias, item_id in added.items() if alias not in ambiguous)
+
+    def _add(self, item: EquipmentItem):
+        item_id = len(self.items)
+        self.items.append(item)
+        self.by_category[item.category].append(item)
+        self.by_name.setdefault(item.name, item_id)
+        grams = trigrams(normalize(item.name))
+        self.grams.append(grams)
+        for gram in grams:
+            self.index[gram].append(item_id)
+
+    def __len__(self):
+        return len(self.items)
+
+    def exact(self, name: str):
+        """Return the item with exactly this name or one of its aliases, or None."""
+        item_id = self.by_name.get(name)
+        if item_id is None:
+            normal = normalize(name)
+            item_id = self.by_alias.get(normal)
+            if item_id is None:
+                item_id = self.by_alias.get(normal.replace(" ", ""))
+        return None if item_id is None else self.items[item_id]
+
+    def scored(self, name: str) -> list:
+        """
+        Score the items sharing a trigram with the name.
+
+        Trigrams found in many item names (" mk", "ser") are only used to
+        find candidates when the name has no rarer trigram, so a lookup
+        touches a few short posting lists even in a large catalog.
+
+        Returns:
+            [(similarity, item id), ...] unsorted, where similarity is the
+            Dice coefficient of the two names' trigram sets (0.0-1.0)
+        """
+        grams = trigrams(normalize(name))
+        common = max(COMMON_TRIGRAM_MIN, len(self.items) // COMMON_TRIGRAM_SHARE)
+        postings = [self.index[gram] for gram in grams if gram in self.index]
+        rare = [posting for posting in postings if len(posting) <= common]
+        candidates = set().union(*(rare or postings))
+        return [
+            (2 * len(grams & self.grams[item_id]) / (len(grams) + len(self.grams[item_id])), item_id)
+            for item_id in candidates
+        ]
+
+    def find(self, name: str) -> tuple:
+        """
+        Resolve an item name to the item meant.
+
+        Returns:
+            (item, score): score is 1.0 for exact and alias matches, otherwise
+            the best trigram similarity; (None, 0.0) if nothing shares a trigram
+            with the name. Callers decide whether a low score is close enough
+            (see MATCH_THRESHOLD).
+        """
+        item = self.exact(name)
+        if item is not None:
+            return item, 1.0
+        scored = self.scored(name)
+        if not scored:
+            return None, 0.0
+        # Ties go to the item listed first
+        score, item_id = max(scored, key=lambda pair: (pair[0], -pair[1]))
+        return self.items[item_id], score
+
+    def search(self, query: str = "", k: int = 5, category: str = None, max_cost: int = None) -> list:
+        """
+        Return the k best matches for a query, best first.
+
+        Args:
+            query: Item name or part of one; empty to list the category cheapest first
+            k: Maximum number of results
+            category: Only items from this category key ("armor", "ranged weapons") or
+                CATEGORY_ALIASES entry ("weapons" for both melee and ranged)
+            max_cost: Only items costing at most this many credits
+
+        Returns:
+            [(item, score), ...], score 1.0 for an exact or alias match
+        """
+        wanted = None
+        if category:
+            key = normalize(category).replace(" ", "_")
+            wanted = {key} if key in self.by_category else set(CATEGORY_ALIASES.get(key, ()))
+
+        def allowed(item_id):
+            item = self.items[item_id]
+            if wanted is not None and item.category not in wanted:
+                return False
+            return max_cost is None or item.cost <= max_cost
+
+        if not normalize(query or ""):
+            ranked = sorted((item_id for item_id in range(len(self.items)) if allowed(item_id)),
+                            key=lambda item_id: (self.items[item_id].cost, item_id))
+            return [(self.items[item_id], 0.0) for item_id in ranked[:k]]
+
+        scored = {item_id: score for score, item_id in self.scored(query) if score >= SEARCH_MIN_SCORE}
+        exact = self.exact(query)
+        if exact is not None:
+            scored[self.by_name[exact.name]] = 1.0
+        ranked = sorted((item_id for item_id in scored if allowed(item_id)),
+                        key=lambda item_id: (-scored[item_id], item_id))
+        return [(self.items[item_id], scored[item_id]) for item_id in ranked[:k]]
+
+    def resolve(self, name: str, k: int = 5) -> tuple:
+        """
+        Resolve a name for a purchase: the item meant, or candidates to choose from.
+
+        A fuzzy match is only taken as meant when it reaches MATCH_THRESHOLD
+        and clearly beats the runner-up ("grenade" matches two grenades
+        about equally, so both are offered instead).
+
+        Returns:
+            (item, []) when the name resolves, otherwise (None, search() results)
+        """
+        item = self.exact(name)
+        if item is not None:
+            return item, []
+        candidates = self.search(name, k=max(k, 2))
+        if candidates:
+            best = candidates[0][1]
+            runner_up = candidates[1][1] if len(candidates) > 1 else 0.0
+            if best >= MATCH_THRESHOLD and best - runner_up >= AMBIGUOUS_MARGIN:
+                return candidates[0][0], []
+        return None, candidates[:k]
+
+
+_catalog = None
+_catalog_datasets = None
+_catalog_checked = 0.0
+_catalog_lock = threading.Lock()
+
+
+def _same_datasets(a: dict, b: dict) -> bool:
+    return a.keys() == b.keys() and all(a[name] is b[name] for name in a)
+
+
+def get_equipment_catalog(force_check: bool = False) -> EquipmentCatalog:
+    """
+    Return the process-wide catalog, shared by character creation and the shop tools.
+
+    It is built from the data snapshot on first use and rebuilt when an
+    equipment dataset in the snapshot changes, which is checked at most every
+    CATALOG_CHECK_SECONDS (or right away with force_check). Edits to other
+    folders reuse the same catalog.
+    """
+    global _catalog, _catalog_datasets, _catalog_checked
+    now = time.monotonic()
+    if _catalog is not None and not force_check and now - _catalog_checked < CATALOG_CHECK_SECONDS:
+        return _catalog
+    with _catalog_lock:
+        datasets = get_data_snapshot().folder(EQUIPMENT_FOLDER)
+        if _catalog is None or not _same_datasets(datasets, _catalog_datasets):
+            _catalog = EquipmentCatalog(datasets)
+            _catalog_datasets = dict(datasets)
+        _catalog_checked = now
+        return _catalog
+
+
+def _reload(paths):
+    """Rebuild a loaded catalog in the background as soon as an equipment file changes."""
+    if _catalog is not None:
+        get_equipment_catalog(force_check=True)
+
+
+add_reload_hook((EQUIPMENT_FOLDER,), _reload)
@@ -0,0 +1,109 @@
+"""
+Write-ahead journal for the JSON state backend.
+
+All mutations from one tool call (or one model round, see
+StateBackend.batch) are collected in memory and committed as a single
+journal record: one write and one fsync. The JSON documents are updated
+afterwards and fsynced (documents, log files and their directories), and
+only then is the journal emptied. If the process or the machine dies in
+between, the next start replays the journal so a purchase can never leave
+credits deducted without the item in the inventory.
+
+Every operation in a record is safe to apply twice: "set" operations
+overwrite a value and "append" operations carry the log position they
+were written at, so replay skips appends that already reached the log.
+"""
+import json
+import os
+
+# Configuration
+JOURNAL_FILENAME = "journal.jsonl"
+
+
+def fsync_file(path: str):
+    """Flush a file's contents to disk."""
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def fsync_directory(path: str):
+    """Make new, renamed or replaced entries of a directory durable (skipped where directories cannot be opened)."""
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows, where the rename itself is durable
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class WriteJournal:
+    """A single append-only journal file holding committed-but-unapplied records."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._sequence = 0
+
+    def commit(self, operations: list):
+        """
+        Durably record one group of operations.
+
+        Args:
+            operations: A list of operation dicts (see JsonStateBackend._apply_operation)
+        """
+        if not operations:
+            return
+        self._sequence += 1
+        record = json.dumps({"seq": self._sequence, "ops": operations}) + "\n"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        created = not os.path.exists(self.path)
+        with open(self.path, "a") as f:
+            f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        if created:
+            fsync_directory(os.path.dirname(self.path))
+
+    def pending(self) -> list:
+        """Return the operation groups still in the journal, oldest first."""
+        records = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # Torn write: the commit never completed
+                    try:
+                        records.append(json.loads(line)["ops"])
+                    except (json.JSONDecodeError, KeyError):
+                        break
+        except FileNotFoundError:
+            pass
+        return records
+
+    def checkpoint(self):
+        """Forget every record; call only once their changes are in the JSON files and fsynced."""
+        try:
+            if os.path.getsize(self.path):
+                with open(self.path, "w"):
+                    pass
+        except FileNotFoundError:
+            pass
+
+    def replay(self, apply) -> int:
+        """
+        Re-apply every pending record, then checkpoint.
+
+        Args:
+            apply: Callable taking one list of operations
+
+        Returns:
+            The number of records replayed
+        """
+        records = self.pending()
+        for operations in records:
+            apply(operations)
+        self.checkpoint()
+        return len(records)
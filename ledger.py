@@ -0,0 +1,581 @@
+"""
+Append-only transaction ledger stored as rotated JSONL segments.
+
+Each transaction is one line in ephemeral/ledger/segment_NNNNNN.jsonl. A
+sidecar file next to every segment (segment_NNNNNN.idx) records where each
+line starts, when it happened, its type, the characters and item it
+concerns and the credits and quantity it moved, so queries can jump
+straight to matching records instead of reading the whole history.
+Appending costs one line in each file, whatever the ledger size. When a
+segment fills up, its part of the in-memory index is also saved in columns
+(segment_NNNNNN.pack.json), so opening a large ledger loads one JSON
+document per full segment instead of parsing every sidecar line; only the
+open segment is read line by line.
+
+In memory every record has a position (its append order). Posting lists
+of positions per character, type and item are kept sorted. Timestamps are
+fixed-width UTC strings (ledger_timestamp) and the JSON backend never
+commits an entry stamped earlier than the one before it, so a query
+narrows each list to the time range with two binary searches and
+intersects the shortest list against the others. A ledger written out of
+order by an older version is still answered correctly, by checking each
+candidate's timestamp instead. Counting and totalling never touch the
+segment files.
+"""
+import bisect
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from journal import fsync_directory, fsync_file
+
+# Configuration
+LEDGER_DIR = "ephemeral/ledger"
+SEGMENT_MAX_BYTES = 1024 * 1024  # Start a new segment after ~1 MB
+SEGMENT_PREFIX = "segment_"
+TIMESTAMP_LENGTH = len("2025-01-01T00:00:00.000000Z")
+PACK_SUFFIX = ".pack.json"  # Columnar index of a full segment, loaded in one json.load
+
+
+def ledger_characters(entry: dict) -> list:
+    """Return every character a ledger entry concerns (transfers name two)."""
+    names = [entry.get("character"), entry.get("from"), entry.get("to")]
+    return [name for name in names if name]
+
+
+def ledger_item(entry: dict) -> str:
+    """Return the item a ledger entry concerns, if any."""
+    return entry.get("item") or None
+
+
+def ledger_amount(entry: dict) -> int:
+    """Return the credits a ledger entry moved (purchases record a total_cost)."""
+    amount = entry.get("total_cost", entry.get("amount", 0))
+    return amount if isinstance(amount, (int, float)) else 0
+
+
+def ledger_quantity(entry: dict) -> int:
+    """Return how many items a ledger entry moved (0 when it moved none)."""
+    if not ledger_item(entry):
+        return 0
+    quantity = entry.get("quantity", 1)
+    return quantity if isinstance(quantity, int) else 0
+
+
+def item_key(item: str) -> str:
+    """Return the case-insensitive key items are indexed under."""
+    return item.strip().lower()
+
+
+def _narrow(positions: list, lo: int, hi: int) -> tuple:
+    """Return (list, start, stop) bounding the part of a sorted position list within [lo, hi)."""
+    return positions, bisect.bisect_left(positions, lo), bisect.bisect_left(positions, hi)
+
+
+def _intersect(spans: list) -> list:
+    """
+    Intersect sorted position lists, each given as a (list, start, stop) span.
+
+    Walks the shortest span and binary-searches the others for each of its
+    positions, so the cost follows the rarest filter rather than the ledger size.
+    """
+    spans = sorted(spans, key=lambda span: span[2] - span[1])
+    positions, start, stop = spans[0]
+    result = positions[start:stop]
+    for positions, start, stop in spans[1:]:
+        matched = []
+        for position in result:
+            start = bisect.bisect_left(positions, position, start, stop)
+            if start == stop:
+                break
+            if positions[start] == position:
+                matched.append(position)
+        result = matched
+        if not result:
+            break
+    return result
+
+
+def ledger_timestamp(moment: datetime = None) -> str:
+    """
+    Return a ledger timestamp: UTC, always with microseconds, so they compare correctly as strings.
+
+    Args:
+        moment: A naive UTC or timezone-aware datetime; defaults to now
+    """
+    if moment is None:
+        moment = datetime.utcnow()
+    elif moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.isoformat(timespec="microseconds") + "Z"
+
+
+def normalize_timestamp(timestamp: str) -> str:
+    """Rewrite an older, variable-width timestamp ("...T14:30:00Z") in the fixed-width format."""
+    if not timestamp or (len(timestamp) == TIMESTAMP_LENGTH and timestamp[19] == "."):
+        return timestamp or ""
+    try:
+        return ledger_timestamp(datetime.fromisoformat(timestamp.rstrip("Z")))
+    except ValueError:
+        return timestamp
+
+
+# Precision of a user supplied bound (by its length without the Z) -> how far an end bound reaches
+_BOUND_PRECISION = {10: timedelta(days=1), 16: timedelta(minutes=1), 19: timedelta(seconds=1)}
+
+
+def normalize_time_bound(value: str, end: bool = False) -> str:
+    """
+    Turn a user supplied date or datetime into a comparable ledger timestamp.
+
+    Args:
+        value: A date ("2025-05-01") or ISO datetime, with or without a trailing Z
+        end: Treat the bound as inclusive of its last unit: a bare date covers
+            the whole day, "14:30" the whole minute, "14:30:05" the whole second
+
+    Returns:
+        An ISO timestamp string in the ledger's format, or None if value is empty
+    """
+    if not value:
+        return None
+    text = value.strip().rstrip("Z")
+    moment = datetime.fromisoformat(text)
+    if end and len(text) in _BOUND_PRECISION:
+        moment = moment + _BOUND_PRECISION[len(text)] - timedelta(microseconds=1)
+    return ledger_timestamp(moment)
+
+
+class SegmentedLedger:
+    """An append-only ledger split into segments with a per-character index."""
+
+    def __init__(self, directory: str = LEDGER_DIR, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.RLock()
+        self._loaded = False
+        # Per record, in append order: where it lives and what the indexes need
+        self._segments = []      # Segment number
+        self._offsets = []       # Byte offset in the segment
+        self._timestamps = []
+        self._latest = ""        # Highest timestamp so far
+        self._ordered = True     # False if some record is stamped earlier than one before it
+        self._types = []
+        self._amounts = []
+        self._quantities = []
+        self._senders = {}       # position -> sender, for transfers only
+        self._by_character = {}
+        self._by_type = {}
+        self._by_item = {}
+        self._segment = 1
+        self._segment_size = 0
+        # How far each segment's data and sidecar index have been read
+        self._indexed_ends = {}
+        self._index_offsets = {}
+        self._unsynced = set()   # Segments appended to since the last sync()
+        self._segment_starts = {}  # segment number -> position of its first record
+
+    # Paths
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:06d}.jsonl")
+
+    def _index_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:06d}.idx")
+
+    def _pack_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:06d}{PACK_SUFFIX}")
+
+    def _segment_numbers(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        numbers = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith(SEGMENT_PREFIX) and filename.endswith(".jsonl"):
+                numbers.append(int(filename[len(SEGMENT_PREFIX):-len(".jsonl")]))
+        return sorted(numbers)
+
+    # Index maintenance
+    def _add_to_index(self, segment, offset, record):
+        position = len(self._offsets)
+        self._segment_starts.setdefault(segment, position)
+        self._segments.append(segment)
+        self._offsets.append(offset)
+        timestamp = normalize_timestamp(record.get("ts"))
+        if timestamp < self._latest:
+            self._ordered = False
+        else:
+            self._latest = timestamp
+        self._timestamps.append(timestamp)
+        self._types.append(record.get("type"))
+        self._amounts.append(record.get("amt", 0))
+        self._quantities.append(record.get("qty", 0))
+        if record.get("from"):
+            self._senders[position] = record["from"]
+        for name in record.get("chars", []):
+            self._by_character.setdefault(name, []).append(position)
+        if record.get("type"):
+            self._by_type.setdefault(record["type"], []).append(position)
+        if record.get("item"):
+            self._by_item.setdefault(item_key(record["item"]), []).append(position)
+
+    def _load(self):
+        """Read the sidecar indexes once, reindexing any segment tail they miss."""
+        if not self._loaded:
+            self._catch_up(repair=True)
+            self._loaded = True
+
+    def refresh(self, repair: bool = False):
+        """
+        Pick up entries appended by another process since the last look.
+
+        Args:
+            repair: Also index segment lines that have no index entry yet and
+                cut off torn index lines. Only safe while holding the store
+                lock, since another process may be halfway through an append.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            else:
+                self._catch_up(repair)
+
+    def _catch_up(self, repair):
+        numbers = self._segment_numbers()
+        for number in numbers:
+            if number < self._segment:
+                continue  # Older segments are complete and already indexed
+            full = number != numbers[-1]
+            if full and number not in self._indexed_ends:
+                pack = self._read_pack(number)
+                if pack is not None:
+                    self._add_pack(number, pack)
+                    continue
+            indexed_end = self._indexed_ends.get(number, 0)
+            index_offset = self._index_offsets.get(number, 0)
+            records = []
+            try:
+                with open(self._index_path(number), "rb") as f:
+                    f.seek(index_offset)
+                    for raw in f:
+                        if not raw.endswith(b"\n"):
+                            break  # Not fully written yet (or torn by a crash)
+                        try:
+                            record = json.loads(raw)
+                        except json.JSONDecodeError:
+                            break
+                        if "amt" not in record:
+                            records = None  # Written before item/amount indexing; rebuild below
+                            break
+                        records.append(record)
+                        index_offset += len(raw)
+            except FileNotFoundError:
+                pass
+
+            if records is None:
+                if not repair:
+                    continue
+                os.remove(self._index_path(number))
+                records, index_offset = [], 0
+            for record in records:
+                self._add_to_index(number, record["off"], record)
+                indexed_end = record["end"]
+
+            # Lines appended after the index was last written (e.g. a crash in
+            # between) are indexed again from the segment itself.
+            segment_size = os.path.getsize(self._segment_path(number))
+            if repair and segment_size > indexed_end:
+                index_path = self._index_path(number)
+                if os.path.exists(index_path) and os.path.getsize(index_path) > index_offset:
+                    with open(index_path, "r+b") as f:
+                        f.truncate(index_offset)
+                indexed_end = self._reindex_tail(number, indexed_end)
+                index_offset = os.path.getsize(index_path)
+                if segment_size > indexed_end:
+                    # Drop a torn final line so the next append starts cleanly
+                    with open(self._segment_path(number), "r+b") as f:
+                        f.truncate(indexed_end)
+                    segment_size = indexed_end
+
+            self._indexed_ends[number] = indexed_end
+            self._index_offsets[number] = index_offset
+            self._segment = number
+            self._segment_size = segment_size
+            if full and repair:
+                self._write_pack(number)
+
+    def _reindex_tail(self, number, start) -> int:
+        """Index complete segment lines from start on; returns where indexing stopped."""
+        with open(self._segment_path(number), "rb") as segment, open(self._index_path(number), "a") as index:
+            segment.seek(start)
+            offset = start
+            for raw in segment:
+                end = offset + len(raw)
+                if not raw.endswith(b"\n"):
+                    break  # Incomplete write; leave it out of the index
+                try:
+                    entry = json.loads(raw)
+                except json.JSONDecodeError:
+                    offset = end
+                    continue
+                record = self._index_record(entry, offset, end)
+                index.write(json.dumps(record) + "\n")
+                self._add_to_index(number, offset, record)
+                offset = end
+        return offset
+
+    def _read_pack(self, number):
+        """Return a full segment's packed index if it still matches the segment and sidecar on disk, else None."""
+        try:
+            with open(self._pack_path(number), "r") as f:
+                pack = json.load(f)
+            if (pack["end"] != os.path.getsize(self._segment_path(number))
+                    or pack["index_bytes"] != os.path.getsize(self._index_path(number))):
+                return None
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return pack
+
+    def _add_pack(self, number, pack):
+        """Append a packed segment's records and postings to the in-memory index."""
+        base = len(self._offsets)
+        self._segment_starts[number] = base
+        self._segments.extend([number] * len(pack["off"]))
+        self._offsets.extend(pack["off"])
+        timestamps = pack["ts"]
+        if timestamps:
+            if not pack["ordered"] or timestamps[0] < self._latest:
+                self._ordered = False
+            self._latest = max(self._latest, pack["latest"])
+        self._timestamps.extend(timestamps)
+        self._types.extend(pack["type"])
+        self._amounts.extend(pack["amt"])
+        self._quantities.extend(pack["qty"])
+        self._senders.update((base + int(position), sender) for position, sender in pack["from"].items())
+        for field, postings in (("chars", self._by_character), ("types", self._by_type), ("items", self._by_item)):
+            for key, positions in pack[field].items():
+                postings.setdefault(key, []).extend([base + position for position in positions])
+        self._indexed_ends[number] = pack["end"]
+        self._index_offsets[number] = pack["index_bytes"]
+        self._segment = number
+        self._segment_size = pack["end"]
+
+    def _write_pack(self, number):
+        """Save a full segment's part of the in-memory index so later loads skip parsing its sidecar lines."""
+        start, stop = self._segment_starts.get(number, len(self._offsets)), len(self._offsets)
+
+        def local(postings):
+            packed = {}
+            for key, positions in postings.items():
+                lo, hi = bisect.bisect_left(positions, start), bisect.bisect_left(positions, stop)
+                if lo < hi:
+                    packed[key] = [position - start for position in positions[lo:hi]]
+            return packed
+
+        timestamps = self._timestamps[start:stop]
+        pack = {
+            "end": self._indexed_ends[number],
+            "index_bytes": self._index_offsets[number],
+            "off": self._offsets[start:stop],
+            "ts": timestamps,
+            "ordered": all(a <= b for a, b in zip(timestamps, timestamps[1:])),
+            "latest": max(timestamps, default=""),
+            "type": self._types[start:stop],
+            "amt": self._amounts[start:stop],
+            "qty": self._quantities[start:stop],
+            "from": {str(position - start): self._senders[position]
+                     for position in range(start, stop) if position in self._senders},
+            "chars": local(self._by_character),
+            "types": local(self._by_type),
+            "items": local(self._by_item),
+        }
+        path = self._pack_path(number)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(pack, f, separators=(",", ":"))
+            os.replace(temp_path, path)
+        except OSError:
+            pass  # Only an optimization; the sidecar index is still there
+
+    @staticmethod
+    def _index_record(entry, offset, end) -> dict:
+        record = {
+            "off": offset,
+            "end": end,
+            "ts": entry.get("timestamp"),
+            "type": entry.get("type"),
+            "chars": ledger_characters(entry),
+            "item": ledger_item(entry),
+            "amt": ledger_amount(entry),
+            "qty": ledger_quantity(entry),
+        }
+        if entry.get("from"):
+            record["from"] = entry["from"]
+        return record
+
+    # Public API
+    def append(self, entry: dict):
+        """Append one transaction to the current segment and its index."""
+        with self._lock:
+            self._load()
+            os.makedirs(self.directory, exist_ok=True)
+            line = (json.dumps(entry) + "\n").encode("utf-8")
+            if self._segment_size and self._segment_size + len(line) > self.segment_max_bytes:
+                self._write_pack(self._segment)
+                self._segment += 1
+                self._segment_size = 0
+
+            offset = self._segment_size
+            record = self._index_record(entry, offset, offset + len(line))
+            index_line = (json.dumps(record) + "\n").encode("utf-8")
+            with open(self._segment_path(self._segment), "ab") as f:
+                f.write(line)
+            with open(self._index_path(self._segment), "ab") as f:
+                f.write(index_line)
+
+            self._unsynced.add(self._segment)
+            self._segment_size += len(line)
+            self._indexed_ends[self._segment] = self._segment_size
+            self._index_offsets[self._segment] = self._index_offsets.get(self._segment, 0) + len(index_line)
+            self._add_to_index(self._segment, offset, record)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def sync(self):
+        """fsync the segments appended to since the last call (the sidecar indexes are rebuilt if lost)."""
+        with self._lock:
+            for number in sorted(self._unsynced):
+                fsync_file(self._segment_path(number))
+            if self._unsynced:
+                fsync_directory(self.directory)
+            self._unsynced.clear()
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._offsets)
+
+    def has_segments(self) -> bool:
+        """Return whether anything was ever appended, without loading the index."""
+        return bool(self._segment_numbers())
+
+    def latest_timestamp(self) -> str:
+        """Return the highest timestamp in the ledger ("" if it is empty)."""
+        with self._lock:
+            self._load()
+            return self._latest
+
+    def read_all(self) -> list:
+        """Return every entry in append order."""
+        with self._lock:
+            self._load()
+            entries = []
+            for number in self._segment_numbers():
+                with open(self._segment_path(number), "r") as f:
+                    entries.extend(json.loads(line) for line in f if line.strip())
+            return entries
+
+    def _matching_positions(self, character, entry_type, item, since, until):
+        """Return the sorted positions of every record matching all the filters."""
+        positions = self._filtered_positions(character, entry_type, item, since, until)
+        if self._ordered or not (since or until):
+            return positions
+        # Out-of-order records: the range was not narrowed by time, so check each candidate
+        timestamps = self._timestamps
+        return [p for p in positions
+                if (not since or timestamps[p] >= since) and (not until or timestamps[p] <= until)]
+
+    def _filtered_positions(self, character, entry_type, item, since, until):
+        if self._ordered:
+            lo = bisect.bisect_left(self._timestamps, since) if since else 0
+            hi = bisect.bisect_right(self._timestamps, until) if until else len(self._offsets)
+        else:
+            lo, hi = 0, len(self._offsets)
+
+        spans = []
+        if character is not None:
+            spans.append(_narrow(self._by_character.get(character, []), lo, hi))
+        if item is not None:
+            spans.append(_narrow(self._by_item.get(item_key(item), []), lo, hi))
+        if entry_type is not None and not spans:
+            spans.append(_narrow(self._by_type.get(entry_type, []), lo, hi))
+            entry_type = None
+        if not spans:
+            return range(lo, max(lo, hi))
+
+        positions = _intersect(spans)
+        if entry_type is not None:
+            # Types are few and broad, so checking each record beats intersecting
+            types = self._types
+            positions = [p for p in positions if types[p] == entry_type]
+        return positions
+
+    def _read_records(self, positions) -> list:
+        """Seek to and parse the given records, opening each segment once."""
+        entries = []
+        handles = {}
+        try:
+            for position in positions:
+                segment, offset = self._segments[position], self._offsets[position]
+                if segment not in handles:
+                    handles[segment] = open(self._segment_path(segment), "rb")
+                handle = handles[segment]
+                handle.seek(offset)
+                entries.append(json.loads(handle.readline()))
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return entries
+
+    def query(self, character: str = None, entry_type: str = None, since: str = None, until: str = None,
+              offset: int = 0, limit: int = 10, item: str = None) -> tuple:
+        """
+        Find ledger entries, newest first.
+
+        Args:
+            character: Only entries involving this character
+            entry_type: Only entries of this type (add, spend, purchase, transfer)
+            since: Earliest timestamp to include (ISO string)
+            until: Latest timestamp to include (ISO string)
+            offset: Number of matching entries to skip (for paging)
+            limit: Maximum number of entries to return
+            item: Only entries for this item (case-insensitive)
+
+        Returns:
+            A (entries, total_matches) tuple
+        """
+        with self._lock:
+            self._load()
+            positions = self._matching_positions(character, entry_type, item, since, until)
+            total = len(positions)
+            start = max(0, total - offset - limit)
+            stop = max(0, total - offset)
+            page = list(positions[start:stop])[::-1]
+            return self._read_records(page), total
+
+    def totals(self, character: str = None, entry_type: str = None, since: str = None, until: str = None,
+               item: str = None) -> dict:
+        """
+        Count matching entries and add up what they moved, per entry type.
+
+        Takes the same filters as query() and reads only the in-memory index.
+        When a character is given, their transfers are split into
+        "transfer_out" and "transfer_in".
+
+        Returns:
+            {entry type: {"count": n, "credits": total, "quantity": total}}
+        """
+        with self._lock:
+            self._load()
+            summary = {}
+            for position in self._matching_positions(character, entry_type, item, since, until):
+                kind = self._types[position]
+                if kind == "transfer" and character is not None:
+                    kind = "transfer_out" if self._senders.get(position) == character else "transfer_in"
+                bucket = summary.setdefault(kind, {"count": 0, "credits": 0, "quantity": 0})
+                bucket["count"] += 1
+                bucket["credits"] += self._amounts[position]
+                bucket["quantity"] += self._quantities[position]
+            return summary
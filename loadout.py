@@ -0,0 +1,343 @@
+"""
+Budget-constrained starting loadouts from the equipment catalog.
+
+Picking gear is a bounded knapsack: every item costs credits and is worth a
+class-aware utility score, and a loadout holds at most one body armor, one
+shield, one melee weapon, one ranged weapon (with its ammunition) and one of
+each kind of gear. LoadoutOptimizer solves it exactly with a dynamic program
+over credits that keeps the best few loadouts for every total cost, and
+returns the best overall:
+
+    optimizer = get_loadout_optimizer()
+    for loadout in optimizer.best("Pilot", 120, k=3):
+        print(loadout.utility, loadout.cost, loadout.names())
+
+Class data decides what a class may use: weapon_armor_restrictions in
+character_classes.json ("Light Armor only. Weapons: clubs, daggers, ...")
+is matched against item names, and ROLE_WEIGHTS shifts each class's
+priorities (a Pilot values ranged weapons and gear more than armor).
+Results for a class and budget are cached, so outfitting a batch of NPCs
+only solves each distinct class and budget once.
+"""
+import heapq
+import re
+import threading
+
+from data_snapshot import get_data_snapshot
+from data_watcher import add_reload_hook
+from equipment_catalog import EQUIPMENT_FOLDER, get_equipment_catalog, normalize
+
+# Configuration
+DEFAULT_LOADOUTS = 3  # Loadouts offered when gear is auto-assigned
+RESERVE_CREDITS = 10  # Credits auto-assigned gear always leaves unspent
+BODY_ARMOR = ("Light", "Medium", "Heavy")
+AMMO_FOR = {"bow": "Arrow (20)", "crossbow": "Bolt (20)", "firearm": "Bullet (20)", "laser": "Energy Cell (20)"}
+NO_AMMO_FACTOR = 0.3  # Share of a ranged weapon's utility without ammunition
+CONSUMABLE_FACTOR = 0.25  # Share of a single-use weapon's (grenade's) utility
+
+# Role multipliers per class; classes not listed use 1.0 for every role
+ROLE_WEIGHTS = {
+    "Aristocrat": {"melee": 0.8, "armor": 0.7, "gear": 1.4},
+    "Mercenary": {"ranged": 1.2, "armor": 1.2},
+    "Pilot": {"melee": 0.7, "ranged": 1.3, "armor": 0.8, "gear": 1.3},
+    "Star Knight": {"melee": 1.3},
+    "Void Knight": {"melee": 1.3},
+    "Alien Brute": {"melee": 1.4, "ranged": 0.7, "armor": 1.1},
+    "Space Savage": {"melee": 1.4, "armor": 1.1},
+    "Alien Mystic": {"armor": 0.8, "gear": 1.2},
+    "Servitor": {"gear": 1.2},
+    "Soldier": {"ranged": 1.2, "armor": 1.2},
+}
+
+# Utility of standard gear, by exact name or by name without its "(...)" suffix;
+# an equipment entry's own "utility" field takes precedence
+GEAR_UTILITY = {
+    "Med Kit": 6,
+    "Rations": 3,
+    "Backpack": 3,
+    "Communicator": 3,
+    "Communicator (Holographic)": 3.5,
+    "Tool Kit": 3,
+    "Breathing Mask": 3,
+    "Jet Pack": 4,
+    "Mini-Computer": 3,
+    "Clothing": 1.5,
+    "Clothing (Exposure)": 2.5,
+    "Clothing (Space Suit)": 4,
+    "Flashlight": 2,
+    "Rope": 2,
+    "Flares": 1.3,
+    "Sleeping Bag": 1.2,
+    "Tent": 1.4,
+    "Binoculars": 1.5,
+    "Dark Vision Binoculars": 2.5,
+    "Belt Pouch": 1,
+    "Timepiece": 0.5,
+    "Recording Stick": 0.5,
+    "Ammo Bandoleer": 0.4,
+}
+GEAR_DEFAULT_UTILITY = 1.0
+
+_DICE = re.compile(r"(\d*)d(\d+)([+-]\d+)?")
+
+
+def average_damage(damage: str) -> float:
+    """Return the average of a damage roll ("1d6+2" -> 5.5), or 0 if it is not dice notation."""
+    match = _DICE.fullmatch((damage or "").replace(" ", ""))
+    if not match:
+        return 0.0
+    num, die, mod = int(match.group(1) or 1), int(match.group(2)), int(match.group(3) or 0)
+    return num * (die + 1) / 2 + mod
+
+
+def _rate_of_fire(rof) -> float:
+    try:
+        if isinstance(rof, str) and "/" in rof:
+            top, bottom = rof.split("/", 1)
+            return int(top) / int(bottom)
+        return float(rof or 1)
+    except (ValueError, ZeroDivisionError):
+        return 1.0
+
+
+def _head(name: str) -> str:
+    """Return a name without its "(...)" or ", ..." suffix ("Bow, Long" -> "Bow")."""
+    return re.split(r"\s*[(,]", name, maxsplit=1)[0].strip()
+
+
+class ClassRules:
+    """What a class may use and how much it values each role."""
+
+    __slots__ = ("weapons", "light_armor_only", "shields", "ranged", "weights")
+
+    def __init__(self, char_class: str, restrictions: str, weapon_heads: set):
+        """
+        Args:
+            char_class: The class name (for ROLE_WEIGHTS)
+            restrictions: The class's weapon_armor_restrictions text
+            weapon_heads: Normalized weapon name heads in the catalog ("laser pistol", "dagger", ...)
+        """
+        text = normalize(restrictions or "")
+        unrestricted = not text or "no restrictions" in text
+        self.light_armor_only = "light armor" in text
+        self.shields = unrestricted or ("shield" in text and "no shield" not in text) or "armor" not in text
+        self.ranged = "melee weapons only" not in text
+        self.weapons = None if unrestricted or "melee weapons only" in text else self._allowed(text, weapon_heads)
+        self.weights = ROLE_WEIGHTS.get(char_class, {})
+
+    @staticmethod
+    def _allowed(text: str, weapon_heads: set) -> set:
+        """Find the weapon kinds named in the text, longest first so "mono swords" is not also "swords"."""
+        allowed = set()
+        for head in sorted(weapon_heads, key=len, reverse=True):
+            pattern = re.compile(rf"\b{re.escape(head)}s?\b")
+            if pattern.search(text):
+                allowed.add(head)
+                text = pattern.sub(" ", text)
+        return allowed
+
+    def allows_weapon(self, item) -> bool:
+        return self.weapons is None or normalize(_head(item.name)) in self.weapons
+
+    def weight(self, role: str) -> float:
+        return self.weights.get(role, 1.0)
+
+
+class Loadout:
+    """A set of items with their total cost and utility."""
+
+    __slots__ = ("items", "cost", "utility")
+
+    def __init__(self, items: tuple, cost: int, utility: float):
+        self.items = items
+        self.cost = cost
+        self.utility = utility
+
+    def names(self) -> list:
+        return [item.name for item in self.items]
+
+    def __repr__(self):
+        return f"Loadout({self.names()}, cost={self.cost}, utility={self.utility:.1f})"
+
+
+class LoadoutOptimizer:
+    """Solves loadouts for one catalog and set of class rules, caching results per class and budget."""
+
+    def __init__(self, catalog, classes: dict):
+        """
+        Args:
+            catalog: The EquipmentCatalog to choose from
+            classes: Class data by name, as in character_classes.json
+        """
+        self.catalog = catalog
+        self.classes = classes
+        self._lock = threading.Lock()
+        self._groups = {}  # class -> option groups
+        self._results = {}  # (class, budget, k) -> [Loadout]
+        self._weapon_heads = {
+            normalize(_head(item.name))
+            for category in ("melee_weapons", "ranged_weapons")
+            for item in catalog.by_category.get(category, ())
+        }
+
+    # Option groups: at most one option of each group goes into a loadout
+    def _groups_for(self, char_class: str) -> list:
+        groups = self._groups.get(char_class)
+        if groups is None:
+            groups = self._build_groups(char_class)
+            self._groups[char_class] = groups
+        return groups
+
+    def _build_groups(self, char_class: str) -> list:
+        rules = ClassRules(char_class, (self.classes.get(char_class) or {}).get("weapon_armor_restrictions"),
+                           self._weapon_heads)
+        by_category = self.catalog.by_category
+        by_name = {item.name: item for items in by_category.values() for item in items}
+        ammo_names = set(AMMO_FOR.values())
+
+        def aac(item):
+            try:
+                return int(str(item.aac or 0).replace("+", ""))
+            except ValueError:
+                return 0
+
+        body, shields = [], []
+        for item in by_category.get("armor", ()):
+            if item.name in BODY_ARMOR:
+                if not rules.light_armor_only or item.name == "Light":
+                    body.append(((item,), aac(item) * 5 * rules.weight("armor") - (item.weight or 0) / 15))
+            elif item.name.startswith("Shield") and rules.shields:
+                shields.append(((item,), aac(item) * 5 * rules.weight("armor")))
+
+        melee = [
+            ((item,), average_damage(item.damage) * 2 * rules.weight("melee"))
+            for item in by_category.get("melee_weapons", ()) if rules.allows_weapon(item)
+        ]
+
+        ranged = []
+        if rules.ranged:
+            for item in by_category.get("ranged_weapons", ()):
+                if item.name in ammo_names or not item.damage or not rules.allows_weapon(item):
+                    continue
+                utility = average_damage(item.damage) * 2 * rules.weight("ranged")
+                utility *= 0.75 + 0.25 * _rate_of_fire(item.extra.get("rof"))
+                if normalize(_head(item.name)) == "grenade":
+                    utility *= CONSUMABLE_FACTOR
+                ammo = next((by_name.get(name) for word, name in AMMO_FOR.items()
+                             if word in normalize(item.name).split()), None)
+                if ammo is None:
+                    ranged.append(((item,), utility))
+                else:
+                    ranged.append(((item,), utility * NO_AMMO_FACTOR))
+                    ranged.append(((item, ammo), utility))
+
+        gear_groups = {}
+        for item in by_category.get("standard_gear", ()):
+            utility = item.extra.get("utility")
+            if utility is None:
+                utility = GEAR_UTILITY.get(item.name, GEAR_UTILITY.get(_head(item.name), GEAR_DEFAULT_UTILITY))
+            gear_groups.setdefault(_head(item.name), []).append(((item,), utility * rules.weight("gear")))
+
+        groups = [body, shields, melee, ranged] + list(gear_groups.values())
+        return [
+            [(sum(item.cost for item in items), utility, items) for items, utility in group if utility > 0]
+            for group in groups if group
+        ]
+
+    def _solve(self, groups: list, budget: int, k: int) -> list:
+        # cells[cost] = up to k (utility, items) of loadouts costing exactly cost
+        cells = {0: [(0.0, ())]}
+        for group in groups:
+            merged = {cost: list(states) for cost, states in cells.items()}
+            for cost, states in cells.items():
+                for option_cost, option_utility, option_items in group:
+                    total = cost + option_cost
+                    if total > budget:
+                        continue
+                    cell = merged.setdefault(total, [])
+                    for utility, items in states:
+                        cell.append((utility + option_utility, items + option_items))
+            cells = {}
+            # A loadout beaten by k cheaper-or-equal ones can never reach the final top k
+            best = []
+            for cost in sorted(merged):
+                kept = []
+                for state in heapq.nlargest(k, merged[cost], key=lambda state: state[0]):
+                    if len(best) == k and state[0] <= best[0]:
+                        continue
+                    kept.append(state)
+                if kept:
+                    cells[cost] = kept
+                    for state in kept:
+                        if len(best) < k:
+                            heapq.heappush(best, state[0])
+                        else:
+                            heapq.heappushpop(best, state[0])
+        ranked = sorted(
+            ((utility, cost, items) for cost, states in cells.items() for utility, items in states),
+            key=lambda entry: (-entry[0], entry[1]),
+        )
+        return [Loadout(items, cost, utility) for utility, cost, items in ranked[:k] if items]
+
+    def best(self, char_class: str, credits: int, k: int = DEFAULT_LOADOUTS, reserve: int = RESERVE_CREDITS) -> list:
+        """
+        Return the k best loadouts a character of a class can buy.
+
+        Args:
+            char_class: The class name (e.g. "Pilot")
+            credits: Credits available
+            k: Number of loadouts to return
+            reserve: Credits to leave unspent
+
+        Returns:
+            [Loadout, ...], best first (highest utility, then cheapest)
+        """
+        budget = max(0, credits - reserve)
+        key = (char_class, budget, k)
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                result = self._solve(self._groups_for(char_class), budget, k)
+                self._results[key] = result
+            return result
+
+    def outfit(self, npcs, reserve: int = 0) -> list:
+        """
+        Outfit a batch of characters, each with its best loadout.
+
+        Args:
+            npcs: (class, credits) pairs
+            reserve: Credits each character leaves unspent
+
+        Returns:
+            The best Loadout for each pair, in order (None if nothing is affordable)
+        """
+        loadouts = []
+        for char_class, credits in npcs:
+            best = self.best(char_class, credits, k=1, reserve=reserve)
+            loadouts.append(best[0] if best else None)
+        return loadouts
+
+
+_optimizer = None
+_optimizer_lock = threading.Lock()
+
+
+def get_loadout_optimizer() -> LoadoutOptimizer:
+    """Return the process-wide optimizer, rebuilt when the equipment catalog is."""
+    global _optimizer
+    catalog = get_equipment_catalog()
+    with _optimizer_lock:
+        if _optimizer is None or _optimizer.catalog is not catalog:
+            classes = get_data_snapshot().get("character_creation", "character_classes", {}).get("classes", {})
+            _optimizer = LoadoutOptimizer(catalog, classes)
+        return _optimizer
+
+
+def _reload(paths):
+    """Rebuild a loaded optimizer right after the catalog picks up an equipment edit."""
+    if _optimizer is not None:
+        get_loadout_optimizer()
+
+
+add_reload_hook((EQUIPMENT_FOLDER,), _reload)
@@ -0,0 +1,273 @@
+"""
+Roster index of every character, for a fast character menu.
+
+ephemeral/roster.json keeps one small entry per character file, with the
+name, class, race, level and when the character was last played, so the
+menu never opens hundreds of character files just to list them. Saving or
+picking a character appends one line for that entry to
+ephemeral/roster_changes.jsonl instead of rewriting the roster; the
+changes are folded into roster.json at exit, or once COMPACT_AFTER_CHANGES
+of them have piled up.
+
+Files added or removed by hand are noticed through the characters/
+directory's modification time, and only those files are read. Each entry
+also keeps the modification time and size of its file, and the rows shown
+on a menu page are checked against their files, so a hand edit to an
+existing file shows up the next time its row is listed.
+
+    roster = get_roster()
+    entries, total = roster.list(prefix="za", offset=0, limit=10)
+"""
+import atexit
+import json
+import os
+import threading
+from datetime import datetime
+
+from state_locks import make_locks
+
+# Configuration
+ROSTER_PATH = "ephemeral/roster.json"
+CHANGES_SUFFIX = "_changes.jsonl"  # Change log next to the roster, e.g. ephemeral/roster_changes.jsonl
+CHARACTERS_DIR = "characters"
+ROSTER_LOCK_KEY = "roster"
+COMPACT_AFTER_CHANGES = 500  # Fold the change log into the roster once it has this many lines
+
+
+def _slug_for_file(filename: str) -> str:
+    return os.path.splitext(filename)[0]
+
+
+def _file_signature(path: str):
+    """Return [mtime_ns, size] of a file (the same signature CharacterRepository uses), or None."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def roster_entry(data: dict, fallback_name: str = None) -> dict:
+    """Return the roster fields of a character file's data."""
+    return {
+        "name": data.get("name") or fallback_name or "Unknown",
+        "class": data.get("class", "Unknown"),
+        "race": data.get("race", "Unknown"),
+        "level": data.get("level", 1),
+    }
+
+
+class RosterIndex:
+    """The roster file and its change log for one characters directory."""
+
+    def __init__(self, path: str = ROSTER_PATH, characters_dir: str = CHARACTERS_DIR):
+        self.path = path
+        self.changes_path = os.path.splitext(path)[0] + CHANGES_SUFFIX
+        self.characters_dir = characters_dir
+        self.locks = make_locks(os.path.dirname(path) or ".")
+        self._lock = threading.RLock()
+        self._roster = None        # roster.json with the change log applied
+        self._base_signature = None
+        self._changes_offset = 0   # Bytes of the change log already applied
+        self._changes_count = 0
+
+        atexit.register(self.compact)
+
+    # File access
+    def _read_base(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                roster = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            roster = None
+        if not roster or "characters" not in roster:
+            roster = {"directory_mtime": None, "characters": {}}
+        return roster
+
+    @staticmethod
+    def _apply(roster: dict, change: dict):
+        if "directory_mtime" in change:
+            roster["directory_mtime"] = change["directory_mtime"]
+        elif change.get("entry") is None:
+            roster["characters"].pop(change["slug"], None)
+        else:
+            roster["characters"][change["slug"]] = change["entry"]
+
+    def _load(self):
+        """Bring the in-memory roster up to date with the files, reading only new change lines."""
+        with self._lock:
+            base_signature = _file_signature(self.path)
+            changes_size = (_file_signature(self.changes_path) or [0, 0])[1]
+            if self._roster is None or base_signature != self._base_signature or changes_size < self._changes_offset:
+                # First load, or another session compacted the log
+                self._roster = self._read_base()
+                self._base_signature = base_signature
+                self._changes_offset = 0
+                self._changes_count = 0
+            if changes_size == self._changes_offset:
+                return self._roster
+            with open(self.changes_path, "rb") as f:
+                f.seek(self._changes_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Being written by another session; read it next time
+                    self._changes_offset += len(line)
+                    self._changes_count += 1
+                    try:
+                        self._apply(self._roster, json.loads(line))
+                    except (json.JSONDecodeError, KeyError):
+                        continue
+            return self._roster
+
+    def _record(self, changes: list):
+        """Apply changes to the roster and append them to the change log, holding the roster lock."""
+        if not changes:
+            return
+        with self._lock, self.locks.hold(ROSTER_LOCK_KEY):
+            roster = self._load()
+            for change in changes:
+                self._apply(roster, change)
+            os.makedirs(os.path.dirname(self.changes_path) or ".", exist_ok=True)
+            with open(self.changes_path, "ab") as f:
+                f.write("".join(json.dumps(change) + "\n" for change in changes).encode("utf-8"))
+                self._changes_offset = f.tell()
+            self._changes_count += len(changes)
+            if self._changes_count >= COMPACT_AFTER_CHANGES:
+                self._compact_locked()
+
+    def _compact_locked(self):
+        roster = self._load()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(roster, f, indent=2)
+        os.replace(temp_path, self.path)
+        with open(self.changes_path, "w"):
+            pass
+        self._base_signature = _file_signature(self.path)
+        self._changes_offset = 0
+        self._changes_count = 0
+
+    def compact(self):
+        """Fold the change log into roster.json (done at exit)."""
+        with self._lock:
+            if not (_file_signature(self.changes_path) or [0, 0])[1]:
+                return
+            with self.locks.hold(ROSTER_LOCK_KEY):
+                self._compact_locked()
+
+    # Keeping the index current
+    def _directory_mtime(self):
+        try:
+            return os.stat(self.characters_dir).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_entry(self, slug: str, last_played=None):
+        """Return the change that (re)reads one character file, or drops its entry if the file is gone."""
+        path = os.path.join(self.characters_dir, f"{slug}.json")
+        signature = _file_signature(path)
+        if signature is None:
+            return {"slug": slug, "entry": None}
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            data = {}
+        entry = dict(roster_entry(data, slug.replace("_", " ").title()), last_played=last_played, signature=signature)
+        return {"slug": slug, "entry": entry}
+
+    def _sync(self):
+        """Add entries for new character files and drop entries whose file is gone."""
+        directory_mtime = self._directory_mtime()
+        try:
+            filenames = [f for f in os.listdir(self.characters_dir) if f.endswith(".json") and not f.startswith("summary_")]
+        except FileNotFoundError:
+            filenames = []
+        entries = self._load()["characters"]
+        slugs = {_slug_for_file(f) for f in filenames}
+        changes = [{"slug": slug, "entry": None} for slug in entries if slug not in slugs]
+        changes += [self._read_entry(slug) for slug in sorted(slugs) if slug not in entries]
+        changes.append({"directory_mtime": directory_mtime})
+        self._record(changes)
+
+    def _validate(self, rows: list) -> bool:
+        """Re-read the rows whose file changed since it was indexed; returns True if any did."""
+        changes = []
+        for row in rows:
+            signature = _file_signature(os.path.join(self.characters_dir, f"{row['slug']}.json"))
+            if signature != row.get("signature"):
+                changes.append(self._read_entry(row["slug"], row.get("last_played")))
+        self._record(changes)
+        return bool(changes)
+
+    def update(self, slug: str, data: dict):
+        """Record a character's current name, class, race and level (called when its file is saved)."""
+        previous = self._load()["characters"].get(slug) or {}
+        entry = dict(roster_entry(data, slug.replace("_", " ").title()), last_played=previous.get("last_played"),
+                     signature=_file_signature(os.path.join(self.characters_dir, f"{slug}.json")))
+        self._record([{"slug": slug, "entry": entry}])
+
+    def touch(self, slug: str):
+        """Mark a character as just played."""
+        if slug not in self._load()["characters"]:
+            self._sync()
+        entry = self._load()["characters"].get(slug)
+        if entry is not None:
+            self._record([{"slug": slug, "entry": dict(entry, last_played=datetime.utcnow().isoformat() + "Z")}])
+
+    def entries(self) -> dict:
+        """Return {slug: entry} for every character, catching up with files added or removed by hand."""
+        if self._load()["directory_mtime"] != self._directory_mtime():
+            self._sync()
+        return self._load()["characters"]
+
+    def list(self, prefix: str = None, offset: int = 0, limit: int = None) -> tuple:
+        """
+        Return roster entries, most recently played first.
+
+        Only the returned rows are checked against their character files, so
+        a hand edit to a file is picked up when its row is listed.
+
+        Args:
+            prefix: Only names starting with this text (any word of the name, case-insensitive)
+            offset: Entries to skip, for paging
+            limit: Maximum entries to return (None for all)
+
+        Returns:
+            ([{"slug", "name", "class", "race", "level", "last_played"}, ...], total matching)
+        """
+        for attempt in range(2):
+            matches = [dict(entry, slug=slug) for slug, entry in self.entries().items()]
+            if prefix:
+                lowered = prefix.lower()
+                matches = [
+                    entry for entry in matches
+                    if entry["name"].lower().startswith(lowered)
+                    or any(word.startswith(lowered) for word in entry["name"].lower().split())
+                ]
+            # Never-played characters go last, alphabetically
+            matches.sort(key=lambda entry: entry["name"].lower())
+            matches.sort(key=lambda entry: entry["last_played"] or "", reverse=True)
+            end = None if limit is None else offset + limit
+            page = matches[offset:end]
+            # Rows re-read from their files may sort or filter differently; list once more
+            if attempt or not self._validate(page):
+                break
+        for row in page:
+            row.pop("signature", None)
+        return page, len(matches)
+
+
+_roster = None
+_roster_lock = threading.Lock()
+
+
+def get_roster() -> RosterIndex:
+    """Return the process-wide roster index."""
+    global _roster
+    if _roster is None:
+        with _roster_lock:
+            if _roster is None:
+                _roster = RosterIndex()
+    return _roster
@@ -3,21 +3,35 @@ import os
 import asyncio
 import re
 import random
-import glob
 from dotenv import load_dotenv
 from kani import Kani, chat_in_terminal
 from kani.engines.openai import OpenAIEngine
 from character_creation.name_generator import generate_full_name, suggest_names
+from state_store import get_store, character_lock
+from async_io import run_io
+from character_repository import get_characters
+from roster import get_roster
+from summary_cards import get_summary_cards
+from advancement_tables import get_advancement_tables
+from data_snapshot import get_data_snapshot
+from data_watcher import start_data_watcher
+from equipment_catalog import get_equipment_catalog
+from loadout import get_loadout_optimizer
+from dice import format_dice_roll, roll, roll_notation
+from character_model import attribute_modifier
 from tools import (
     add_inventory,
     remove_inventory,
+    apply_inventory_changes,
     show_inventory,
     add_credits,
     spend_credits,
     show_credits,
     buy_item,
+    search_equipment,
     transfer_credits,
     show_ledger,
+    query_ledger,
     roll_dice,
     start_scenario,
     log_scene,
@@ -25,42 +39,27 @@ from tools import (
     summarize_recent_chat,
     summarize_scene_log,
     skill_check,
+    group_skill_check,
     award_xp,
     show_xp,
     improve_attribute,
     show_advancement,
+    show_card,
     help_command,
     quit_game,
+    choose_character as choose_roster_character,
 )
 
-with open("character_creation/character_classes.json") as f:
-    classes_data = json.load(f)["classes"]
-
-with open("character_creation/character_races.json") as f:
-    races_data = json.load(f)["character_races"]
-
-# Helper function to get pronouns for a character
-def get_character_pronouns(character):
-    char_slug = character.lower().replace(" ", "_")
-    char_path = f"characters/{char_slug}.json"
-    try:
-        with open(char_path) as f:
-            char_data = json.load(f)
-        return char_data.get("pronouns", {
-            "subject": "they",
-            "object": "them",
-            "possessive_adjective": "their",
-            "possessive_pronoun": "theirs",
-            "reflexive": "themself"
-        })
-    except Exception:
-        return {
-            "subject": "they",
-            "object": "them",
-            "possessive_adjective": "their",
-            "possessive_pronoun": "theirs",
-            "reflexive": "themself"
-        }
+# Load .env up front so state settings apply before the store is opened
+load_dotenv()
+
+data_snapshot = get_data_snapshot()
+classes_data = data_snapshot.get("character_creation", "character_classes")["classes"]
+races_data = data_snapshot.get("character_creation", "character_races")["character_races"]
+
+# Pick up edits to equipment and advancement files without a restart
+start_data_watcher()
+
 
 async def generate_ai_backstory(name: str, char_class: str, char_race: str, char_alignment: str, attributes: dict, engine) -> str:
     """Generate an AI-crafted backstory based on character attributes and choices."""
@@ -127,19 +126,8 @@ async def generate_ai_backstory(name: str, char_class: str, char_race: str, char
     return response.strip()
 
 def load_equipment_data():
-    """Load all equipment data from JSON files in the equipment directory."""
-    equipment_data = {}
-    equipment_files = glob.glob("equipment/*.json")
-    
-    for file_path in equipment_files:
-        category = os.path.splitext(os.path.basename(file_path))[0]
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-            # Extract the array from the wrapper object
-            key = list(data.keys())[0]  # Get the first (and should be only) key
-            equipment_data[category] = data[key]
-    
-    return equipment_data
+    """Return {category: [EquipmentItem, ...]} from the shared equipment catalog (also used by /buy_item)."""
+    return get_equipment_catalog().by_category
 
 def display_equipment_menu(equipment_data, remaining_credits):
     """Display available equipment categories."""
@@ -166,98 +154,34 @@ def display_category_items(category_data, category_name):
     """Display items in a category with their costs and descriptions."""
     print(f"\n{category_name.replace('_', ' ').title()} Items:")
     for i, item in enumerate(category_data, 1):
-        print(f"{i}. {item['name']} - {item['cost']} credits")
-        if 'damage' in item:
-            print(f"   Damage: {item['damage']}")
-        if 'description' in item:
-            print(f"   Description: {item['description']}")
-        if 'weight' in item:
-            print(f"   Weight: {item['weight']}")
+        print(f"{i}. {item.name} - {item.cost} credits")
+        if item.damage is not None:
+            print(f"   Damage: {item.damage}")
+        if item.description is not None:
+            print(f"   Description: {item.description}")
+        if item.weight is not None:
+            print(f"   Weight: {item.weight}")
     print(f"{len(category_data) + 1}. Back to Gear Categories")
     return category_data
 
-def auto_assign_gear(equipment_data, starting_credits):
-    """Automatically assign gear based on weighted probabilities and budget."""
-    assigned_gear = []
-    total_cost = 0
-    
-    # Helper function to check if we can afford an item
-    def can_afford(item_cost):
-        return (total_cost + item_cost) <= (starting_credits - 10)
-    
-    # Armor selection (30% chance)
-    if random.random() < 0.3:
-        armor_weights = {'light': 0.7, 'medium': 0.2, 'heavy': 0.1}
-        armor_type = random.choices(list(armor_weights.keys()), 
-                                  list(armor_weights.values()))[0]
-        
-        # Filter armor by type and affordability
-        affordable_armor = [
-            item for item in equipment_data['armor']
-            if item.get('type', '').lower() == armor_type and can_afford(item['cost'])
-        ]
-        
-        if affordable_armor:
-            selected_armor = random.choice(affordable_armor)
-            assigned_gear.append(selected_armor)
-            total_cost += selected_armor['cost']
-    
-    # Melee weapon (80% chance)
-    if random.random() < 0.8:
-        affordable_melee = [
-            item for item in equipment_data['melee_weapons']
-            if can_afford(item['cost'])
-        ]
-        if affordable_melee:
-            selected_melee = random.choice(affordable_melee)
-            assigned_gear.append(selected_melee)
-            total_cost += selected_melee['cost']
-    
-    # Ranged weapon (50% chance)
-    ranged_weapon = None
-    if random.random() < 0.5:
-        affordable_ranged = [
-            item for item in equipment_data['ranged_weapons']
-            if can_afford(item['cost'])
-        ]
-        if affordable_ranged:
-            ranged_weapon = random.choice(affordable_ranged)
-            assigned_gear.append(ranged_weapon)
-            total_cost += ranged_weapon['cost']
-    
-    # Add ammo if needed
-    if ranged_weapon and 'ammo_type' in ranged_weapon:
-        ammo_items = [
-            item for item in equipment_data['standard_gear']
-            if item.get('type') == 'ammo' and 
-            item.get('ammo_type') == ranged_weapon.get('ammo_type') and
-            can_afford(item['cost'])
-        ]
-        if ammo_items:
-            ammo = random.choice(ammo_items)
-            assigned_gear.append(ammo)
-            total_cost += ammo['cost']
-    
-    # Standard gear (2-5 items)
-    num_standard_items = random.randint(2, 5)
-    affordable_standard = [
-        item for item in equipment_data['standard_gear']
-        if item.get('type') != 'ammo' and can_afford(item['cost'])
-    ]
-    
-    # Sort by utility (if defined) then cost
-    affordable_standard.sort(key=lambda x: (-x.get('utility', 0), x['cost']))
-    
-    for _ in range(num_standard_items):
-        if not affordable_standard or not can_afford(affordable_standard[0]['cost']):
-            break
-        item = affordable_standard.pop(0)
-        assigned_gear.append(item)
-        total_cost += item['cost']
-    
-    return assigned_gear, total_cost
-
-async def handle_equipment_selection(starting_credits, character_name):
+def auto_assign_gear(char_class, starting_credits):
+    """Return the best few loadouts a character of this class can buy with their starting credits."""
+    return get_loadout_optimizer().best(char_class, starting_credits)
+
+def display_loadouts(loadouts, starting_credits):
+    """Display auto-assigned loadouts: the best in full, the others as changes to it."""
+    best = loadouts[0]
+    print(f"\n🎒 Option 1 (Total cost: {best.cost} credits, remaining: {starting_credits - best.cost}):")
+    for item in best.items:
+        print(f"- {item.name}")
+    for i, loadout in enumerate(loadouts[1:], 2):
+        added = [name for name in loadout.names() if name not in best.names()]
+        removed = [name for name in best.names() if name not in loadout.names()]
+        changes = ", ".join([f"+{name}" for name in added] + [f"-{name}" for name in removed])
+        print(f"\n🎒 Option {i} (Total cost: {loadout.cost} credits, remaining: {starting_credits - loadout.cost}):")
+        print(f"  Same as option 1 with {changes}")
+
+async def handle_equipment_selection(starting_credits, character_name, char_class):
     """Handle the equipment selection process."""
     equipment_data = load_equipment_data()
     inventory = {}
@@ -265,7 +189,7 @@ async def handle_equipment_selection(starting_credits, character_name):
     
     print("\nHow would you like to equip your character?")
     print("1. Shop for gear manually")
-    print("2. Let fate decide (auto-assign gear)")
+    print("2. Auto-assign the best gear for your class and budget")
     
     while True:
         choice = input("\nEnter your choice (1-2): ").strip()
@@ -295,12 +219,12 @@ async def handle_equipment_selection(starting_credits, character_name):
                                 
                                 if 1 <= item_choice <= len(category_data):
                                     item = category_data[item_choice - 1]
-                                    if item['cost'] <= remaining_credits:
-                                        confirm = input(f"\nPurchase {item['name']} for {item['cost']} credits? (y/N): ").lower()
+                                    if item.cost <= remaining_credits:
+                                        confirm = input(f"\nPurchase {item.name} for {item.cost} credits? (y/N): ").lower()
                                         if confirm in ['y', 'yes']:
-                                            inventory[item['name']] = inventory.get(item['name'], 0) + 1
-                                            remaining_credits -= item['cost']
-                                            print(f"\nPurchased {item['name']}. Remaining credits: {remaining_credits}")
+                                            inventory[item.name] = inventory.get(item.name, 0) + 1
+                                            remaining_credits -= item.cost
+                                            print(f"\nPurchased {item.name}. Remaining credits: {remaining_credits}")
                                     else:
                                         print("\nNot enough credits!")
                             except ValueError:
@@ -310,23 +234,26 @@ async def handle_equipment_selection(starting_credits, character_name):
             break
             
         elif choice == "2":
-            # Auto-assign gear
-            assigned_gear, total_cost = auto_assign_gear(equipment_data, starting_credits)
-            remaining_credits = starting_credits - total_cost
-            
-            print(f"\n🎒 Auto-assigned gear (Total cost: {total_cost} credits):")
-            for item in assigned_gear:
-                inventory[item['name']] = inventory.get(item['name'], 0) + 1
-                print(f"- {item['name']}")
-            print(f"Remaining credits: {remaining_credits}")
-            
-            confirm = input("\nAccept this equipment loadout? (Y/n): ").lower()
-            if confirm in ['', 'y', 'yes']:
-                break
-            else:
-                inventory = {}
-                remaining_credits = starting_credits
+            # Auto-assign the best loadouts for the class and budget
+            loadouts = auto_assign_gear(char_class, starting_credits)
+            if not loadouts:
+                print("\nNo gear is affordable with these credits.")
                 continue
+            display_loadouts(loadouts, starting_credits)
+
+            pick = input(f"\nChoose a loadout (1-{len(loadouts)}, Enter for 1) or 'n' to go back: ").strip().lower()
+            if pick in ['n', 'no']:
+                continue
+            try:
+                loadout = loadouts[int(pick or 1) - 1]
+            except (ValueError, IndexError):
+                print("Invalid choice.")
+                continue
+            for item in loadout.items:
+                inventory[item.name] = inventory.get(item.name, 0) + 1
+            remaining_credits = starting_credits - loadout.cost
+            print(f"Remaining credits: {remaining_credits}")
+            break
         
         else:
             print("Invalid choice. Please enter 1 or 2.")
@@ -335,7 +262,6 @@ async def handle_equipment_selection(starting_credits, character_name):
 
 async def create_character() -> str:
     import re
-    from tools import roll_dice
 
     print("\n🛠 Let's create a new character!")
 
@@ -606,17 +532,15 @@ async def create_character() -> str:
     if method_choice == 1:
         # Roll 3d6 in order
         for attr in ATTRS:
-            result = await roll_dice("3d6")
-            print(f"{attr}: {result}")
-            rolls.append(int(result.split("→ Total: ")[-1]))
+            result = roll_notation("3d6")
+            print(f"{attr}: {format_dice_roll(result)}")
+            rolls.append(result.total)
     else:
         # Roll pools
         num_rolls = 6
         for _ in range(num_rolls):
             formula = "4d6" if method_choice == 3 else "3d6"
-            result = await roll_dice(formula)
-            total = int(result.split("→ Total: ")[-1])
-            rolls.append(total)
+            rolls.append(roll_notation(formula).total)
         print(f"\nRolled values: {rolls}")
         print("Now assign them to attributes:")
         assigned = {}
@@ -678,7 +602,6 @@ async def create_character() -> str:
         elif choice == "2":
             print("\nGenerating AI backstory based on your character's attributes and choices...")
             # Create OpenAI engine instance
-            load_dotenv()
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 print("Error: OpenAI API key not found. Defaulting to manual backstory entry.")
@@ -711,19 +634,14 @@ async def create_character() -> str:
     slug = name.lower().replace(" ", "_")
     char_file = f"characters/{slug}.json"
     
-    # Load class advancement data to get initial XP threshold
-    advancement_path = f"advancement/{char_class_key.lower()}_advancement.json"
-    try:
-        with open(advancement_path, "r") as f:
-            advancement_data = json.load(f)
-            next_level_xp = advancement_data[1]["xp"] if len(advancement_data) > 1 else 2000
-    except (FileNotFoundError, json.JSONDecodeError):
-        next_level_xp = 2000  # Default if advancement data not found
+    # Look up the class advancement table to get initial XP threshold
+    table = get_advancement_tables().table(char_class_key)
+    next_level_data = table.next_level(1) if table else None
+    next_level_xp = next_level_data["xp"] if next_level_data else 2000  # Default if advancement data not found
     
     # Roll for initial HP based on class hit dice
-    base_hp = random.randint(1, 6)  # Default to d6
-    con_mod = (structured_attributes["Constitution"]["total"] - 10) // 2
-    initial_hp = max(1, base_hp + con_mod)  # Ensure minimum of 1 HP
+    con_mod = attribute_modifier(structured_attributes["Constitution"]["total"])
+    initial_hp = roll(1, 6, {"constitution": con_mod}, minimum=1).total  # d6, minimum of 1 HP
     
     character_data = {
     "name": name,
@@ -750,84 +668,41 @@ async def create_character() -> str:
     "race_notes": selected_race.get("notes", "No additional notes")
     }
 
-    with open(char_file, "w") as f:
-        json.dump(character_data, f, indent=2)
+    get_characters().save(name, character_data)
     print(f"\n✅ Character '{name}' created and saved to {char_file}")
 
     # Step 9: Initialize inventory and credits
-    inventory_path = "ephemeral/inventory.json"
-    try:
-        with open(inventory_path, "r") as f:
-            inventory = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        inventory = {}
-    inventory[name] = {}
-    with open(inventory_path, "w") as f:
-        json.dump(inventory, f, indent=2)
+    store = get_store()
+    with character_lock(name):
+        store.set_inventory(name, {})
 
     # Roll 3d6 and multiply by 10 to determine starting credits
     print("\nRolling for starting credits (3d6 × 10)...")
-    credits_roll = await roll_dice("3d6")
-    credits_value = int(credits_roll.split("→ Total: ")[-1]) * 10
+    credits_value = roll_notation("3d6").total * 10
     print(f"Starting credits: {credits_value}")
     
     # Add equipment selection
-    char_inventory, remaining_credits = await handle_equipment_selection(credits_value, name)
+    char_inventory, remaining_credits = await handle_equipment_selection(credits_value, name, char_class)
     
     # Update the credits value to remaining amount
     credits_value = remaining_credits
     
-    # Continue with existing code...
-    credits_path = "ephemeral/credits.json"
-    try:
-        with open(credits_path, "r") as f:
-            credits = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        credits = {}
-    credits[name] = credits_value
-    with open(credits_path, "w") as f:
-        json.dump(credits, f, indent=2)
-
-    # Update inventory
-    inventory_path = "ephemeral/inventory.json"
-    try:
-        with open(inventory_path, "r") as f:
-            inventory = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        inventory = {}
-    inventory[name] = char_inventory
-    with open(inventory_path, "w") as f:
-        json.dump(inventory, f, indent=2)
+    # Save starting credits and gear together
+    with character_lock(name), store.transaction():
+        store.set_credits(name, credits_value)
+        store.set_inventory(name, char_inventory)
 
     return name, True
 
 
 async def choose_character() -> str:
     """Prompt the user to select an existing character or create a new one."""
-    characters_dir = "characters"
-    character_files = [
-        f for f in os.listdir(characters_dir)
-        if f.endswith(".json") and not f.startswith("summary_")
-    ]
-    character_names = [os.path.splitext(f)[0].replace("_", " ").title() for f in character_files]
-
-    print("\n🎭 Welcome to White Star. Choose your character:\n")
-    for idx, name in enumerate(character_names, 1):
-        print(f"{idx}. {name}")
-    print(f"{len(character_names) + 1}. Create a new character")
-
-    while True:
-        try:
-            choice = int(input("\nEnter your choice: "))
-            if 1 <= choice <= len(character_names):
-                selected = character_names[choice - 1]
-                print(f"\n✨ You selected: {selected}")
-                return selected, False
-            elif choice == len(character_names) + 1:
-                return await create_character()
-        except ValueError:
-            pass
-        print("Invalid input. Please choose a valid number.")
+    selected = await choose_roster_character()
+    if selected == "__NEW__":
+        name, is_new = await create_character()
+        get_roster().touch(get_characters().slug(name))
+        return name, is_new
+    return selected, False
 
 async def generate_adventure_summary(character_name, scene_log_entries, engine):
     """Generate an AI-crafted narrative summary of recent adventures."""
@@ -865,8 +740,8 @@ async def generate_adventure_summary(character_name, scene_log_entries, engine):
     
     return response.strip()
 
-def display_character_welcome(character_name, char_data, char_inventory, char_credits, adventure_summary, is_new_character=False):
-    """Display a welcome message with character info, inventory, credits, and recent adventures."""
+def display_character_welcome(character_name, summary_card, adventure_summary, is_new_character=False):
+    """Display a welcome message with the character's summary card and recent adventures."""
     
     # Display welcome message
     print(f"\n{'=' * 60}")
@@ -876,50 +751,8 @@ def display_character_welcome(character_name, char_data, char_inventory, char_cr
         print(f"Welcome back, {character_name}!")
     print(f"{'=' * 60}")
     
-    # Display character info
-    print(f"\n📊 CHARACTER INFORMATION:")
-    print(f"Class: {char_data.get('class', 'Unknown')}")
-    print(f"Race: {char_data.get('race', 'Unknown')}")
-    print(f"Level: {char_data.get('level', 1)}")
-    print(f"XP: {char_data.get('experience', 0)}")
-    print(f"HP: {char_data.get('hp', 0)}/{char_data.get('max_hp', 0)}")
-    
-    # Display attributes if available
-    if 'attributes' in char_data:
-        print("\n📈 ATTRIBUTES:")
-        for attr, values in char_data['attributes'].items():
-            if isinstance(values, dict) and 'total' in values:
-                print(f"{attr}: {values['total']}")
-            else:
-                print(f"{attr}: {values}")
-    
-    # After displaying attributes and before special abilities, add:
-    if 'backstory' in char_data and char_data['backstory']:
-        print("\n📖 BACKSTORY:")
-        print(char_data['backstory'])
-    
-    # Display special abilities if available
-    if 'special_abilities' in char_data and char_data['special_abilities']:
-        print("\n✨ SPECIAL ABILITIES:")
-        for ability in char_data['special_abilities']:
-            print(f"- {ability}")
-    
-    # Display long-term goals if available
-    if 'goals' in char_data and char_data['goals']:
-        print("\n🎯 LONG-TERM GOALS:")
-        for goal in char_data['goals']:
-            print(f"- {goal}")
-    
-    # Display inventory
-    print(f"\n🎒 INVENTORY:")
-    if char_inventory:
-        for item, quantity in char_inventory.items():
-            print(f"- {item} × {quantity}")
-    else:
-        print("- Empty")
-    
-    # Display credits
-    print(f"\n💰 CREDITS: {char_credits}")
+    # Display the pre-rendered summary card (stats, attributes, story, inventory, credits)
+    print(f"\n{summary_card}")
     
     # Display narrative summary of recent adventures
     print(f"\n📜 ADVENTURE RECAP:")
@@ -935,23 +768,15 @@ def display_character_welcome(character_name, char_data, char_inventory, char_cr
 # Select character interactively
 chosen_character, is_new_character = asyncio.run(choose_character())
 char_slug = chosen_character.lower().replace(" ", "_")
-char_path = f"characters/{char_slug}.json"
 
 # Load character data
-with open(char_path) as f:
-    char_data = json.load(f)
+char_data = get_characters().load(chosen_character)
 char_class = char_data.get("class", "Unknown Class")
 char_race = char_data.get("race", "Unknown Race")
 
-# Load inventory
-with open("ephemeral/inventory.json") as f:
-    inventory = json.load(f)
-char_inventory = inventory.get(chosen_character, {})
-
-# Load credits
-with open("ephemeral/credits.json") as f:
-    credits = json.load(f)
-char_credits = credits.get(chosen_character, 0)
+# Load inventory and credits
+store = get_store()
+char_inventory = store.get_inventory(chosen_character)
 
 # Load scene log for AI summary
 scene_log_path = f"scene_log/{char_slug}.json"
@@ -968,14 +793,15 @@ if os.path.exists(scene_log_path):
 adventure_summary = "You haven't embarked on any adventures yet."
 if recent_adventures:
     # Connect to OpenAI for summary generation
-    load_dotenv()
     api_key = os.getenv("OPENAI_API_KEY")
     if api_key:
         engine_for_summary = OpenAIEngine(api_key, model="gpt-4o")
         adventure_summary = asyncio.run(generate_adventure_summary(chosen_character, recent_adventures, engine_for_summary))
 
-# Display welcome with the AI-generated summary
-display_character_welcome(chosen_character, char_data, char_inventory, char_credits, adventure_summary, is_new_character)
+# Display welcome with the cached summary card and the AI-generated summary
+with character_lock(chosen_character):
+    summary_card = get_summary_cards().card(chosen_character)
+display_character_welcome(chosen_character, summary_card, adventure_summary, is_new_character)
 
 # Build the system prompt
 system_prompt = f"""
@@ -988,23 +814,28 @@ You may call any of the following functions to take action:
 - /help to see a list of all available commands or get detailed help on a specific command
 - /add_inventory to add items
 - /remove_inventory to remove items
+- /apply_inventory_changes to add or remove several items in one call (use this for loot or multi-item trades)
 - /show_inventory to list current gear
 - /add_credits, /spend_credits, /show_credits to manage funds
 - /buy_item to purchase equipment using credits
+- /search_equipment to look up items by name (misspellings are fine), category or price before buying; if /buy_item cannot match a name it lists the closest items, so pick one of those instead of guessing again
 - /transfer_credits allows characters to send credits to each other
 - /show_ledger to view transaction history
+- /query_ledger to search transactions by character, type, item or date range and total them up (e.g. all purchases of an item, credits a character spent this session)
 - /roll_dice to make dice rolls (always use this instead of generating your own results)
 - /start_scenario to generate a fresh adventure setup with a location, hook, and detail
 - /log_scene to record important scenes for future reference
 - /summarize_recent_chat to get a summary of recent gameplay
 - /summarize_scene_log to review all recorded scenes
 - /skill_check to determine success or failure for character actions using attribute checks
+- /group_skill_check when several characters (or a whole party) face the same check, e.g. a party-wide Dexterity save against a trap; one call rolls for everyone
 
 Character Advancement:
 - /award_xp to give experience points to a character (with optional reason)
 - /show_xp to display current XP and progress to next level
 - /improve_attribute to increase an attribute by 1 point (available at levels 4, 8, 12, etc.)
 - /show_advancement to view the full advancement table for a character's class
+- /show_card to show a character's summary card (stats, attributes, inventory and credits)
 
 Always use the tools if available instead of asking the user to do it manually.
 Do not generate your own dice results. Use the /roll_dice function for all rolls and include the result in your narration.
@@ -1025,7 +856,6 @@ When to award XP:
 """
 
 # Connect to OpenAI
-load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 
 if not api_key:
@@ -1039,23 +869,28 @@ ai = Kani(
     functions=[
         add_inventory,
         remove_inventory,
+        apply_inventory_changes,
         show_inventory,
         add_credits,
         spend_credits,
         show_credits,
         buy_item,
+        search_equipment,
         transfer_credits,
         show_ledger,
+        query_ledger,
         roll_dice,
         start_scenario,
         log_scene,
         summarize_recent_chat,
         summarize_scene_log,
         skill_check,
+        group_skill_check,
         award_xp,
         show_xp,
         improve_attribute,
         show_advancement,
+        show_card,
         help_command,
         quit_game,
     ],
@@ -1068,6 +903,7 @@ async def custom_chat_loop():
         try:
             user_input = input()
         except (EOFError, KeyboardInterrupt):
+            await run_io(get_store().flush)
             print("\nExiting chat.")
             break
 
@@ -1088,11 +924,12 @@ async def custom_chat_loop():
                 "Session End",
                 summary
             )
+            await run_io(get_store().flush)
             print(f"\n🌟 Saving progress for {chosen_character}...")
             print("👋 Until our next adventure! May the stars guide your path.\n")
             break
 
-        append_to_chat_log(chosen_character, "user", user_input)
+        await run_io(append_to_chat_log, chosen_character, "user", user_input)
         
         # Check if the input is a /help command
         if user_input.strip().startswith("/help"):
@@ -1103,13 +940,15 @@ async def custom_chat_loop():
             # Call the help_command function directly
             reply = await help_command(command_arg)
         else:
-            # Normal AI processing for other inputs
+            # Normal AI processing for other inputs; every tool call made
+            # during the round is committed to disk together
             reply_parts = []
-            async for part in ai.full_round_str(user_input):
-                reply_parts.append(part)
+            with get_store().batch():
+                async for part in ai.full_round_str(user_input):
+                    reply_parts.append(part)
             reply = "".join(reply_parts)
         
-        append_to_chat_log(chosen_character, "ai", reply)
+        await run_io(append_to_chat_log, chosen_character, "ai", reply)
         print(f"AI: {reply}\n")
         print("USER: ", end="", flush=True)
 
@@ -0,0 +1,317 @@
+"""
+Process-wide write-back cache in front of a state backend.
+
+Only this process writes its state, so inventory and credits are served
+from memory after the first read. Mutations mark entries dirty and are
+written to the backend in one transaction when either:
+
+- no further change has happened for flush_interval seconds (debounce), or
+- the oldest unsaved change is max_dirty_seconds old,
+
+whichever comes first. At most max_dirty_seconds of progress is ever at
+risk. quit_game, the /quit command and interpreter exit flush immediately.
+
+Inside batch() (one model round) the quiet-period flush is held back, so
+the whole round is written in one backend commit when the batch ends; only
+the max_dirty_seconds deadline can split a very long round.
+
+With WHITE_STAR_SHARED_STATE on (the default), character_lock() also
+flushes when it releases a character's lock, because another session may
+take that lock next and must see the changes. Every locked tool call then
+writes through, and the debounce only coalesces changes made outside a
+lock. Single-session play can set WHITE_STAR_SHARED_STATE=0 to keep changes
+in memory until the debounce or the end of the round.
+"""
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+
+from state_store import StateBackend, _normalize_inventory
+
+# Configuration
+DEFAULT_FLUSH_INTERVAL = 2.0     # Seconds of quiet before dirty state is written
+DEFAULT_MAX_DIRTY_SECONDS = 10.0  # Upper bound on how long a change may stay unsaved
+
+
+class CachedStateStore(StateBackend):
+    """Serve reads from memory and write changes back to a backend in batches."""
+
+    def __init__(self, backend: StateBackend, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_dirty_seconds: float = DEFAULT_MAX_DIRTY_SECONDS):
+        self.backend = backend
+        self.name = f"cached-{backend.name}"
+        self.flush_interval = max(0.0, flush_interval)
+        self.max_dirty_seconds = max(self.flush_interval, max_dirty_seconds)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._batch_depth = 0
+        self._undo = []
+
+        # Cached values; an inventory entry is (exists, items)
+        self._inventories = {}
+        self._credits = {}
+
+        # Unsaved changes
+        self._dirty_items = set()        # (character, item)
+        self._replaced_inventories = set()
+        self._dirty_credits = set()
+        self._pending_ledger = []
+        self._pending_xp = []
+        self._first_dirty_at = None
+        self._last_dirty_at = None
+        self._timer = None
+
+        atexit.register(self.flush)
+
+    # Cache helpers
+    def _inventory_entry(self, character):
+        if character not in self._inventories:
+            exists = self.backend.has_inventory(character)
+            self._inventories[character] = (exists, self.backend.get_inventory(character) if exists else {})
+        return self._inventories[character]
+
+    def _set_inventory_entry(self, character, entry):
+        self._undo.append(("inventory", character, self._inventories.get(character)))
+        self._inventories[character] = entry
+
+    def _is_dirty(self):
+        return bool(self._dirty_items or self._replaced_inventories or self._dirty_credits
+                    or self._pending_ledger or self._pending_xp)
+
+    def _mark_dirty(self):
+        self.writes += 1
+        now = time.monotonic()
+        if self._first_dirty_at is None:
+            self._first_dirty_at = now
+        self._last_dirty_at = now
+
+    def _schedule_flush(self):
+        """Write now, or (re)arm the timer for the earlier of the two deadlines."""
+        if not self._is_dirty():
+            return
+        deadline = self._first_dirty_at + self.max_dirty_seconds
+        if not self._batch_depth:
+            # In a batch, only the max_dirty_seconds bound applies; the batch flushes when it ends
+            deadline = min(self._last_dirty_at + self.flush_interval, deadline)
+        delay = deadline - time.monotonic()
+        if delay <= 0:
+            self._flush_locked()
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            if self._depth:
+                # A transaction is open on another thread; try again shortly
+                self._timer = threading.Timer(0.05, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+                return
+            self._timer = None
+            if self._batch_depth:
+                # Armed before a batch began; wait for the batch or the max_dirty_seconds bound
+                self._schedule_flush()
+                return
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._is_dirty():
+            return
+        with self.backend.transaction():
+            for character in self._replaced_inventories:
+                self.backend.set_inventory(character, self._inventories[character][1])
+            for character, item in self._dirty_items:
+                if character not in self._replaced_inventories:
+                    self.backend.set_item_quantity(character, item, self._inventories[character][1].get(item, 0))
+            for character in self._dirty_credits:
+                self.backend.set_credits(character, self._credits[character])
+            for entry in self._pending_ledger:
+                self.backend.append_ledger(entry)
+            for entry in self._pending_xp:
+                self.backend.append_xp(entry)
+        self._dirty_items.clear()
+        self._replaced_inventories.clear()
+        self._dirty_credits.clear()
+        self._pending_ledger = []
+        self._pending_xp = []
+        self._first_dirty_at = None
+        self._last_dirty_at = None
+
+    # Transactions
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            outermost = self._depth == 0
+            if outermost:
+                self._undo = []
+                dirty_before = (set(self._dirty_items), set(self._replaced_inventories), set(self._dirty_credits),
+                                len(self._pending_ledger), len(self._pending_xp))
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if outermost:
+                    self._rollback(dirty_before)
+                raise
+            self._depth -= 1
+            if outermost:
+                self._undo = []
+                self._schedule_flush()
+
+    def _rollback(self, dirty_before):
+        for kind, key, previous in reversed(self._undo):
+            cache = self._inventories if kind == "inventory" else self._credits
+            if previous is None:
+                cache.pop(key, None)
+            else:
+                cache[key] = previous
+        self._undo = []
+        items, replaced, credits, ledger_count, xp_count = dirty_before
+        self._dirty_items, self._replaced_inventories, self._dirty_credits = items, replaced, credits
+        del self._pending_ledger[ledger_count:]
+        del self._pending_xp[xp_count:]
+
+    @contextmanager
+    def batch(self):
+        """Hold back debounced flushes until the block ends, then write everything in one backend commit."""
+        with self.backend.batch():
+            with self._lock:
+                self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                with self._lock:
+                    self._batch_depth -= 1
+                    if not self._batch_depth:
+                        self._flush_locked()
+
+    def flush(self):
+        """Write every dirty entry to the backend now."""
+        with self._lock:
+            self._flush_locked()
+            self.backend.flush()
+
+    def refresh(self, characters: list):
+        """Drop cached entries for the characters unless they hold unsaved changes."""
+        with self._lock:
+            dirty_inventories = {character for character, _ in self._dirty_items} | self._replaced_inventories
+            for character in characters:
+                if character not in dirty_inventories:
+                    self._inventories.pop(character, None)
+                if character not in self._dirty_credits:
+                    self._credits.pop(character, None)
+            self.backend.refresh(characters)
+
+    def close(self):
+        self.flush()
+        self.backend.close()
+
+    # Inventory
+    def get_inventory(self, character: str) -> dict:
+        with self._lock:
+            return dict(self._inventory_entry(character)[1])
+
+    def get_item_quantity(self, character: str, item: str) -> int:
+        with self._lock:
+            return self._inventory_entry(character)[1].get(item, 0)
+
+    def has_inventory(self, character: str) -> bool:
+        with self._lock:
+            return self._inventory_entry(character)[0]
+
+    def set_item_quantity(self, character: str, item: str, quantity: int):
+        with self.transaction():
+            items = dict(self._inventory_entry(character)[1])
+            if quantity > 0:
+                items[item] = quantity
+            else:
+                items.pop(item, None)
+            self._set_inventory_entry(character, (True, items))
+            self._dirty_items.add((character, item))
+            self._mark_dirty()
+
+    def set_inventory(self, character: str, items: dict):
+        with self.transaction():
+            items = {item: qty for item, qty in _normalize_inventory(items).items() if qty > 0}
+            self._set_inventory_entry(character, (True, items))
+            self._replaced_inventories.add(character)
+            self._mark_dirty()
+
+    def all_inventories(self) -> dict:
+        with self._lock:
+            self._flush_locked()
+            return self.backend.all_inventories()
+
+    def iter_inventories(self):
+        self.flush()
+        yield from self.backend.iter_inventories()
+
+    # Credits
+    def get_credits(self, character: str) -> int:
+        with self._lock:
+            if character not in self._credits:
+                self._credits[character] = self.backend.get_credits(character)
+            return self._credits[character]
+
+    def set_credits(self, character: str, amount: int):
+        with self.transaction():
+            self._undo.append(("credits", character, self._credits.get(character)))
+            self._credits[character] = amount
+            self._dirty_credits.add(character)
+            self._mark_dirty()
+
+    def all_credits(self) -> dict:
+        with self._lock:
+            self._flush_locked()
+            return self.backend.all_credits()
+
+    def iter_credits(self):
+        self.flush()
+        yield from self.backend.iter_credits()
+
+    # Ledger and XP log: buffered appends, flushed before any read
+    def append_ledger(self, entry: dict):
+        with self.transaction():
+            self._pending_ledger.append(entry)
+            self._mark_dirty()
+
+    def read_ledger(self) -> list:
+        with self._lock:
+            self._flush_locked()
+            return self.backend.read_ledger()
+
+    def query_ledger(self, character: str = None, entry_type: str = None, since: str = None,
+                     until: str = None, offset: int = 0, limit: int = 10, item: str = None) -> tuple:
+        with self._lock:
+            self._flush_locked()
+            return self.backend.query_ledger(character, entry_type, since, until, offset, limit, item)
+
+    def ledger_totals(self, character: str = None, entry_type: str = None, since: str = None,
+                      until: str = None, item: str = None) -> dict:
+        with self._lock:
+            self._flush_locked()
+            return self.backend.ledger_totals(character, entry_type, since, until, item)
+
+    def append_xp(self, entry: dict):
+        with self.transaction():
+            self._pending_xp.append(entry)
+            self._mark_dirty()
+
+    def read_xp_log(self) -> list:
+        with self._lock:
+            self._flush_locked()
+            return self.backend.read_xp_log()
+
+    def xp_summary(self, character: str) -> dict:
+        with self._lock:
+            self._flush_locked()
+            return self.backend.xp_summary(character)
@@ -0,0 +1,178 @@
+"""
+Cross-process advisory locks for game state, striped per character.
+
+Several terminal sessions may share one checkout (and so one ephemeral/
+directory). Every read-modify-write of a character's state runs while
+holding that character's lock file, ephemeral/.locks/character-<slug>.lock,
+so two sessions only ever wait for each other when they touch the same
+character. Shared files that every character writes to (the JSON backend's
+journal, ledger and XP log) are guarded by one short-lived store.lock
+taken only while a commit is written.
+
+Locks are OS advisory locks (fcntl.flock, or msvcrt.locking on Windows)
+on an open file, so they are released automatically if a process dies.
+Several locks are always taken in sorted order so two sessions can never
+deadlock, and a lock already held further up the call stack (or by the
+coroutine that started an I/O thread) is not taken again.
+
+Waiting for a lock blocks the thread, so async tools take their locks
+inside one run_io() call that covers the whole locked section. A coroutine
+that held a lock across an await could need an I/O worker that is itself
+blocked waiting for that lock.
+
+Set WHITE_STAR_SHARED_STATE=0 when only one session ever runs to skip the
+locking and keep the write-back cache batching changes across tool calls.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Configuration
+LOCK_DIRNAME = ".locks"
+STORE_LOCK_KEY = "store"
+WINDOWS_POLL_SECONDS = 0.01
+
+# Lock keys held by the current thread or task, as (lock directory, key) pairs
+_held = contextvars.ContextVar("white_star_held_locks", default=frozenset())
+
+
+def _lock_key(character: str) -> str:
+    slug = character.lower().replace(" ", "_").replace(os.sep, "_")
+    return f"character-{slug}"
+
+
+class StateLocks:
+    """Lock files in one directory, with wait-time metrics per lock."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    # Low-level acquire/release
+    def _acquire(self, key):
+        os.makedirs(self.directory, exist_ok=True)
+        handle = open(os.path.join(self.directory, f"{key}.lock"), "a+")
+        started = time.perf_counter()
+        contended = False
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    contended = True
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        handle.seek(0)
+                        msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        contended = True
+                        time.sleep(WINDOWS_POLL_SECONDS)
+        except BaseException:
+            handle.close()
+            raise
+        self._record_wait(key, time.perf_counter() - started, contended)
+        return handle
+
+    @staticmethod
+    def _release(handle):
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            handle.close()
+
+    def _acquire_all(self, keys):
+        handles = []
+        try:
+            for key in keys:
+                handles.append(self._acquire(key))
+        except BaseException:
+            self._release_all(handles)
+            raise
+        return handles
+
+    def _release_all(self, handles):
+        for handle in reversed(handles):
+            self._release(handle)
+
+    def _new_keys(self, keys):
+        held = _held.get()
+        return sorted({key for key in keys if (self.directory, key) not in held})
+
+    # Metrics
+    def _record_wait(self, key, waited, contended):
+        with self._stats_lock:
+            stats = self._stats.setdefault(key, {"acquired": 0, "contended": 0, "wait_total": 0.0, "wait_max": 0.0})
+            stats["acquired"] += 1
+            stats["contended"] += int(contended)
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+
+    def stats(self) -> dict:
+        """
+        Return lock-wait metrics for this process.
+
+        Returns:
+            {lock key: {"acquired", "contended", "wait_total", "wait_max"}}
+            with waits in seconds; "contended" counts acquisitions that had
+            to wait for another session
+        """
+        with self._stats_lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
+
+    # Public API
+    @contextmanager
+    def hold(self, *keys):
+        """Hold the given lock keys (sorted, skipping any already held); yields the newly taken keys."""
+        new_keys = self._new_keys(keys)
+        handles = self._acquire_all(new_keys)
+        token = _held.set(_held.get() | {(self.directory, key) for key in new_keys})
+        try:
+            yield new_keys
+        finally:
+            _held.reset(token)
+            self._release_all(handles)
+
+    @contextmanager
+    def characters(self, *characters):
+        """Hold the locks for every named character; yields the names whose locks were newly taken."""
+        names = {_lock_key(name): name for name in characters if name}
+        with self.hold(*names) as new_keys:
+            yield [names[key] for key in new_keys]
+
+    def store(self):
+        """Hold the lock guarding files shared by every character."""
+        return self.hold(STORE_LOCK_KEY)
+
+
+class NoLocks(StateLocks):
+    """Stand-in used when WHITE_STAR_SHARED_STATE=0: nothing is locked or measured."""
+
+    @contextmanager
+    def hold(self, *keys):
+        yield []
+
+
+def shared_state_enabled() -> bool:
+    return os.getenv("WHITE_STAR_SHARED_STATE", "1").strip() != "0"
+
+
+def make_locks(directory: str) -> StateLocks:
+    """Return real locks in directory/.locks, or NoLocks if sharing is disabled."""
+    locks_dir = os.path.join(directory, LOCK_DIRNAME)
+    return StateLocks(locks_dir) if shared_state_enabled() else NoLocks(locks_dir)
@@ -0,0 +1,1081 @@
+"""
+Pluggable storage for ephemeral game state: inventory, credits, the
+transaction ledger and the XP log.
+
+Tools never open ephemeral/*.json themselves; they call the small
+repository API on the store returned by get_store(). Two backends exist:
+
+- "sqlite" (default): ephemeral/state.db in WAL mode, one row per
+  character/item, so reads and updates touch a single row.
+- "json": plain JSON documents, kept for anyone who wants to edit state
+  by hand. Each character has its own shard, ephemeral/<slug>/inventory.json
+  and ephemeral/<slug>/credits.json, so a change rewrites only the
+  characters involved. Changes go through a write-ahead journal (journal.py) so one
+  tool call or model round is one journal record, the ledger is an append-only
+  segmented JSONL log (ledger.py) and the XP log is an append-only JSONL
+  file with materialized per-character totals (xp_log.py).
+
+Pick one with the WHITE_STAR_STATE_BACKEND environment variable. Either
+one is wrapped in the write-back cache from state_cache.py unless
+WHITE_STAR_STATE_CACHE=0. The first
+time the SQLite store is opened it imports any existing JSON files, and
+export_json() writes the legacy JSON layout back out on demand:
+
+    python state_store.py export [directory]
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from journal import JOURNAL_FILENAME, WriteJournal, fsync_directory
+from ledger import (
+    SEGMENT_PREFIX, SegmentedLedger, item_key, ledger_amount, ledger_characters, ledger_item, ledger_quantity,
+    ledger_timestamp, normalize_timestamp,
+)
+from xp_log import XP_LOG_FILENAME as XP_JSONL_FILENAME, XpLog, merge_xp_totals, new_xp_totals
+from state_locks import make_locks
+
+# Configuration
+EPHEMERAL_DIR = "ephemeral"
+DEFAULT_BACKEND = "sqlite"
+SQLITE_FILENAME = "state.db"
+INVENTORY_FILENAME = "inventory.json"
+CREDITS_FILENAME = "credits.json"
+LEDGER_FILENAME = "ledger.json"
+LEDGER_DIRNAME = "ledger"
+XP_LOG_FILENAME = "xp_log.json"
+
+# Journal operations that append to a log file rather than edit a document
+APPEND_OPERATIONS = ("append_ledger", "append_xp")
+
+
+def _load_json(path, default):
+    """Load a JSON document, falling back to a default if it is missing or corrupt."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _write_json(path, data, sync: bool = False):
+    """
+    Write a JSON document in the repo's usual indented format, replacing it atomically.
+
+    With sync, the new contents are fsynced before they replace the old file
+    (the caller fsyncs the directory to make the rename itself durable).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f, indent=2)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def character_slug(character: str) -> str:
+    """Return the file-name slug used for a character (same as characters/<slug>.json)."""
+    return character.lower().replace(" ", "_")
+
+
+def _normalize_inventory(items):
+    """Convert the legacy list inventory format to an item -> quantity dict."""
+    if isinstance(items, list):
+        return {item: 1 for item in items}
+    return dict(items or {})
+
+
+class StateBackend:
+    """
+    Repository API shared by every state backend.
+
+    Mutations made inside ``with store.transaction():`` are applied together;
+    outside a transaction each call stands on its own.
+    """
+
+    name = "base"
+    writes = 0  # Counts mutations, so callers can tell whether a section changed anything
+
+    # Inventory
+    def get_inventory(self, character: str) -> dict:
+        raise NotImplementedError
+
+    def set_item_quantity(self, character: str, item: str, quantity: int):
+        """Set one item's quantity; zero or less removes the item."""
+        raise NotImplementedError
+
+    def set_inventory(self, character: str, items: dict):
+        """Replace a character's whole inventory."""
+        raise NotImplementedError
+
+    def all_inventories(self) -> dict:
+        raise NotImplementedError
+
+    # Credits
+    def get_credits(self, character: str) -> int:
+        raise NotImplementedError
+
+    def set_credits(self, character: str, amount: int):
+        raise NotImplementedError
+
+    def all_credits(self) -> dict:
+        raise NotImplementedError
+
+    # Ledger and XP log
+    def append_ledger(self, entry: dict):
+        raise NotImplementedError
+
+    def read_ledger(self) -> list:
+        raise NotImplementedError
+
+    def query_ledger(self, character: str = None, entry_type: str = None, since: str = None,
+                     until: str = None, offset: int = 0, limit: int = 10, item: str = None) -> tuple:
+        """
+        Find ledger entries, newest first.
+
+        Args:
+            character: Only entries involving this character
+            entry_type: Only entries of this type
+            since: Earliest ISO timestamp to include
+            until: Latest ISO timestamp to include
+            offset: Number of matching entries to skip
+            limit: Maximum number of entries to return
+            item: Only entries for this item (case-insensitive)
+
+        Returns:
+            A (entries, total_matches) tuple
+        """
+        raise NotImplementedError
+
+    def ledger_totals(self, character: str = None, entry_type: str = None, since: str = None,
+                      until: str = None, item: str = None) -> dict:
+        """
+        Count ledger entries matching the same filters as query_ledger and
+        total the credits and items they moved, per entry type. With a
+        character, transfers are split into "transfer_out" and "transfer_in".
+
+        Returns:
+            {entry type: {"count": n, "credits": total, "quantity": total}}
+        """
+        raise NotImplementedError
+
+    def append_xp(self, entry: dict):
+        raise NotImplementedError
+
+    def read_xp_log(self) -> list:
+        raise NotImplementedError
+
+    def xp_summary(self, character: str) -> dict:
+        """
+        Return a character's lifetime XP totals without reading the XP log.
+
+        Returns:
+            {"character": name, "totals": {...}, "by_reason": {reason: {...}}}
+            where each totals dict holds xp (including bonus), bonus_xp,
+            awards, first_award and last_award; None if no XP was ever logged
+        """
+        raise NotImplementedError
+
+    def transaction(self):
+        """Return a context manager that groups the mutations made inside it."""
+        raise NotImplementedError
+
+    @contextmanager
+    def batch(self):
+        """
+        Group every transaction inside the block into one commit.
+
+        Used around a whole model round so all of its tool calls reach disk
+        together. Backends that already commit once per transaction may
+        treat this as a no-op.
+        """
+        yield self
+
+    def flush(self):
+        """Push any buffered changes to disk."""
+
+    def refresh(self, characters: list):
+        """
+        Forget anything remembered about these characters' state so the next
+        read sees changes other sessions made. Called right after their
+        locks are taken (see character_lock).
+        """
+
+    def close(self):
+        pass
+
+    # Helpers built on the primitives above
+    def iter_inventories(self):
+        """Yield (character, items) pairs one character at a time."""
+        yield from self.all_inventories().items()
+
+    def iter_credits(self):
+        """Yield (character, credits) pairs one character at a time."""
+        yield from self.all_credits().items()
+
+    def has_inventory(self, character: str) -> bool:
+        return character in self.all_inventories()
+
+    def get_item_quantity(self, character: str, item: str) -> int:
+        return self.get_inventory(character).get(item, 0)
+
+    def export_json(self, directory: str = EPHEMERAL_DIR) -> list:
+        """
+        Write the legacy JSON files (inventory, credits, ledger, XP log).
+
+        Args:
+            directory: Where to write the files
+
+        Returns:
+            The list of paths written
+        """
+        documents = {
+            INVENTORY_FILENAME: self.all_inventories(),
+            CREDITS_FILENAME: self.all_credits(),
+            LEDGER_FILENAME: self.read_ledger(),
+            XP_LOG_FILENAME: self.read_xp_log(),
+        }
+        paths = []
+        for filename, data in documents.items():
+            path = os.path.join(directory, filename)
+            _write_json(path, data)
+            paths.append(path)
+        return paths
+
+
+class JsonStateBackend(StateBackend):
+    """
+    Per-character JSON shards updated through a write-ahead journal.
+
+    Mutations are applied to in-memory copies of the documents and recorded
+    as operations. When the outermost transaction (or batch) ends, the
+    operations are committed to the journal with a single fsync, each
+    changed document is rewritten once, and the rewritten documents, the
+    appended log lines and their directories are fsynced before the journal
+    is emptied, so it covers an OS crash or power loss as well.
+    """
+
+    name = "json"
+
+    def __init__(self, directory: str = EPHEMERAL_DIR):
+        self.directory = directory
+        self.xp_log = XpLog(directory)
+        self.ledger = SegmentedLedger(os.path.join(directory, LEDGER_DIRNAME))
+        self.journal = WriteJournal(os.path.join(directory, JOURNAL_FILENAME))
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._batch_depth = 0
+        self._operations = []  # Recorded but not yet committed
+        self._documents = {}   # path -> document, including uncommitted changes
+        self._dirty = set()
+        self.locks = make_locks(directory)
+
+        with self._lock, self.locks.store():
+            # Finish any commit that was interrupted before the files were updated.
+            # Otherwise the ledger and XP log are only indexed when first used.
+            if self.journal.pending():
+                self._refresh_logs()
+                self.journal.replay(self._replay)
+
+            self._migrate_global_files()
+
+            # Import the old single-document ledger the first time segments are used
+            legacy_ledger = os.path.join(directory, LEDGER_FILENAME)
+            if os.path.exists(legacy_ledger) and not self.ledger.has_segments():
+                self.ledger.extend(_load_json(legacy_ledger, []))
+
+            # Likewise the old single-document XP log
+            legacy_xp_log = os.path.join(directory, XP_LOG_FILENAME)
+            if os.path.exists(legacy_xp_log) and not len(self.xp_log):
+                self.xp_log.extend(_load_json(legacy_xp_log, []))
+
+    def _migrate_global_files(self):
+        """Split the old all-character inventory.json/credits.json into shards, once."""
+        if next(self._shard_paths(INVENTORY_FILENAME), None) or next(self._shard_paths(CREDITS_FILENAME), None):
+            return
+        inventory = _load_json(os.path.join(self.directory, INVENTORY_FILENAME), {})
+        credits = _load_json(os.path.join(self.directory, CREDITS_FILENAME), {})
+        if not inventory and not credits:
+            return
+        with self.transaction():
+            for character, items in inventory.items():
+                self.set_inventory(character, items)
+            for character, amount in credits.items():
+                self.set_credits(character, amount)
+
+    # Shards
+    def _shard_path(self, character, filename):
+        return os.path.join(self.directory, character_slug(character), filename)
+
+    def _shard_paths(self, filename):
+        """Lazily yield every shard file of one kind."""
+        if not os.path.isdir(self.directory):
+            return
+        for entry in sorted(os.scandir(self.directory), key=lambda e: e.name):
+            path = os.path.join(entry.path, filename)
+            if entry.is_dir() and os.path.isfile(path):
+                yield path
+
+    def _inventory_shard(self, character):
+        return self._document(self._shard_path(character, INVENTORY_FILENAME),
+                              lambda: {"character": character, "items": {}})
+
+    def _credits_shard(self, character):
+        return self._document(self._shard_path(character, CREDITS_FILENAME),
+                              lambda: {"character": character, "credits": 0})
+
+    def _shard_exists(self, path):
+        return path in self._dirty or os.path.exists(path)
+
+    # Documents and operations
+    def _document(self, path, default=list):
+        if path not in self._documents:
+            self._documents[path] = _load_json(path, None) or default()
+        return self._documents[path]
+
+    def _apply_operation(self, operation):
+        """Apply one journal operation; appends are skipped if already present."""
+        kind = operation["op"]
+        if kind == "set_item":
+            shard = self._inventory_shard(operation["character"])
+            if operation["quantity"] > 0:
+                shard["items"][operation["item"]] = operation["quantity"]
+            else:
+                shard["items"].pop(operation["item"], None)
+            self._dirty.add(self._shard_path(operation["character"], INVENTORY_FILENAME))
+        elif kind == "set_inventory":
+            self._inventory_shard(operation["character"])["items"] = dict(operation["items"])
+            self._dirty.add(self._shard_path(operation["character"], INVENTORY_FILENAME))
+        elif kind == "set_credits":
+            self._credits_shard(operation["character"])["credits"] = operation["amount"]
+            self._dirty.add(self._shard_path(operation["character"], CREDITS_FILENAME))
+        elif kind == "append_xp":
+            if len(self.xp_log) == operation["position"]:
+                self.xp_log.append(operation["entry"])
+        elif kind == "append_ledger":
+            if len(self.ledger) == operation["position"]:
+                self.ledger.append(operation["entry"])
+
+    def _record(self, operation):
+        self.writes += 1
+        with self.transaction():
+            # Log lines are appended at commit time, after the journal fsync
+            if operation["op"] not in APPEND_OPERATIONS:
+                self._apply_operation(operation)
+            self._operations.append(operation)
+
+    def _write_documents(self):
+        """Rewrite every changed document and make the changes durable, logs included."""
+        directories = {os.path.dirname(path) for path in self._dirty}
+        if not all(os.path.isdir(directory) for directory in directories):
+            directories.add(self.directory)  # A new character's shard directory appears in it
+        for path in self._dirty:
+            _write_json(path, self._documents[path], sync=True)
+        for directory in directories:
+            fsync_directory(directory)
+        self._dirty.clear()
+        self.ledger.sync()
+        self.xp_log.sync()
+
+    def _refresh_logs(self):
+        """Catch up on log lines other sessions appended; call with the store lock held."""
+        self.ledger.refresh(repair=True)
+        self.xp_log.refresh(repair=True)
+
+    def _commit(self):
+        if self._operations:
+            # The journal and logs are shared by every session using this directory
+            with self.locks.store():
+                self._refresh_logs()
+                # Other sessions may have appended since positions were assigned
+                positions = {"append_ledger": len(self.ledger), "append_xp": len(self.xp_log)}
+                # Entries are stamped when made but committed later, possibly after
+                # another session's; never let the ledger's timestamps go backwards
+                latest = self.ledger.latest_timestamp()
+                for operation in self._operations:
+                    if operation["op"] in APPEND_OPERATIONS:
+                        operation["position"] = positions[operation["op"]]
+                        positions[operation["op"]] += 1
+                    if operation["op"] == "append_ledger":
+                        entry = operation["entry"]
+                        entry["timestamp"] = max(normalize_timestamp(entry.get("timestamp")) or ledger_timestamp(), latest)
+                        latest = entry["timestamp"]
+
+                self.journal.commit(self._operations)
+                for operation in self._operations:
+                    if operation["op"] in APPEND_OPERATIONS:
+                        self._apply_operation(operation)
+                # Everything the journal protects must be on disk before it is emptied
+                self._write_documents()
+                self.journal.checkpoint()
+        self._operations = []
+        self._documents = {}
+        self._dirty.clear()
+
+    def _rollback(self, mark):
+        """Drop operations recorded after mark and rebuild the documents from the rest."""
+        kept = self._operations[:mark]
+        self._operations = []
+        self._documents = {}
+        self._dirty.clear()
+        for operation in kept:
+            if operation["op"] not in APPEND_OPERATIONS:
+                self._apply_operation(operation)
+            self._operations.append(operation)
+
+    def _replay(self, operations):
+        for operation in operations:
+            self._apply_operation(operation)
+        self._write_documents()
+        self._documents = {}
+
+    def _pending_appends(self, kind):
+        return sum(1 for operation in self._operations if operation["op"] == kind)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            outermost = self._depth == 0
+            mark = len(self._operations)
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if outermost:
+                    self._rollback(mark)
+                raise
+            self._depth -= 1
+            if outermost and not self._batch_depth:
+                self._commit()
+
+    @contextmanager
+    def batch(self):
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and not self._depth:
+                    self._commit()
+
+    def flush(self):
+        """Commit anything recorded during an open batch right away."""
+        with self._lock:
+            if not self._depth:
+                self._commit()
+
+    def refresh(self, characters: list):
+        with self._lock:
+            for character in characters:
+                for filename in (INVENTORY_FILENAME, CREDITS_FILENAME):
+                    path = self._shard_path(character, filename)
+                    if path not in self._dirty:
+                        self._documents.pop(path, None)
+
+    # Repository API
+    def get_inventory(self, character: str) -> dict:
+        with self.transaction():
+            return dict(self._inventory_shard(character)["items"])
+
+    def get_item_quantity(self, character: str, item: str) -> int:
+        with self.transaction():
+            return self._inventory_shard(character)["items"].get(item, 0)
+
+    def has_inventory(self, character: str) -> bool:
+        with self.transaction():
+            return self._shard_exists(self._shard_path(character, INVENTORY_FILENAME))
+
+    def set_item_quantity(self, character: str, item: str, quantity: int):
+        self._record({"op": "set_item", "character": character, "item": item, "quantity": quantity})
+
+    def set_inventory(self, character: str, items: dict):
+        self._record({"op": "set_inventory", "character": character, "items": _normalize_inventory(items)})
+
+    def iter_inventories(self):
+        self.flush()
+        for path in self._shard_paths(INVENTORY_FILENAME):
+            shard = _load_json(path, None)
+            if shard:
+                yield shard["character"], _normalize_inventory(shard.get("items"))
+
+    def all_inventories(self) -> dict:
+        return dict(self.iter_inventories())
+
+    def get_credits(self, character: str) -> int:
+        with self.transaction():
+            return self._credits_shard(character)["credits"]
+
+    def set_credits(self, character: str, amount: int):
+        self._record({"op": "set_credits", "character": character, "amount": amount})
+
+    def iter_credits(self):
+        self.flush()
+        for path in self._shard_paths(CREDITS_FILENAME):
+            shard = _load_json(path, None)
+            if shard:
+                yield shard["character"], shard.get("credits", 0)
+
+    def all_credits(self) -> dict:
+        return dict(self.iter_credits())
+
+    def append_ledger(self, entry: dict):
+        with self.transaction():
+            position = len(self.ledger) + self._pending_appends("append_ledger")
+            self._record({"op": "append_ledger", "position": position, "entry": entry})
+
+    def read_ledger(self) -> list:
+        # Reading the ledger commits pending entries so they are included,
+        # and picks up entries other sessions appended
+        self.flush()
+        self.ledger.refresh()
+        return self.ledger.read_all()
+
+    def query_ledger(self, character: str = None, entry_type: str = None, since: str = None,
+                     until: str = None, offset: int = 0, limit: int = 10, item: str = None) -> tuple:
+        self.flush()
+        self.ledger.refresh()
+        return self.ledger.query(character, entry_type, since, until, offset, limit, item)
+
+    def ledger_totals(self, character: str = None, entry_type: str = None, since: str = None,
+                      until: str = None, item: str = None) -> dict:
+        self.flush()
+        self.ledger.refresh()
+        return self.ledger.totals(character, entry_type, since, until, item)
+
+    def append_xp(self, entry: dict):
+        with self.transaction():
+            position = len(self.xp_log) + self._pending_appends("append_xp")
+            self._record({"op": "append_xp", "position": position, "entry": entry})
+
+    def read_xp_log(self) -> list:
+        self.flush()
+        self.xp_log.refresh()
+        return self.xp_log.read_all()
+
+    def xp_summary(self, character: str) -> dict:
+        self.flush()
+        self.xp_log.refresh()
+        return self.xp_log.summary(character)
+
+
+def _read_jsonl(path) -> list:
+    """Return the entries of a JSONL file, skipping a torn or corrupt line."""
+    entries = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def read_json_state(directory: str) -> tuple:
+    """
+    Read the JSON backend's state without changing any file.
+
+    Covers every layout the JSON backend has used: per-character shards or
+    the original all-character inventory.json/credits.json, the segmented
+    ledger or ledger.json, xp_log.jsonl or xp_log.json, and operations
+    still waiting in the journal.
+
+    Args:
+        directory: The JSON backend's directory (usually ephemeral/)
+
+    Returns:
+        (inventories, credits, ledger entries, XP log entries)
+    """
+    inventories, credits = {}, {}
+    shards = [entry for entry in os.scandir(directory) if entry.is_dir()] if os.path.isdir(directory) else []
+    for entry in sorted(shards, key=lambda e: e.name):
+        inventory = _load_json(os.path.join(entry.path, INVENTORY_FILENAME), None)
+        if isinstance(inventory, dict) and inventory.get("character"):
+            inventories[inventory["character"]] = _normalize_inventory(inventory.get("items"))
+        balance = _load_json(os.path.join(entry.path, CREDITS_FILENAME), None)
+        if isinstance(balance, dict) and balance.get("character"):
+            credits[balance["character"]] = balance.get("credits", 0)
+    if not inventories and not credits:
+        inventories = {character: _normalize_inventory(items) for character, items in
+                       _load_json(os.path.join(directory, INVENTORY_FILENAME), {}).items()}
+        credits = dict(_load_json(os.path.join(directory, CREDITS_FILENAME), {}))
+
+    ledger_dir = os.path.join(directory, LEDGER_DIRNAME)
+    segments = sorted(
+        filename for filename in (os.listdir(ledger_dir) if os.path.isdir(ledger_dir) else [])
+        if filename.startswith(SEGMENT_PREFIX) and filename.endswith(".jsonl")
+    )
+    if segments:
+        ledger = [entry for filename in segments for entry in _read_jsonl(os.path.join(ledger_dir, filename))]
+    else:
+        ledger = _load_json(os.path.join(directory, LEDGER_FILENAME), [])
+
+    xp_log = _read_jsonl(os.path.join(directory, XP_JSONL_FILENAME))
+    if not xp_log:
+        xp_log = _load_json(os.path.join(directory, XP_LOG_FILENAME), [])
+
+    # Commits that reached the journal but not the files, applied as replay() would
+    for operations in WriteJournal(os.path.join(directory, JOURNAL_FILENAME)).pending():
+        for operation in operations:
+            kind = operation["op"]
+            if kind == "set_item":
+                items = inventories.setdefault(operation["character"], {})
+                if operation["quantity"] > 0:
+                    items[operation["item"]] = operation["quantity"]
+                else:
+                    items.pop(operation["item"], None)
+            elif kind == "set_inventory":
+                inventories[operation["character"]] = dict(operation["items"])
+            elif kind == "set_credits":
+                credits[operation["character"]] = operation["amount"]
+            elif kind == "append_ledger" and len(ledger) == operation["position"]:
+                ledger.append(operation["entry"])
+            elif kind == "append_xp" and len(xp_log) == operation["position"]:
+                xp_log.append(operation["entry"])
+    return inventories, credits, ledger, xp_log
+
+
+class SqliteStateBackend(StateBackend):
+    """
+    State kept in a single SQLite database running in WAL mode.
+
+    Each outermost transaction is one SQLite commit. batch() does not widen
+    that to a whole model round: holding the database write lock while the
+    model thinks would stall every other session sharing the file.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE TABLE IF NOT EXISTS inventory (
+        character TEXT NOT NULL,
+        item TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        PRIMARY KEY (character, item)
+    );
+    CREATE TABLE IF NOT EXISTS characters (
+        character TEXT PRIMARY KEY
+    );
+    CREATE TABLE IF NOT EXISTS credits (
+        character TEXT PRIMARY KEY,
+        amount INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS ledger (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        type TEXT,
+        entry TEXT NOT NULL,
+        item_key TEXT,
+        amount INTEGER NOT NULL DEFAULT 0,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        sender TEXT
+    );
+    CREATE TABLE IF NOT EXISTS ledger_characters (
+        ledger_id INTEGER NOT NULL,
+        character TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ledger_by_type ON ledger (type, id);
+    CREATE INDEX IF NOT EXISTS ledger_by_time ON ledger (timestamp);
+    CREATE INDEX IF NOT EXISTS ledger_characters_by_name
+        ON ledger_characters (character, ledger_id);
+    CREATE TABLE IF NOT EXISTS xp_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        character TEXT,
+        entry TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS xp_log_by_character ON xp_log (character, id);
+    CREATE TABLE IF NOT EXISTS xp_summary (
+        slug TEXT NOT NULL,
+        reason TEXT NOT NULL,
+        character TEXT NOT NULL,
+        xp INTEGER NOT NULL,
+        bonus_xp INTEGER NOT NULL,
+        awards INTEGER NOT NULL,
+        first_award TEXT,
+        last_award TEXT,
+        PRIMARY KEY (slug, reason)
+    );
+    """
+
+    def __init__(self, path: str = None, migrate_from: str = EPHEMERAL_DIR):
+        self.path = path or os.path.join(EPHEMERAL_DIR, SQLITE_FILENAME)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self._depth = 0
+        # Autocommit mode; transaction() issues BEGIN/COMMIT itself
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL syncs the WAL once per commit, so every transaction is durable
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(self.SCHEMA)
+        self._upgrade_ledger()
+        self._build_xp_summary()
+        if migrate_from:
+            self._migrate_legacy_json(migrate_from)
+
+    def _migrate_legacy_json(self, directory):
+        """
+        Import the JSON backend's state once, the first time the database is opened.
+
+        The files are read with read_json_state(), so every layout the JSON
+        backend has used is imported and nothing in the directory is
+        rewritten.
+        """
+        with self.transaction():
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+            if row:
+                return
+
+            inventories, credits, ledger, xp_log = read_json_state(directory)
+            for character, items in inventories.items():
+                self.set_inventory(character, items)
+            for character, amount in credits.items():
+                self.set_credits(character, amount)
+            for entry in ledger:
+                self.append_ledger(entry)
+            for entry in xp_log:
+                self.append_xp(entry)
+
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', '1')")
+
+    def _upgrade_ledger(self):
+        """Add the item/amount columns to ledgers created before they existed."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ledger)")}
+        if "item_key" not in columns:
+            with self.transaction():
+                self._conn.execute("ALTER TABLE ledger ADD COLUMN item_key TEXT")
+                self._conn.execute("ALTER TABLE ledger ADD COLUMN amount INTEGER NOT NULL DEFAULT 0")
+                self._conn.execute("ALTER TABLE ledger ADD COLUMN quantity INTEGER NOT NULL DEFAULT 0")
+                self._conn.execute("ALTER TABLE ledger ADD COLUMN sender TEXT")
+                rows = self._conn.execute("SELECT id, entry FROM ledger").fetchall()
+                self._conn.executemany(
+                    "UPDATE ledger SET item_key = ?, amount = ?, quantity = ?, sender = ? WHERE id = ?",
+                    [self._ledger_columns(json.loads(entry)) + (ledger_id,) for ledger_id, entry in rows],
+                )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ledger_by_item ON ledger (item_key, id)")
+
+    def _build_xp_summary(self):
+        """Materialize XP totals from an XP log written before the summary existed."""
+        with self.transaction():
+            if self._conn.execute("SELECT value FROM meta WHERE key = 'xp_summary_built'").fetchone():
+                return
+            self._conn.execute("DELETE FROM xp_summary")
+            for (entry,) in self._conn.execute("SELECT entry FROM xp_log ORDER BY id").fetchall():
+                self._add_xp_to_summary(json.loads(entry))
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('xp_summary_built', '1')")
+
+    def _add_xp_to_summary(self, entry):
+        character = entry.get("character") or "Unknown"
+        amount, bonus = entry.get("amount", 0) or 0, entry.get("bonus", 0) or 0
+        timestamp = entry.get("timestamp")
+        self._conn.execute(
+            "INSERT INTO xp_summary (slug, reason, character, xp, bonus_xp, awards, first_award, last_award) "
+            "VALUES (?, ?, ?, ?, ?, 1, ?, ?) "
+            "ON CONFLICT (slug, reason) DO UPDATE SET character = excluded.character, "
+            "xp = xp + excluded.xp, bonus_xp = bonus_xp + excluded.bonus_xp, awards = awards + 1, "
+            "first_award = COALESCE(MIN(first_award, excluded.first_award), first_award, excluded.first_award), "
+            "last_award = COALESCE(MAX(last_award, excluded.last_award), last_award, excluded.last_award)",
+            (character_slug(character), entry.get("reason") or "Not specified", character,
+             amount + bonus, bonus, timestamp, timestamp),
+        )
+
+    @staticmethod
+    def _ledger_columns(entry):
+        item = ledger_item(entry)
+        return (item_key(item) if item else None, ledger_amount(entry), ledger_quantity(entry), entry.get("from"))
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            outermost = self._depth == 0
+            if outermost:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if outermost:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if outermost:
+                self._conn.execute("COMMIT")
+                self.writes += 1
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get_inventory(self, character: str) -> dict:
+        rows = self._query("SELECT item, quantity FROM inventory WHERE character = ? ORDER BY rowid", (character,))
+        return {item: quantity for item, quantity in rows}
+
+    def get_item_quantity(self, character: str, item: str) -> int:
+        rows = self._query("SELECT quantity FROM inventory WHERE character = ? AND item = ?", (character, item))
+        return rows[0][0] if rows else 0
+
+    def has_inventory(self, character: str) -> bool:
+        return bool(self._query("SELECT 1 FROM characters WHERE character = ?", (character,)))
+
+    def set_item_quantity(self, character: str, item: str, quantity: int):
+        with self.transaction():
+            self._conn.execute("INSERT OR IGNORE INTO characters (character) VALUES (?)", (character,))
+            if quantity > 0:
+                self._conn.execute(
+                    "INSERT INTO inventory (character, item, quantity) VALUES (?, ?, ?) "
+                    "ON CONFLICT (character, item) DO UPDATE SET quantity = excluded.quantity",
+                    (character, item, quantity),
+                )
+            else:
+                self._conn.execute("DELETE FROM inventory WHERE character = ? AND item = ?", (character, item))
+
+    def set_inventory(self, character: str, items: dict):
+        with self.transaction():
+            self._conn.execute("INSERT OR IGNORE INTO characters (character) VALUES (?)", (character,))
+            self._conn.execute("DELETE FROM inventory WHERE character = ?", (character,))
+            self._conn.executemany(
+                "INSERT INTO inventory (character, item, quantity) VALUES (?, ?, ?)",
+                [(character, item, quantity) for item, quantity in _normalize_inventory(items).items() if quantity > 0],
+            )
+
+    def all_inventories(self) -> dict:
+        inventories = {character: {} for (character,) in self._query("SELECT character FROM characters ORDER BY rowid")}
+        for character, item, quantity in self._query("SELECT character, item, quantity FROM inventory ORDER BY rowid"):
+            inventories.setdefault(character, {})[item] = quantity
+        return inventories
+
+    def get_credits(self, character: str) -> int:
+        rows = self._query("SELECT amount FROM credits WHERE character = ?", (character,))
+        return rows[0][0] if rows else 0
+
+    def set_credits(self, character: str, amount: int):
+        with self.transaction():
+            self._conn.execute(
+                "INSERT INTO credits (character, amount) VALUES (?, ?) "
+                "ON CONFLICT (character) DO UPDATE SET amount = excluded.amount",
+                (character, amount),
+            )
+
+    def all_credits(self) -> dict:
+        return {character: amount for character, amount in self._query("SELECT character, amount FROM credits ORDER BY rowid")}
+
+    def append_ledger(self, entry: dict):
+        with self.transaction():
+            cursor = self._conn.execute(
+                "INSERT INTO ledger (timestamp, type, entry, item_key, amount, quantity, sender) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry.get("timestamp"), entry.get("type"), json.dumps(entry)) + self._ledger_columns(entry),
+            )
+            self._conn.executemany(
+                "INSERT INTO ledger_characters (ledger_id, character) VALUES (?, ?)",
+                [(cursor.lastrowid, name) for name in ledger_characters(entry)],
+            )
+
+    def read_ledger(self) -> list:
+        return [json.loads(entry) for (entry,) in self._query("SELECT entry FROM ledger ORDER BY id")]
+
+    @staticmethod
+    def _ledger_filters(character, entry_type, since, until, item):
+        joins, clauses, params = "", [], []
+        if character is not None:
+            joins = " JOIN ledger_characters lc ON lc.ledger_id = ledger.id"
+            clauses.append("lc.character = ?")
+            params.append(character)
+        if entry_type is not None:
+            clauses.append("ledger.type = ?")
+            params.append(entry_type)
+        if item is not None:
+            clauses.append("ledger.item_key = ?")
+            params.append(item_key(item))
+        if since:
+            clauses.append("ledger.timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("ledger.timestamp <= ?")
+            params.append(until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return joins, where, params
+
+    def query_ledger(self, character: str = None, entry_type: str = None, since: str = None,
+                     until: str = None, offset: int = 0, limit: int = 10, item: str = None) -> tuple:
+        joins, where, params = self._ledger_filters(character, entry_type, since, until, item)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM ledger{joins}{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT ledger.entry FROM ledger{joins}{where} ORDER BY ledger.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return [json.loads(entry) for (entry,) in rows], total
+
+    def ledger_totals(self, character: str = None, entry_type: str = None, since: str = None,
+                      until: str = None, item: str = None) -> dict:
+        joins, where, params = self._ledger_filters(character, entry_type, since, until, item)
+        rows = self._query(
+            f"SELECT ledger.type, ledger.sender, COUNT(*), SUM(ledger.amount), SUM(ledger.quantity) "
+            f"FROM ledger{joins}{where} GROUP BY ledger.type, ledger.sender",
+            params,
+        )
+        summary = {}
+        for kind, sender, count, credits, quantity in rows:
+            if kind == "transfer" and character is not None:
+                kind = "transfer_out" if sender == character else "transfer_in"
+            bucket = summary.setdefault(kind, {"count": 0, "credits": 0, "quantity": 0})
+            bucket["count"] += count
+            bucket["credits"] += credits or 0
+            bucket["quantity"] += quantity or 0
+        return summary
+
+    def append_xp(self, entry: dict):
+        with self.transaction():
+            self._conn.execute(
+                "INSERT INTO xp_log (timestamp, character, entry) VALUES (?, ?, ?)",
+                (entry.get("timestamp"), entry.get("character"), json.dumps(entry)),
+            )
+            self._add_xp_to_summary(entry)
+
+    def read_xp_log(self) -> list:
+        return [json.loads(entry) for (entry,) in self._query("SELECT entry FROM xp_log ORDER BY id")]
+
+    def xp_summary(self, character: str) -> dict:
+        rows = self._query(
+            "SELECT reason, character, xp, bonus_xp, awards, first_award, last_award "
+            "FROM xp_summary WHERE slug = ? ORDER BY rowid",
+            (character_slug(character),),
+        )
+        if not rows:
+            return None
+        summary = {"character": rows[-1][1], "totals": new_xp_totals(), "by_reason": {}}
+        for reason, _, xp, bonus_xp, awards, first_award, last_award in rows:
+            reason_totals = {"xp": xp, "bonus_xp": bonus_xp, "awards": awards,
+                             "first_award": first_award, "last_award": last_award}
+            summary["by_reason"][reason] = reason_totals
+            merge_xp_totals(summary["totals"], reason_totals)
+        return summary
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+BACKENDS = {
+    JsonStateBackend.name: JsonStateBackend,
+    SqliteStateBackend.name: SqliteStateBackend,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> StateBackend:
+    """Return the process-wide state store, opening it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = os.getenv("WHITE_STAR_STATE_BACKEND", DEFAULT_BACKEND).strip().lower()
+                if backend not in BACKENDS:
+                    raise ValueError(f"Unknown state backend '{backend}'. Choose one of: {', '.join(sorted(BACKENDS))}.")
+                _store = BACKENDS[backend]()
+
+                # Serve reads from memory and write back in batches unless disabled
+                if os.getenv("WHITE_STAR_STATE_CACHE", "1").strip() != "0":
+                    from state_cache import CachedStateStore, DEFAULT_FLUSH_INTERVAL, DEFAULT_MAX_DIRTY_SECONDS
+                    _store = CachedStateStore(
+                        _store,
+                        flush_interval=float(os.getenv("WHITE_STAR_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)),
+                        max_dirty_seconds=float(os.getenv("WHITE_STAR_MAX_DIRTY_SECONDS", DEFAULT_MAX_DIRTY_SECONDS)),
+                    )
+    return _store
+
+
+_locks = None
+_state_listeners = []
+
+
+def add_state_listener(callback):
+    """
+    Call callback(characters) at the end of every character_lock() section
+    that changed the store, while the locks are still held, e.g. to mark
+    views derived from those characters' state as stale.
+    """
+    _state_listeners.append(callback)
+
+
+def _notify_state_listeners(characters):
+    names = [name for name in characters if name]
+    for callback in _state_listeners:
+        callback(names)
+
+
+def get_locks():
+    """Return the process-wide character locks for the ephemeral/ directory."""
+    global _locks
+    if _locks is None:
+        with _store_lock:
+            if _locks is None:
+                _locks = make_locks(EPHEMERAL_DIR)
+    return _locks
+
+
+@contextmanager
+def character_lock(*characters):
+    """
+    Hold the cross-process locks of every named character around a
+    read-modify-write of their state:
+
+        with character_lock(sender, receiver), store.transaction():
+            ...
+
+    Cached state for the characters is re-read once the locks are taken,
+    and the changes are written out before they are released, so another
+    session locking the same character always sees them. With
+    WHITE_STAR_SHARED_STATE=0 nothing is locked, so nothing is refreshed or
+    flushed here either and the write-back cache keeps its debounce and
+    round-level batching (see state_cache.py).
+    """
+    store = get_store()
+    with get_locks().characters(*characters) as acquired:
+        if acquired:
+            store.refresh(acquired)
+        writes = store.writes
+        try:
+            yield
+        finally:
+            if acquired:
+                store.flush()
+            if store.writes != writes:
+                _notify_state_listeners(characters)
+
+
+def close_store():
+    """Close the process-wide store; the next get_store() call reopens it."""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "export":
+        target = sys.argv[2] if len(sys.argv) > 2 else EPHEMERAL_DIR
+        for path in get_store().export_json(target):
+            print(f"Exported {path}")
+    else:
+        print("Usage: python state_store.py export [directory]")
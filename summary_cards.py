@@ -0,0 +1,220 @@
+"""
+Pre-rendered character summary cards in characters/summary_cards/<slug>.md.
+
+A card is the character sheet shown on the welcome screen and by
+/show_card: stats, attributes, backstory, abilities, goals, inventory and
+credits, as Markdown. Each card starts with a hash of the content it was
+rendered from:
+
+    <!-- card-hash: 3f2a... -->
+
+Whenever a tool saves a character file or writes to a character's
+inventory or credits, the card is scheduled for rendering; the renders are
+debounced by RENDER_DELAY_SECONDS, so a round of tool calls touching one
+character renders its card once, and pending renders are done at exit.
+A render re-checks the hash and only rewrites the file if something on the
+card actually changed.
+
+Cards are served from memory. A served card is only looked at again when
+its character file changes (mtime or size, as the character repository
+checks it) or when it was scheduled since. Inventory or credit changes
+made by another session show up once this session changes that
+character, or its file, again.
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+
+from character_repository import get_characters
+from state_store import get_store
+
+# Configuration
+SUMMARY_CARDS_DIR = "characters/summary_cards"
+CARD_FORMAT_VERSION = 1  # Bump when render_card() changes so old cards are re-rendered
+HASH_PREFIX = "<!-- card-hash: "
+HASH_SUFFIX = " -->"
+RENDER_DELAY_SECONDS = 0.5  # Quiet period before scheduled cards are rendered
+
+
+def card_hash(char_data: dict, inventory: dict, credits: int) -> str:
+    """Return the content hash of everything a card shows."""
+    content = json.dumps([CARD_FORMAT_VERSION, char_data, inventory, credits], sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+def render_card(char_data: dict, inventory: dict, credits: int) -> str:
+    """Render a character's summary card as Markdown (without the hash line)."""
+    lines = [f"# {char_data.get('name', 'Unknown')}", "", "## 📊 Character Information"]
+    lines.append(f"- Class: {char_data.get('class', 'Unknown')}")
+    lines.append(f"- Race: {char_data.get('race', 'Unknown')}")
+    lines.append(f"- Level: {char_data.get('level', 1)}")
+    lines.append(f"- XP: {char_data.get('experience', 0)}")
+    lines.append(f"- HP: {char_data.get('hp', 0)}/{char_data.get('max_hp', 0)}")
+
+    if char_data.get("attributes"):
+        lines += ["", "## 📈 Attributes"]
+        for attr, values in char_data["attributes"].items():
+            value = values["total"] if isinstance(values, dict) and "total" in values else values
+            lines.append(f"- {attr}: {value}")
+
+    if char_data.get("backstory"):
+        lines += ["", "## 📖 Backstory", char_data["backstory"]]
+
+    if char_data.get("special_abilities"):
+        lines += ["", "## ✨ Special Abilities"] + [f"- {ability}" for ability in char_data["special_abilities"]]
+
+    if char_data.get("goals"):
+        lines += ["", "## 🎯 Long-Term Goals"] + [f"- {goal}" for goal in char_data["goals"]]
+
+    lines += ["", "## 🎒 Inventory"]
+    lines += [f"- {item} × {quantity}" for item, quantity in inventory.items()] or ["- Empty"]
+    lines += ["", f"## 💰 Credits: {credits}"]
+    return "\n".join(lines) + "\n"
+
+
+class SummaryCards:
+    """Summary card files, re-rendered only when their content hash changes."""
+
+    def __init__(self, characters=None, store=None, directory: str = SUMMARY_CARDS_DIR):
+        """
+        Args:
+            characters: The CharacterRepository to read character files from (default: get_characters())
+            store: The state store to read inventory and credits from (default: get_store())
+            directory: Where card files are written
+        """
+        self.characters = characters
+        self.store = store
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._hashes = {}  # slug -> hash of the card on disk
+        self._served = {}  # slug -> (character file signature, card text)
+        self._stale = set()  # slugs whose state changed since they were served
+        self._pending = {}  # slug -> character name, scheduled for rendering
+        self._timer = None
+        self.renders = 0
+        self.hits = 0
+
+        atexit.register(self.flush)
+
+    def path(self, character: str) -> str:
+        return os.path.join(self.directory, f"{(self.characters or get_characters()).slug(character)}.md")
+
+    def _hash_on_disk(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                first_line = f.readline().strip()
+        except FileNotFoundError:
+            return None
+        if first_line.startswith(HASH_PREFIX) and first_line.endswith(HASH_SUFFIX):
+            return first_line[len(HASH_PREFIX):-len(HASH_SUFFIX)]
+        return None
+
+    def refresh(self, character: str) -> bool:
+        """
+        Re-render a character's card if anything on it changed.
+
+        Returns:
+            True if the card was written, False if it was already current
+            (or the character has no character file)
+        """
+        characters = self.characters or get_characters()
+        store = self.store or get_store()
+        try:
+            char_data = characters.load(character)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        inventory = store.get_inventory(character)
+        credits = store.get_credits(character)
+        digest = card_hash(char_data, inventory, credits)
+
+        slug = characters.slug(character)
+        path = self.path(character)
+        with self._lock:
+            if self._hashes.get(slug) == digest:
+                return False
+            if self._hash_on_disk(path) == digest:
+                self._hashes[slug] = digest
+                return False
+
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(f"{HASH_PREFIX}{digest}{HASH_SUFFIX}\n")
+                f.write(render_card(char_data, inventory, credits))
+            os.replace(temp_path, path)
+            self._hashes[slug] = digest
+            self.renders += 1
+            return True
+
+    def schedule(self, characters):
+        """Render these characters' cards once no further change has come in for RENDER_DELAY_SECONDS."""
+        characters_repo = self.characters or get_characters()
+        with self._lock:
+            for character in characters:
+                slug = characters_repo.slug(character)
+                self._stale.add(slug)
+                self._pending[slug] = character
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(RENDER_DELAY_SECONDS, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Render every scheduled card now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, {}
+        for character in pending.values():
+            self.card(character)
+
+    def card(self, character: str) -> str:
+        """
+        Return a character's card (without the hash line), from memory unless it is stale.
+
+        Returns:
+            The card's Markdown, or None if the character has no character file
+        """
+        characters = self.characters or get_characters()
+        slug = characters.slug(character)
+        signature = characters.signature(character)
+        if signature is None:
+            return None
+        with self._lock:
+            served = self._served.get(slug)
+            if served and served[0] == signature and slug not in self._stale:
+                self.hits += 1
+                return served[1]
+            # Cleared before checking, so a change made meanwhile marks it stale again
+            self._stale.discard(slug)
+
+        self.refresh(character)
+        try:
+            with open(self.path(character), "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return None
+        if lines and lines[0].startswith(HASH_PREFIX):
+            lines = lines[1:]
+        text = "".join(lines)
+        with self._lock:
+            self._served[slug] = (signature, text)
+        return text
+
+
+_cards = None
+_cards_lock = threading.Lock()
+
+
+def get_summary_cards() -> SummaryCards:
+    """Return the process-wide summary cards, using the process-wide repository and store."""
+    global _cards
+    if _cards is None:
+        with _cards_lock:
+            if _cards is None:
+                _cards = SummaryCards()
+    return _cards
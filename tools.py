@@ -1,155 +1,171 @@
 import json
-import random
-import re
 import os
 import math
 import inspect
 import sys
+from typing import List
+from pydantic import BaseModel, Field
 from kani.ai_function import AIFunction, ai_function
 from datetime import datetime
 from character_creation.name_generator import generate_name_by_class, generate_last_name, generate_robot_name
+from state_store import get_store, character_lock, add_state_listener
+from async_io import run_io, read_json, read_text, _write_json
+from ledger import ledger_timestamp, normalize_time_bound
+from character_repository import get_characters
+from roster import get_roster
+from summary_cards import get_summary_cards
+from advancement_tables import SLOT_KINDS, get_advancement_tables
+from equipment_catalog import get_equipment_catalog
+from dice import RollResult, format_dice_roll, roll, roll_notation
+from xp_progression import apply_level, apply_xp_award, format_hp_roll
 
 # Configuration
 NUM_RECENT_USER_MESSAGES = 10  # Change this value to adjust the summary range
 SCENE_LOG_PATH = "ephemeral/scene_log.json"
-XP_LOG_PATH = "ephemeral/xp_log.json"
+PARTY_STATE_PATH = "ephemeral/party_state.json"
+VALID_ATTRIBUTES = ["strength", "intelligence", "wisdom", "constitution", "dexterity", "charisma"]
+GROUP_CHECK_MODES = ["each", "majority", "best"]
+ROSTER_PAGE_SIZE = 10  # Characters per page in the character menu
+SEARCH_RESULTS = 5  # Candidates buy_item suggests when a name does not match
+
+# Re-render summary cards after inventory, credit and character file changes
+add_state_listener(lambda characters: get_summary_cards().schedule(characters))
+get_characters().save_listeners.append(lambda character: get_summary_cards().schedule([character]))
 
 def get_character_pronouns(character: str) -> dict:
     """Get the pronouns for a character from their character file."""
-    char_slug = character.lower().replace(" ", "_")
-    char_path = f"characters/{char_slug}.json"
-    try:
-        with open(char_path, "r") as f:
-            char_data = json.load(f)
-            return char_data.get("pronouns", {
-                "subject": "they",
-                "object": "them",
-                "possessive_adjective": "their",
-                "possessive_pronoun": "theirs",
-                "reflexive": "themself"
-            })
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {
-            "subject": "they",
-            "object": "them",
-            "possessive_adjective": "their",
-            "possessive_pronoun": "theirs",
-            "reflexive": "themself"
-        }
+    return get_characters().pronouns(character)
 
 def log_transaction(entry: dict):
-    """Append a transaction entry to ledger.json with a timestamp."""
-    LEDGER_PATH = "ephemeral/ledger.json"
-
+    """Append a transaction entry to the ledger with a timestamp."""
     # Ensure timestamp exists
-    entry["timestamp"] = datetime.utcnow().isoformat() + "Z"
-
-    try:
-        with open(LEDGER_PATH, "r") as f:
-            ledger = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        ledger = []
+    entry["timestamp"] = ledger_timestamp()
 
-    ledger.append(entry)
-
-    with open(LEDGER_PATH, "w") as f:
-        json.dump(ledger, f, indent=2)
+    get_store().append_ledger(entry)
 
 async def roll_dice(dice: str) -> str:
     """Roll dice using standard RPG notation (e.g., 1d6, 2d10+3, 1d100-2)."""
-    pattern = r"(?P<num>\d*)d(?P<die>\d+)(?P<mod>[+-]\d+)?"
-    match = re.fullmatch(pattern, dice.replace(" ", ""))
-    if not match:
-        return "Invalid format. Use notation like 2d6, 1d20+4, or 3d8-2."
-
-    num = int(match.group("num") or 1)
-    die = int(match.group("die"))
-    mod = int(match.group("mod") or 0)
-
-    if die not in {4, 6, 8, 10, 12, 20, 100}:
-        return f"d{die} is not a valid die type in White Star."
-
-    rolls = [random.randint(1, die) for _ in range(num)]
-    total = sum(rolls) + mod
-    mod_str = f" {mod:+}" if mod else ""
-    return f"🎲 Rolling {dice}: {rolls}{mod_str} → Total: {total}"
+    try:
+        result = roll_notation(dice)
+    except ValueError as e:
+        return str(e)
+    return format_dice_roll(result)
 
 async def add_inventory(character: str, item: str, quantity: int = 1) -> str:
     """Add an item and quantity to a character's inventory."""
-    INVENTORY_PATH = "ephemeral/inventory.json"
-
-    try:
-        with open(INVENTORY_PATH, "r") as f:
-            inventory = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        inventory = {}
+    store = get_store()
 
-    # Convert legacy list format to dict
-    if isinstance(inventory[character], list):
-        inventory[character] = {item: 1 for item in inventory[character]}
-
-    if character not in inventory:
-        inventory[character] = {}
-
-    character_inventory = inventory[character]
-
-    if item in character_inventory:
-        character_inventory[item] += quantity
-    else:
-        character_inventory[item] = quantity
-
-    with open(INVENTORY_PATH, "w") as f:
-        json.dump(inventory, f, indent=2)
+    def apply():
+        with character_lock(character), store.transaction():
+            current = store.get_item_quantity(character, item)
+            store.set_item_quantity(character, item, current + quantity)
 
+    await run_io(apply)
     return f"Added {quantity} × {item} to {character}'s inventory."
 
 async def remove_inventory(character: str, item: str, quantity: int = 1) -> str:
     """Remove a quantity of an item from a character's inventory."""
-    INVENTORY_PATH = "ephemeral/inventory.json"
+    store = get_store()
 
-    try:
-        with open(INVENTORY_PATH, "r") as f:
-            inventory = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return f"Could not access inventory data."
+    def apply():
+        with character_lock(character), store.transaction():
+            if not store.has_inventory(character):
+                return f"No inventory found for {character}."
+
+            current = store.get_item_quantity(character, item)
+            if current <= 0:
+                return f"{item} not found in {character}'s inventory."
 
-    # Convert legacy list format to dict
-    if isinstance(inventory[character], list):
-        inventory[character] = {item: 1 for item in inventory[character]}
+            if current < quantity:
+                return f"{character} only has {current} × {item}."
 
-    if character not in inventory:
-        return f"No inventory found for {character}."
+            store.set_item_quantity(character, item, current - quantity)
 
-    character_inventory = inventory[character]
+        return f"Removed {quantity} × {item} from {character}'s inventory."
 
-    if item not in character_inventory:
-        return f"{item} not found in {character}'s inventory."
+    return await run_io(apply)
 
-    if character_inventory[item] < quantity:
-        return f"{character} only has {character_inventory[item]} × {item}."
+class InventoryChange(BaseModel):
+    """One line of a batch inventory update."""
+    item: str = Field(description="Item name")
+    quantity: int = Field(description="How many to add (positive) or remove (negative)")
 
-    character_inventory[item] -= quantity
+async def apply_inventory_changes(character: str, changes: List[InventoryChange]) -> str:
+    """
+    Add and remove several items in one step, e.g. to hand out loot.
+
+    Either every change is applied or none are: if any removal asks for
+    more than the character has, nothing changes.
+
+    Args:
+        character: The character's name
+        changes: List of {item, quantity} entries; positive quantities add, negative remove
 
-    if character_inventory[item] <= 0:
-        del character_inventory[item]
+    Returns:
+        One message summarizing every change
+    """
+    # Combine repeated items so each is read and written once
+    deltas = {}
+    for change in changes:
+        item, quantity = (change.item, change.quantity) if isinstance(change, InventoryChange) else (change["item"], change["quantity"])
+        deltas[item] = deltas.get(item, 0) + quantity
+
+    if not deltas:
+        return "No inventory changes given."
+
+    store = get_store()
+
+    def apply():
+        with character_lock(character), store.transaction():
+            inventory = store.get_inventory(character)
+
+            # Validate everything before touching the inventory
+            shortages = [
+                f"{item} (has {inventory.get(item, 0)}, needs {-delta})"
+                for item, delta in deltas.items()
+                if inventory.get(item, 0) + delta < 0
+            ]
+            if shortages:
+                return f"No changes made. {character} does not have enough: " + ", ".join(shortages) + "."
 
-    with open(INVENTORY_PATH, "w") as f:
-        json.dump(inventory, f, indent=2)
+            added, removed = [], []
+            for item, delta in deltas.items():
+                if delta == 0:
+                    continue
+                store.set_item_quantity(character, item, inventory.get(item, 0) + delta)
+                (added if delta > 0 else removed).append(f"{abs(delta)} × {item}")
+
+        lines = [f"🎒 Updated {character}'s inventory:"]
+        if added:
+            lines.append("Added: " + ", ".join(added))
+        if removed:
+            lines.append("Removed: " + ", ".join(removed))
+        if not added and not removed:
+            lines.append("No net changes.")
+        return "\n".join(lines)
 
-    return f"Removed {quantity} × {item} from {character}'s inventory."
+    return await run_io(apply)
 
 async def show_inventory(character: str = None) -> str:
-    """Show the full inventory for a character."""
+    """Show the full inventory for a character, or for every character if none is given."""
+    store = get_store()
+
     if character is None:
-        return "Please specify a character name."
+        # Read one character's shard at a time rather than everything at once
+        def render_all():
+            sections = []
+            for name, items in store.iter_inventories():
+                lines = [f"- {item}: {quantity}" for item, quantity in items.items()] or ["- Empty"]
+                sections.append(f"🎒 {name}'s Inventory:\n" + "\n".join(lines))
+            return "\n\n".join(sections) if sections else "No inventories found."
 
-    try:
-        with open("ephemeral/inventory.json", "r") as f:
-            inventory = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return f"No inventory found for {character}."
+        return await run_io(render_all)
+
+    def read():
+        with character_lock(character):
+            return store.get_inventory(character)
 
-    char_inventory = inventory.get(character, {})
+    char_inventory = await run_io(read)
     if not char_inventory:
         return f"{character} has no items in their inventory."
 
@@ -159,225 +175,307 @@ async def show_inventory(character: str = None) -> str:
 
 async def add_credits(character: str, amount: int) -> str:
     """Add credits to a character's balance."""
-    CREDITS_PATH = "ephemeral/credits.json"
-
-    try:
-        with open(CREDITS_PATH, "r") as f:
-            credits = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        credits = {}
-
-    credits[character] = credits.get(character, 0) + amount
-
-    with open(CREDITS_PATH, "w") as f:
-        json.dump(credits, f, indent=2)
+    store = get_store()
+
+    def apply():
+        with character_lock(character), store.transaction():
+            balance = store.get_credits(character) + amount
+            store.set_credits(character, balance)
+
+            # 🧾 Log it here — in the same transaction as the balance change
+            log_transaction({
+            "type": "add",
+            "character": character,
+            "amount": amount,
+            "source": "manual"
+            })
 
-    # 🧾 Log it here — AFTER writing the file
-    log_transaction({
-    "type": "add",
-    "character": character,
-    "amount": amount,
-    "source": "manual"
-    })
+        return f"{character} now has {balance} credits."
 
-    return f"{character} now has {credits[character]} credits."
+    return await run_io(apply)
     
 async def spend_credits(character: str, amount: int) -> str:
     """Spend credits from a character's balance."""
-    CREDITS_PATH = "ephemeral/credits.json"
-
-    try:
-        with open(CREDITS_PATH, "r") as f:
-            credits = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        credits = {}
-
-    current = credits.get(character, 0)
-    if amount > current:
-        return f"{character} only has {current} credits. Transaction declined."
-
-    credits[character] -= amount
-
-    with open(CREDITS_PATH, "w") as f:
-        json.dump(credits, f, indent=2)
+    store = get_store()
+
+    def apply():
+        with character_lock(character), store.transaction():
+            current = store.get_credits(character)
+            if amount > current:
+                return f"{character} only has {current} credits. Transaction declined."
+
+            balance = current - amount
+            store.set_credits(character, balance)
+
+            # 🧾 Log it here — in the same transaction as the balance change
+            log_transaction({
+            "type": "spend",
+            "character": character,
+            "amount": amount,
+            "purpose": "manual spend"
+            })
 
-    # 🧾 Log it here — AFTER writing the file
-    log_transaction({
-    "type": "spend",
-    "character": character,
-    "amount": amount,
-    "purpose": "manual spend"
-    })
+        return f"{character} now has {balance} credits."
 
-    return f"{character} now has {credits[character]} credits."
+    return await run_io(apply)
 
 async def show_credits(character: str = None) -> str:
-    """Show the current credits for a character."""
+    """Show the current credits for a character, or for every character if none is given."""
+    store = get_store()
+
     if character is None:
-        return "Please specify a character name."
+        lines = await run_io(lambda: [f"- {name}: {amount}" for name, amount in store.iter_credits()])
+        return "💰 Credits:\n" + "\n".join(lines) if lines else "No credits found."
 
-    try:
-        with open("ephemeral/credits.json", "r") as f:
-            credits = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return f"No credits found for {character}."
+    def read():
+        with character_lock(character):
+            return store.get_credits(character)
 
-    char_credits = credits.get(character, 0)
+    char_credits = await run_io(read)
     return f"💰 {character}'s Credits: {char_credits}"
 
 async def buy_item(character: str, item: str, quantity: int = 1) -> str:
     """Buy one or more of an item if the character has enough credits."""
-    CREDITS_PATH = "ephemeral/credits.json"
-    INVENTORY_PATH = "ephemeral/inventory.json"
-
-    # Load credits
-    try:
-        with open(CREDITS_PATH, "r") as f:
-            credits = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        credits = {}
-
-    char_credits = credits.get(character, 0)
-
-    # Search for item using fuzzy matching
-    import os
-    import difflib
-
-    equipment_path = "equipment"
-    best_match = None
-    best_ratio = 0.0
-
-    for file in os.listdir(equipment_path):
-        if file.endswith(".json"):
-            with open(os.path.join(equipment_path, file)) as f:
-                data = json.load(f)
-                for category in data.values():
-                    for entry in category:
-                        entry_name = entry["name"]
-                        ratio = difflib.SequenceMatcher(None, entry_name.lower(), item.lower()).ratio()
-                        if ratio > best_ratio:
-                            best_match = entry
-                            best_ratio = ratio
-
-    item_data = best_match
-    item_cost = best_match.get("cost", None) if best_match else None
-
-    if not item_data or best_ratio < 0.6:
-        return f"Item '{item}' not found. Closest match was too different: '{best_match['name']}'"
-
-    total_cost = item_cost * quantity
-    if char_credits < total_cost:
-        return f"{character} has {char_credits} credits but needs {total_cost} to buy {quantity} × '{item_data['name']}'."
-
-    # Deduct credits
-    credits[character] -= total_cost
-    with open(CREDITS_PATH, "w") as f:
-        json.dump(credits, f, indent=2)
-
-    # Load and update inventory
-    try:
-        with open(INVENTORY_PATH, "r") as f:
-            inventory = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        inventory = {}
+    store = get_store()
+
+    # Resolve the name through the catalog's exact, alias and trigram indexes
+    item_data, candidates = await run_io(lambda: get_equipment_catalog().resolve(item, k=SEARCH_RESULTS))
+
+    if not item_data:
+        if not candidates:
+            return f"Item '{item}' not found."
+        return f"Item '{item}' not found or ambiguous. Did you mean one of these?\n" + _format_equipment_results(candidates)
+
+    total_cost = item_data.cost * quantity
+
+    def apply():
+        with character_lock(character), store.transaction():
+            char_credits = store.get_credits(character)
+            if char_credits < total_cost:
+                return f"{character} has {char_credits} credits but needs {total_cost} to buy {quantity} × '{item_data.name}'."
+
+            # Deduct credits
+            balance = char_credits - total_cost
+            store.set_credits(character, balance)
+
+            # Update inventory
+            owned = store.get_item_quantity(character, item_data.name)
+            store.set_item_quantity(character, item_data.name, owned + quantity)
+
+            # 🧾 Log it here — in the same transaction as the purchase
+            log_transaction({
+            "type": "purchase",
+            "character": character,
+            "item": item_data.name,
+            "quantity": quantity,
+            "total_cost": total_cost
+            })
 
-    if character in inventory and isinstance(inventory[character], list):
-        inventory[character] = {i: 1 for i in inventory[character]}
+        return f"{character} bought {quantity} × '{item_data.name}' for {total_cost} credits. Remaining balance: {balance} credits."
 
-    if character not in inventory:
-        inventory[character] = {}
+    return await run_io(apply)
 
-    inventory[character][item_data['name']] = inventory[character].get(item_data['name'], 0) + quantity
+def _format_equipment_results(results: list) -> str:
+    lines = []
+    for rank, (entry, score) in enumerate(results, 1):
+        line = f"{rank}. {entry.name} ({entry.category.replace('_', ' ')}) - {entry.cost} credits"
+        details = [f"{key}: {value}" for key, value in (("damage", entry.damage), ("ac", entry.ac), ("aac", entry.aac)) if value]
+        if details:
+            line += f" [{', '.join(details)}]"
+        if score:
+            line += f" · match {score:.0%}"
+        lines.append(line)
+    return "\n".join(lines)
 
-    with open(INVENTORY_PATH, "w") as f:
-        json.dump(inventory, f, indent=2)
+async def search_equipment(query: str = "", k: int = 5, category: str = None, max_cost: int = None) -> str:
+    """
+    Search the equipment catalog and list the best matches with prices, e.g. to find
+    the exact name of an item before buying it, or what a character can afford.
 
-    # 🧾 Log it here — AFTER writing the file
-    log_transaction({
-    "type": "purchase",
-    "character": character,
-    "item": item_data['name'],
-    "quantity": quantity,
-    "total_cost": total_cost
-    })
+    Args:
+        query: Item name or part of one (misspellings are fine); leave empty to list a category cheapest first
+        k: Maximum number of results (default: 5)
+        category: Only this category: armor, melee weapons, ranged weapons, standard gear (or weapons for both kinds)
+        max_cost: Only items costing at most this many credits
 
-    return f"{character} bought {quantity} × '{item_data['name']}' for {total_cost} credits. Remaining balance: {credits[character]} credits."
+    Returns:
+        Ranked candidates with category, price, damage or armor class, and match score
+    """
+    k = max(1, min(k, 25))
+    results = await run_io(lambda: get_equipment_catalog().search(query, k=k, category=category, max_cost=max_cost))
+    filters = [label for label in (
+        category and f"category {category}",
+        max_cost is not None and f"up to {max_cost} credits",
+    ) if label]
+    scope = f"'{query}'" if query else "all items"
+    if filters:
+        scope += f" ({', '.join(filters)})"
+    if not results:
+        return f"No equipment found for {scope}."
+    return f"🔍 Equipment matching {scope}:\n" + _format_equipment_results(results)
 
 async def transfer_credits(sender: str, receiver: str, amount: int) -> str:
     """Transfer credits from one character to another."""
-    CREDITS_PATH = "ephemeral/credits.json"
+    store = get_store()
 
-    try:
-        with open(CREDITS_PATH, "r") as f:
-            credits = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        credits = {}
+    def apply():
+        with character_lock(sender, receiver), store.transaction():
+            sender_balance = store.get_credits(sender)
 
-    sender_balance = credits.get(sender, 0)
+            if sender_balance < amount:
+                return f"{sender} only has {sender_balance} credits. Transfer of {amount} credits failed."
 
-    if sender_balance < amount:
-        return f"{sender} only has {sender_balance} credits. Transfer of {amount} credits failed."
+            store.set_credits(sender, sender_balance - amount)
+            store.set_credits(receiver, store.get_credits(receiver) + amount)
 
-    credits[sender] -= amount
-    credits[receiver] = credits.get(receiver, 0) + amount
+            # 🧾 Log it here — in the same transaction as the balance changes
+            log_transaction({
+            "type": "transfer",
+            "from": sender,
+            "to": receiver,
+            "amount": amount
+            })
 
-    with open(CREDITS_PATH, "w") as f:
-        json.dump(credits, f, indent=2)
+            sender_balance = store.get_credits(sender)
+            receiver_balance = store.get_credits(receiver)
 
-    # 🧾 Log it here — AFTER writing the file
-    log_transaction({
-    "type": "transfer",
-    "from": sender,
-    "to": receiver,
-    "amount": amount
-    })
+        return f"{sender} transferred {amount} credits to {receiver}. New balances: {sender} = {sender_balance}, {receiver} = {receiver_balance}"
 
-    return f"{sender} transferred {amount} credits to {receiver}. New balances: {sender} = {credits[sender]}, {receiver} = {credits[receiver]}"
+    return await run_io(apply)
 
-async def show_ledger(character: str = None) -> str:
-    """Show the last 10 transactions for a character."""
+async def show_ledger(character: str = None, page: int = 1, page_size: int = 10, since: str = None, until: str = None) -> str:
+    """
+    Show a page of a character's transactions, most recent first.
+
+    Args:
+        character: The character's name
+        page: Which page of results to show (1 = most recent)
+        page_size: Number of transactions per page (default: 10)
+        since: Only show transactions on or after this date/time (e.g., 2025-05-01)
+        until: Only show transactions on or before this date/time
+
+    Returns:
+        A formatted list of transactions
+    """
     if character is None:
         return "Please specify a character name."
 
+    page = max(1, page)
+    page_size = max(1, page_size)
     try:
-        with open("ephemeral/ledger.json", "r") as f:
-            ledger = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return f"No transaction history found for {character}."
-
-    # Filter transactions for this character
-    char_transactions = [
-        t for t in ledger 
-        if character in [t.get("sender"), t.get("receiver")]
-    ]
+        since_ts = normalize_time_bound(since)
+        until_ts = normalize_time_bound(until, end=True)
+    except ValueError:
+        return "Invalid date. Use a format like 2025-05-01 or 2025-05-01T14:30."
+
+    recent, total = await run_io(
+        get_store().query_ledger,
+        character, since=since_ts, until=until_ts, offset=(page - 1) * page_size, limit=page_size
+    )
 
-    if not char_transactions:
+    if not total:
+        if since_ts or until_ts:
+            return f"No transactions found for {character} in that time range."
         return f"No transactions found for {character}."
+    if not recent:
+        return f"No transactions on page {page} for {character}."
 
-    # Get the last 10 transactions, most recent first
-    recent = char_transactions[-10:][::-1]
-    
-    # Format each transaction
-    formatted = []
-    for t in recent:
-        if t["type"] == "transfer":
-            if t["sender"] == character:
-                msg = f"Sent {t['amount']} credits to {t['receiver']}"
-            else:
-                msg = f"Received {t['amount']} credits from {t['sender']}"
+    formatted = [_format_ledger_entry(t, character) for t in recent]
+
+    pages = (total + page_size - 1) // page_size
+    return f"📜 Transactions for {character} (page {page} of {pages}, {total} total):\n" + "\n".join(f"- {t}" for t in formatted)
+
+def _format_ledger_entry(t: dict, character: str = None) -> str:
+    """Describe one ledger entry, from the point of view of a character if given."""
+    if t["type"] == "transfer":
+        if character is None:
+            msg = f"Transfer: {t['from']} → {t['to']}, {t['amount']} credits"
+        elif t.get("from") == character:
+            msg = f"Sent {t['amount']} credits to {t['to']}"
         else:
-            msg = f"{t['type'].title()}: {t['amount']} credits"
-            if t.get("reason"):
-                msg += f" ({t['reason']})"
-        
-        # Add timestamp if available
-        if "timestamp" in t:
-            timestamp = datetime.fromisoformat(t["timestamp"]).strftime("%Y-%m-%d %H:%M")
-            msg = f"{timestamp}: {msg}"
-            
-        formatted.append(msg)
+            msg = f"Received {t['amount']} credits from {t['from']}"
+    elif t["type"] == "purchase":
+        msg = f"Purchase: {t.get('quantity', 1)} × {t.get('item')} for {t.get('total_cost', 0)} credits"
+        if character is None:
+            msg = f"{t.get('character')} — {msg}"
+    else:
+        msg = f"{t['type'].title()}: {t.get('amount', 0)} credits"
+        if t.get("reason"):
+            msg += f" ({t['reason']})"
+        if character is None:
+            msg = f"{t.get('character')} — {msg}"
+
+    # Add timestamp if available
+    if "timestamp" in t:
+        timestamp = datetime.fromisoformat(t["timestamp"].rstrip("Z")).strftime("%Y-%m-%d %H:%M")
+        msg = f"{timestamp}: {msg}"
+
+    return msg
 
-    return f"📜 Recent transactions for {character}:\n" + "\n".join(f"- {t}" for t in formatted)
+async def query_ledger(character: str = None, type: str = None, item: str = None, since: str = None,
+                       until: str = None, page: int = 1, page_size: int = 10) -> str:
+    """
+    Search the transaction ledger and total up what matched, e.g. "all purchases
+    of Laser Pistol" or "credits spent by Jax since 2025-05-01". Every filter is optional.
+
+    Args:
+        character: Only transactions involving this character
+        type: Only this kind of transaction: add, spend, purchase or transfer
+        item: Only transactions for this item (e.g., Laser Pistol)
+        since: Only transactions on or after this date/time (e.g., 2025-05-01)
+        until: Only transactions on or before this date/time
+        page: Which page of matches to list (1 = most recent)
+        page_size: Number of transactions per page (default: 10)
+
+    Returns:
+        Totals per transaction type followed by a page of matching transactions
+    """
+    page = max(1, page)
+    page_size = max(1, page_size)
+    entry_type = type.strip().lower() if type else None
+    try:
+        since_ts = normalize_time_bound(since)
+        until_ts = normalize_time_bound(until, end=True)
+    except ValueError:
+        return "Invalid date. Use a format like 2025-05-01 or 2025-05-01T14:30."
+
+    store = get_store()
+    filters = dict(character=character, entry_type=entry_type, since=since_ts, until=until_ts, item=item)
+
+    def run_query():
+        entries, total = store.query_ledger(offset=(page - 1) * page_size, limit=page_size, **filters)
+        return entries, total, store.ledger_totals(**filters)
+
+    entries, total, totals = await run_io(run_query)
+
+    described = [
+        label for label in (
+            character,
+            entry_type and f"type {entry_type}",
+            item and f"item {item}",
+            since and f"since {since}",
+            until and f"until {until}",
+        ) if label
+    ]
+    scope = ", ".join(described) if described else "all transactions"
+    if not total:
+        return f"No transactions found for {scope}."
+
+    labels = {"transfer_out": "Transfers sent", "transfer_in": "Transfers received"}
+    lines = [f"📊 Ledger query: {scope} ({total} matching)"]
+    for kind, bucket in sorted(totals.items()):
+        line = f"- {labels.get(kind, str(kind).title())}: {bucket['count']} transaction{'s' if bucket['count'] != 1 else ''}, {bucket['credits']} credits"
+        if bucket["quantity"]:
+            line += f", {bucket['quantity']} items"
+        lines.append(line)
+
+    pages = (total + page_size - 1) // page_size
+    if entries:
+        lines.append(f"\n📜 Page {page} of {pages}:")
+        lines.extend(f"- {_format_ledger_entry(t, character)}" for t in entries)
+    else:
+        lines.append(f"\nNo transactions on page {page}.")
+    return "\n".join(lines)
 
 @ai_function()
 async def start_scenario(character: str) -> str:
@@ -388,19 +486,18 @@ async def start_scenario(character: str) -> str:
     sys.path.append('.')
     
     # Get character's pronouns
-    pronouns = get_character_pronouns(character)
+    pronouns = await run_io(get_character_pronouns, character)
     
     # Try to include recent scene summaries if available
     recap = ""
     try:
         if os.path.exists(SCENE_LOG_PATH):
-            with open(SCENE_LOG_PATH, "r") as f:
-                logs = json.load(f)
-                if logs:
-                    recent = logs[-3:]  # Get last 3 scenes
-                    bullet_points = [f"- {entry['summary']}" for entry in recent if entry.get("summary")]
-                    if bullet_points:
-                        recap = f"📖 **Previously on {character}'s journey:**\n" + "\n".join(bullet_points) + "\n\n"
+            logs = await read_json(SCENE_LOG_PATH)
+            if logs:
+                recent = logs[-3:]  # Get last 3 scenes
+                bullet_points = [f"- {entry['summary']}" for entry in recent if entry.get("summary")]
+                if bullet_points:
+                    recap = f"📖 **Previously on {character}'s journey:**\n" + "\n".join(bullet_points) + "\n\n"
     except Exception as e:
         recap = ""  # Fallback to no recap if something goes wrong
 
@@ -488,56 +585,58 @@ async def start_scenario(character: str) -> str:
 
 async def log_scene(character: str, title: str, summary: str) -> str:
     """Logs a summarized scene entry for the specified character."""
-    # Create scene_log directory if it doesn't exist
-    os.makedirs("scene_log", exist_ok=True)
-    
-    # Create character-specific log file path
-    char_slug = character.lower().replace(" ", "_")
-    log_path = f"scene_log/{char_slug}.json"
-    
-    log_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "title": title,
-        "summary": summary
-    }
-
-    try:
-        # Load existing log or create new one
-        if os.path.exists(log_path):
-            with open(log_path, "r") as f:
-                content = f.read().strip()
-                data = json.loads(content) if content else []
-        else:
-            data = []
-
-        # Check for similar recent entries to prevent duplicates
-        if data:
-            last_entry = data[-1]
-            # Parse timestamps
-            last_time = datetime.fromisoformat(last_entry["timestamp"])
-            current_time = datetime.fromisoformat(log_entry["timestamp"])
-            time_diff = (current_time - last_time).total_seconds()
+    def apply():
+        with character_lock(character):
+            # Create scene_log directory if it doesn't exist
+            os.makedirs("scene_log", exist_ok=True)
+    
+            # Create character-specific log file path
+            char_slug = character.lower().replace(" ", "_")
+            log_path = f"scene_log/{char_slug}.json"
+    
+            log_entry = {
+                "timestamp": datetime.now().isoformat(),
+                "title": title,
+                "summary": summary
+            }
+
+            try:
+                # Load existing log or create new one
+                if os.path.exists(log_path):
+                    with open(log_path, "r") as f:
+                        content = f.read().strip()
+                    data = json.loads(content) if content else []
+                else:
+                    data = []
+
+                # Check for similar recent entries to prevent duplicates
+                if data:
+                    last_entry = data[-1]
+                    # Parse timestamps
+                    last_time = datetime.fromisoformat(last_entry["timestamp"])
+                    current_time = datetime.fromisoformat(log_entry["timestamp"])
+                    time_diff = (current_time - last_time).total_seconds()
             
-            # If it's a session end and the last entry was also a session end
-            # within the last hour, update the existing entry instead
-            if (title == "Session End" and 
-                last_entry["title"] == "Session End" and 
-                time_diff < 3600):  # 1 hour in seconds
-                data[-1] = log_entry
-                with open(log_path, "w") as f:
-                    json.dump(data, f, indent=2)
-                return f'📝 Updated session end log for {character}.'
-
-        # Append new entry
-        data.append(log_entry)
-
-        # Save updated log
-        with open(log_path, "w") as f:
-            json.dump(data, f, indent=2)
-
-        return f'📝 Scene "{title}" has been logged for {character}.'
-    except Exception as e:
-        return f"Failed to log scene: {e}"
+                    # If it's a session end and the last entry was also a session end
+                    # within the last hour, update the existing entry instead
+                    if (title == "Session End" and 
+                        last_entry["title"] == "Session End" and 
+                        time_diff < 3600):  # 1 hour in seconds
+                        data[-1] = log_entry
+                        _write_json(log_path, data)
+                        return f'📝 Updated session end log for {character}.'
+
+                # Append new entry
+                data.append(log_entry)
+
+                # Save updated log
+                _write_json(log_path, data)
+
+                return f'📝 Scene "{title}" has been logged for {character}.'
+            except Exception as e:
+                return f"Failed to log scene: {e}"
+
+    return await run_io(apply)
 
 async def summarize_recent_chat(character: str) -> str:
     """
@@ -545,8 +644,7 @@ async def summarize_recent_chat(character: str) -> str:
     """
     log_path = f"chat_log/{character.lower().replace(' ', '_')}.jsonl"
     try:
-        with open(log_path, "r") as f:
-            lines = f.readlines()
+        lines = (await read_text(log_path)).splitlines()
     except FileNotFoundError:
         return f"No chat log found for {character}."
 
@@ -601,11 +699,10 @@ async def summarize_scene_log_function(character: str) -> str:
     if not os.path.exists(log_path):
         return f"📖 No scene log exists yet for {character}."
 
-    with open(log_path, "r") as f:
-        try:
-            data = json.load(f)
-        except json.JSONDecodeError:
-            return "Scene log could not be read."
+    try:
+        data = await read_json(log_path)
+    except json.JSONDecodeError:
+        return "Scene log could not be read."
 
     if not data:
         return f"📖 There are no logged scenes for {character}."
@@ -623,31 +720,53 @@ async def summarize_scene_log_function(character: str) -> str:
 import os
 
 async def choose_character() -> str:
-    """Prompt the user to select a character from existing files or create a new one."""
-    characters_dir = "characters"
-    character_files = [
-        f for f in os.listdir(characters_dir)
-        if f.endswith(".json") and not f.startswith("summary_")
-    ]
-    character_names = [os.path.splitext(f)[0].replace("_", " ").title() for f in character_files]
-
-    print("\n🎭 Welcome to White Star. Choose your character:\n")
-    for idx, name in enumerate(character_names, 1):
-        print(f"{idx}. {name}")
-    print(f"{len(character_names) + 1}. Create a new character")
+    """
+    Prompt the user to select a character from the roster or create a new one.
+    
+    The roster is listed most recently played first, a page at a time; typing
+    part of a name filters it.
+    
+    Returns:
+        The chosen character's name, or "__NEW__" to create a new character
+    """
+    roster = get_roster()
+    prefix = None
+    page = 0
+    print("\n🎭 Welcome to White Star. Choose your character:")
 
     while True:
-        try:
-            choice = int(input("\nEnter your choice: "))
-            if 1 <= choice <= len(character_names):
-                selected = character_names[choice - 1]
-                print(f"\n✨ You selected: {selected}")
-                return selected
-            elif choice == len(character_names) + 1:
-                return "__NEW__"
-        except ValueError:
-            pass
-        print("Invalid input. Please choose a valid number.")
+        entries, total = await run_io(roster.list, prefix, page * ROSTER_PAGE_SIZE, ROSTER_PAGE_SIZE)
+        pages = max(1, math.ceil(total / ROSTER_PAGE_SIZE))
+        print()
+        if prefix:
+            print(f"🔎 Names starting with '{prefix}' ({total} found)")
+        for idx, entry in enumerate(entries, 1):
+            last_played = f" · last played {entry['last_played'][:10]}" if entry["last_played"] else ""
+            print(f"{idx}. {entry['name']} — {entry['class']} ({entry['race']}), level {entry['level']}{last_played}")
+        new_choice = len(entries) + 1
+        print(f"{new_choice}. Create a new character")
+        if pages > 1:
+            print(f"\nPage {page + 1}/{pages} — '>' next page, '<' previous page")
+        print("Type part of a name to search, or press Enter to show everyone.")
+
+        choice = input("\nEnter your choice: ").strip()
+        if choice == ">" and page + 1 < pages:
+            page += 1
+        elif choice == "<" and page > 0:
+            page -= 1
+        elif choice.isdigit() and 1 <= int(choice) <= len(entries):
+            selected = entries[int(choice) - 1]
+            await run_io(roster.touch, selected["slug"])
+            print(f"\n✨ You selected: {selected['name']}")
+            return selected["name"]
+        elif choice.isdigit() and int(choice) == new_choice:
+            return "__NEW__"
+        elif choice and not choice.isdigit() and choice not in ("<", ">"):
+            prefix, page = choice, 0
+        elif not choice and prefix:
+            prefix, page = None, 0
+        else:
+            print("Invalid input. Please choose a valid number.")
 
 async def skill_check(character: str, attribute: str, difficulty: int = 14, description: str = None) -> str:
     """
@@ -662,58 +781,131 @@ async def skill_check(character: str, attribute: str, difficulty: int = 14, desc
     Returns:
         A formatted string with the result of the skill check
     """
-    # Load character data to get attribute value
-    char_slug = character.lower().replace(" ", "_")
-    char_path = f"characters/{char_slug}.json"
-    
+    # Load character data to get attribute value (cached; only re-read when the file changes)
     try:
-        with open(char_path, "r") as f:
-            char_data = json.load(f)
+        char_model = await run_io(get_characters().get_character, character)
     except (FileNotFoundError, json.JSONDecodeError):
         return f"Could not find character data for {character}."
     
     # Get the attribute value
     attribute = attribute.lower()
-    valid_attrs = ["strength", "intelligence", "wisdom", "constitution", "dexterity", "charisma"]
-    if attribute not in valid_attrs:
-        return f"Invalid attribute: {attribute}. Must be one of: strength, intelligence, wisdom, constitution, dexterity, charisma."
-    
-    # Get the total attribute value (including racial modifiers)
-    # Handle case-insensitive attribute lookup
-    attr_key = next((key for key in char_data["attributes"] if key.lower() == attribute), None)
-    if not attr_key:
+    if attribute not in VALID_ATTRIBUTES:
+        return f"Invalid attribute: {attribute}. Must be one of: {', '.join(VALID_ATTRIBUTES)}."
+    
+    # Get the attribute modifier (precomputed from the total, including racial modifiers)
+    attr = char_model.attribute(attribute)
+    if not attr:
         return f"Attribute {attribute} not found in character data."
     
-    attr_value = char_data["attributes"][attr_key]["total"]
+    # Roll the die
+    check = roll(1, 20, {attr.name: attr.modifier})
+    result, outcome = _check_outcome(check, difficulty)
+    
+    # Format the output
+    action_desc = f" attempting to {description}" if description else ""
+    return f"🎲 Skill Check: {character}{action_desc} using {attribute.title()}\nRolled {check.natural} + Modifier {check.modifier} = {check.total} (Needs {difficulty})\n{outcome}"
+
+
+def _check_outcome(check: RollResult, difficulty: int) -> tuple:
+    """Return (result, outcome text) for a d20 check; natural 1 and 20 always fail and succeed."""
+    if check.natural == 1:
+        return "critical_failure", "❌ Critical Failure!"
+    if check.natural == 20:
+        return "critical_success", "✅ Critical Success!"
+    if check.total >= difficulty:
+        return "success", "✅ Success!"
+    return "failure", "❌ Failure!"
+
+
+async def _load_party(party: str) -> list:
+    """Return the members of a named party from ephemeral/party_state.json, or None if there is no such party."""
+    try:
+        party_state = await read_json(PARTY_STATE_PATH)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    parties = party_state.get("parties", {})
+    key = next((name for name in parties if name.lower() == party.lower()), None)
+    return parties[key] if key else None
+
+
+def _get_character_models(characters: List[str]) -> tuple:
+    """Load several characters in one pass; returns ({name: Character}, [names not found])."""
+    repository = get_characters()
+    found, missing = {}, []
+    for name in characters:
+        try:
+            found[name] = repository.get_character(name)
+        except (FileNotFoundError, json.JSONDecodeError):
+            missing.append(name)
+    return found, missing
+
+
+async def group_skill_check(attribute: str, characters: List[str] = None, party: str = None, difficulty: int = 14,
+                            mode: str = "each", description: str = None) -> str:
+    """
+    Make the same attribute check for several characters at once, e.g. a party-wide Dexterity save against a trap.
     
-    # Calculate modifier
-    modifier = (attr_value - 10) // 2
+    Args:
+        attribute: The attribute to use (strength, intelligence, wisdom, constitution, dexterity, charisma)
+        characters: The characters making the check
+        party: A party name from ephemeral/party_state.json, used when no characters are given
+        difficulty: The difficulty class (DC) to beat (default: 14 - Average)
+        mode: "each" (everyone's own result), "majority" (the group succeeds if more than half succeed)
+            or "best" (the group succeeds if its best roll succeeds)
+        description: Optional description of what the group is attempting
     
-    # Roll the die
-    roll = random.randint(1, 20)
-    total = roll + modifier
-    
-    # Determine outcome
-    if roll == 1:
-        result = "critical_failure"
-        outcome = "❌ Critical Failure!"
-    elif roll == 20:
-        result = "critical_success"
-        outcome = "✅ Critical Success!"
-    elif total >= difficulty:
-        result = "success"
-        outcome = "✅ Success!"
+    Returns:
+        A formatted string with every character's roll and the combined result
+    """
+    attribute = attribute.lower()
+    if attribute not in VALID_ATTRIBUTES:
+        return f"Invalid attribute: {attribute}. Must be one of: {', '.join(VALID_ATTRIBUTES)}."
+    mode = mode.lower().replace("-", "_")
+    if mode in ("best_of", "best_of_group"):
+        mode = "best"
+    if mode not in GROUP_CHECK_MODES:
+        return f"Invalid mode: {mode}. Must be one of: {', '.join(GROUP_CHECK_MODES)}."
+    
+    if not characters:
+        if not party:
+            return "Name the characters or a party for the group check."
+        characters = await _load_party(party)
+        if not characters:
+            return f"Could not find a party named {party} in {PARTY_STATE_PATH}."
+    
+    # Load every character in one trip to the I/O pool, then roll all the dice together
+    models, missing = await run_io(_get_character_models, list(dict.fromkeys(characters)))
+    if not models:
+        return f"Could not find character data for {', '.join(missing)}."
+    rolls = [roll(1, 20, {attribute.title(): model.modifier(attribute)}) for model in models.values()]
+    
+    lines = []
+    checks = []
+    for name, check in zip(models, rolls):
+        result, outcome = _check_outcome(check, difficulty)
+        checks.append((check.total, result))
+        lines.append(f"- {name}: Rolled {check.natural} + Modifier {check.modifier} = {check.total} {outcome}")
+    for name in missing:
+        lines.append(f"- {name}: ⚠️ Could not find character data")
+    
+    successes = sum(1 for _, result in checks if result in ("success", "critical_success"))
+    if mode == "majority":
+        passed = successes * 2 > len(checks)
+        summary = f"{successes}/{len(checks)} succeeded → {'✅ The group succeeds!' if passed else '❌ The group fails!'}"
+    elif mode == "best":
+        best_total, best_result = max(checks, key=lambda check: (check[1] == "critical_success", check[1] != "critical_failure", check[0]))
+        passed = best_result in ("success", "critical_success")
+        summary = f"Best total {best_total} → {'✅ The group succeeds!' if passed else '❌ The group fails!'}"
     else:
-        result = "failure"
-        outcome = "❌ Failure!"
+        summary = f"{successes}/{len(checks)} succeeded"
     
-    # Format the output
     action_desc = f" attempting to {description}" if description else ""
-    return f"🎲 Skill Check: {character}{action_desc} using {attribute.title()}\nRolled {roll} + Modifier {modifier} = {total} (Needs {difficulty})\n{outcome}"
+    header = f"🎲 Group Skill Check{action_desc} using {attribute.title()} (Needs {difficulty}, mode: {mode})"
+    return "\n".join([header] + lines + [summary])
 
 async def award_xp(character: str, amount: int, reason: str = None) -> str:
     """
-    Award XP to a character and check for level up.
+    Award XP to a character and apply every level it reaches.
     
     Args:
         character: The character's name
@@ -723,103 +915,53 @@ async def award_xp(character: str, amount: int, reason: str = None) -> str:
     Returns:
         A formatted string with the result of the XP award
     """
-    # Load character data
-    char_slug = character.lower().replace(" ", "_")
-    char_path = f"characters/{char_slug}.json"
-    
-    try:
-        with open(char_path, "r") as f:
-            char_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return f"Could not find character data for {character}."
-    
-    # Initialize XP fields if they don't exist
-    if "experience" not in char_data:
-        char_data["experience"] = 0
-    if "level" not in char_data:
-        char_data["level"] = 1
-    
-    # Get character class for advancement table
-    char_class = char_data.get("class", "Unknown")
-    
-    # Load class advancement data
-    advancement_path = f"advancement/{char_class.lower()}_advancement.json"
-    try:
-        with open(advancement_path, "r") as f:
-            advancement_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return f"Could not find advancement data for {char_class}."
-    
-    # Calculate XP bonus if applicable
-    xp_bonus = 0
-    if "xp_bonus" in char_data:
-        bonus_attr = char_data["xp_bonus"].get("attribute", "").lower()
-        if bonus_attr:
-            # Find the attribute in the character data
-            attr_key = next((key for key in char_data["attributes"] if key.lower() == bonus_attr), None)
-            if attr_key:
-                attr_value = char_data["attributes"][attr_key]["total"]
-                # Check thresholds for bonus
-                thresholds = char_data["xp_bonus"].get("thresholds", {})
-                for threshold, bonus_percent in thresholds.items():
-                    min_val, max_val = map(int, threshold.split("-")) if "-" in threshold else (int(threshold.replace("+", "")), 100)
-                    if min_val <= attr_value <= max_val:
-                        bonus_percent_value = int(bonus_percent.replace("%", ""))
-                        xp_bonus = math.floor(amount * (bonus_percent_value / 100))
-                        break
-    
-    # Add XP to character
-    old_xp = char_data["experience"]
-    char_data["experience"] += amount + xp_bonus
-    
-    # Check if level up is needed
-    level_up_occurred = False
-    level_up_message = ""
-    
-    # Find the next level threshold
-    current_level = char_data["level"]
-    next_level_data = next((level for level in advancement_data if level["level"] > current_level), None)
-    
-    if next_level_data and char_data["experience"] >= next_level_data["xp"]:
-        # Level up
-        level_up_result = await level_up(character)
-        level_up_occurred = True
-        level_up_message = f"\n\n{level_up_result}"
-    
-    # Save character data
-    with open(char_path, "w") as f:
-        json.dump(char_data, f, indent=2)
-    
-    # Log XP award
-    log_xp_award(character, amount, xp_bonus, reason)
+    def apply():
+        with character_lock(character):
+            # Load character data
+            try:
+                char_model = get_characters().load_character(character)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return f"Could not find character data for {character}."
+        
+            # Get character class for advancement table
+            char_class = char_model.char_class
+        
+            # Compiled class advancement table (re-read only when the file changes)
+            table = get_advancement_tables().table(char_class)
+            if not table:
+                return f"Could not find advancement data for {char_class}."
+        
+            # Apply the award and every level it reaches, then save once
+            result = apply_xp_award(char_model, amount, table)
+            get_characters().save_character(char_model, character)
+        
+            # Log XP award
+            xp_bonus = result["bonus"]
+            log_xp_award(character, amount, xp_bonus, reason)
+        
+        # Format the output
+        reason_text = f" for {reason}" if reason else ""
+        bonus_text = f" (+{xp_bonus} bonus)" if xp_bonus > 0 else ""
     
-    # Format the output
-    reason_text = f" for {reason}" if reason else ""
-    bonus_text = f" (+{xp_bonus} bonus)" if xp_bonus > 0 else ""
+        level_up_message = "".join(f"\n\n{_format_level_up(character, step)}" for step in result["levels"])
     
-    return f"🌟 {character} gained {amount} XP{bonus_text}{reason_text}! Total XP: {char_data['experience']}{level_up_message}"
+        return f"🌟 {character} gained {amount} XP{bonus_text}{reason_text}! Total XP: {char_model.experience}{level_up_message}"
+
+    # One I/O call for the whole locked section, so the lock is never held while waiting for a worker
+    return await run_io(apply)
+
 
 def log_xp_award(character: str, amount: int, bonus: int = 0, reason: str = None):
-    """Log an XP award to the XP log file."""
-    try:
-        with open(XP_LOG_PATH, "r") as f:
-            xp_log = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        xp_log = []
-    
+    """Log an XP award to the XP log."""
     entry = {
-        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "timestamp": ledger_timestamp(),
         "character": character,
         "amount": amount,
         "bonus": bonus,
         "reason": reason or "Not specified"
     }
     
-    xp_log.append(entry)
-    
-    os.makedirs(os.path.dirname(XP_LOG_PATH), exist_ok=True)
-    with open(XP_LOG_PATH, "w") as f:
-        json.dump(xp_log, f, indent=2)
+    get_store().append_xp(entry)
 
 async def level_up(character: str) -> str:
     """
@@ -831,112 +973,52 @@ async def level_up(character: str) -> str:
     Returns:
         A formatted string with the result of the level up
     """
-    # Load character data
-    char_slug = character.lower().replace(" ", "_")
-    char_path = f"characters/{char_slug}.json"
-    
-    try:
-        with open(char_path, "r") as f:
-            char_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return f"Could not find character data for {character}."
-    
-    # Get character class for advancement table
-    char_class = char_data.get("class", "Unknown")
-    
-    # Load class advancement data
-    advancement_path = f"advancement/{char_class.lower()}_advancement.json"
-    try:
-        with open(advancement_path, "r") as f:
-            advancement_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return f"Could not find advancement data for {char_class}."
-    
-    # Get current level and find next level data
-    current_level = char_data.get("level", 1)
-    next_level = current_level + 1
-    
-    next_level_data = next((level for level in advancement_data if level["level"] == next_level), None)
-    if not next_level_data:
-        return f"No advancement data found for {char_class} level {next_level}."
-    
-    # Update level
-    char_data["level"] = next_level
-    
-    # Update base hit bonus (bhb) and saving throw (st)
-    char_data["bhb"] = next_level_data["bhb"]
-    char_data["st"] = next_level_data["st"]
-    
-    # Roll for HP increase
-    hd = next_level_data["hd"]
-    hp_roll_result = await roll_hp(hd, char_data)
-    hp_increase = int(hp_roll_result.split("→ HP increase: ")[-1].split(" ")[0])
-    
-    # Update HP
-    if "hp" not in char_data:
-        char_data["hp"] = hp_increase
-    else:
-        char_data["hp"] += hp_increase
-    
-    if "max_hp" not in char_data:
-        char_data["max_hp"] = hp_increase
-    else:
-        char_data["max_hp"] += hp_increase
+    def apply():
+        with character_lock(character):
+            # Load character data
+            try:
+                char_model = get_characters().load_character(character)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return f"Could not find character data for {character}."
+        
+            # Get character class for advancement table
+            char_class = char_model.char_class
+        
+            # Compiled class advancement table (re-read only when the file changes)
+            table = get_advancement_tables().table(char_class)
+            if not table:
+                return f"Could not find advancement data for {char_class}."
+        
+            # Get current level and find next level data
+            current_level = char_model.level
+            next_level = current_level + 1
+        
+            next_level_data = table.row(next_level)
+            if not next_level_data:
+                return f"No advancement data found for {char_class} level {next_level}."
+        
+            level_result = apply_level(char_model, next_level_data)
+        
+            # Save character data
+            get_characters().save_character(char_model, character)
     
-    # Check for attribute improvement (every 4 levels)
+        # Format the output
+        return _format_level_up(character, level_result)
+
+    return await run_io(apply)
+
+def _format_level_up(character: str, step: dict) -> str:
+    """Format one level gained (an apply_level() result) for chat."""
+    hp_roll_result = format_hp_roll(step["hp_roll"]) if step["hp_roll"] else "🎲 No HP roll (invalid hit dice)"
     attr_improvement_message = ""
-    if next_level % 4 == 0:
+    if step["attribute_improvement"]:
         attr_improvement_message = "\n\n🔼 You can now improve one attribute by 1 point. Use /improve_attribute to select which attribute to improve."
-    
-    # Save character data
-    with open(char_path, "w") as f:
-        json.dump(char_data, f, indent=2)
-    
-    # Format the output
-    return f"🎉 {character} has reached level {next_level}!\n\n{hp_roll_result}\n\nBase Hit Bonus: {char_data['bhb']}\nSaving Throw: {char_data['st']}{attr_improvement_message}"
+    return f"🎉 {character} has reached level {step['level']}!\n\n{hp_roll_result}\n\nBase Hit Bonus: {step['bhb']}\nSaving Throw: {step['st']}{attr_improvement_message}"
 
-async def roll_hp(hd: str, char_data: dict) -> str:
-    """
-    Roll for HP increase based on hit dice and Constitution modifier.
-    
-    Args:
-        hd: The hit dice string (e.g., "1+1", "2", "3+2")
-        char_data: The character data dictionary
-    
-    Returns:
-        A formatted string with the result of the HP roll
-    """
-    # Parse hit dice
-    match = re.match(r"(\d+)(?:\+(\d+))?", hd)
-    if not match:
-        return f"Invalid hit dice format: {hd}"
-    
-    base_dice = int(match.group(1))
-    bonus = int(match.group(2) or 0)
-    
-    # Get Constitution modifier
-    con_key = next((key for key in char_data["attributes"] if key.lower() == "constitution"), None)
-    con_mod = 0
-    if con_key:
-        con_value = char_data["attributes"][con_key]["total"]
-        con_mod = (con_value - 10) // 2
-    
-    # Roll for HP (1d6 per hit dice)
-    rolls = [random.randint(1, 6) for _ in range(base_dice)]
-    hp_increase = sum(rolls) + bonus + con_mod
-    
-    # Ensure minimum of 1 HP per level
-    hp_increase = max(1, hp_increase)
-    
-    # Format the output
-    con_mod_str = f" {con_mod:+}" if con_mod != 0 else ""
-    bonus_str = f" {bonus:+}" if bonus != 0 else ""
-    
-    return f"🎲 Rolling for HP: {rolls}{bonus_str}{con_mod_str} → HP increase: {hp_increase}"
 
 async def show_xp(character: str) -> str:
     """
-    Show current XP and progress to next level.
+    Show current XP, progress to next level and lifetime XP history.
     
     Args:
         character: The character's name
@@ -945,41 +1027,37 @@ async def show_xp(character: str) -> str:
         A formatted string with the character's XP information
     """
     # Load character data
-    char_slug = character.lower().replace(" ", "_")
-    char_path = f"characters/{char_slug}.json"
-    
     try:
-        with open(char_path, "r") as f:
-            char_data = json.load(f)
+        char_model = await run_io(get_characters().get_character, character)
     except (FileNotFoundError, json.JSONDecodeError):
         return f"Could not find character data for {character}."
     
     # Get character class for advancement table
-    char_class = char_data.get("class", "Unknown")
+    char_class = char_model.char_class
     
-    # Load class advancement data
-    advancement_path = f"advancement/{char_class.lower()}_advancement.json"
-    try:
-        with open(advancement_path, "r") as f:
-            advancement_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+    # Compiled class advancement table (re-read only when the file changes)
+    table = await run_io(get_advancement_tables().table, char_class)
+    if not table:
         return f"Could not find advancement data for {char_class}."
     
     # Get current level and XP
-    current_level = char_data.get("level", 1)
-    current_xp = char_data.get("experience", 0)
+    current_level = char_model.level
+    current_xp = char_model.experience
+
+    # Lifetime history comes from the XP log's running totals, not the log itself
+    history = _format_xp_history(await run_io(get_store().xp_summary, character))
     
     # Find next level threshold
-    next_level_data = next((level for level in advancement_data if level["level"] > current_level), None)
+    next_level_data = table.next_level(current_level)
     
     if not next_level_data:
-        return f"{character} is at maximum level ({current_level}) with {current_xp} XP."
+        return f"{character} is at maximum level ({current_level}) with {current_xp} XP.{history}"
     
     next_level_xp = next_level_data["xp"]
     next_level = next_level_data["level"]
     
     # Find previous level threshold for progress calculation
-    prev_level_data = next((level for level in advancement_data if level["level"] == current_level), None)
+    prev_level_data = table.row(current_level)
     prev_level_xp = prev_level_data["xp"] if prev_level_data else 0
     
     # Calculate progress
@@ -998,7 +1076,26 @@ Level: {current_level}
 XP: {current_xp} / {next_level_xp} (Level {next_level})
 Progress: {progress_percent}%
 [{bar}]
-XP needed for next level: {next_level_xp - current_xp}"""
+XP needed for next level: {next_level_xp - current_xp}{history}"""
+
+def _format_xp_history(summary: dict, top: int = 5) -> str:
+    """Describe lifetime XP totals from the store's XP summary (empty if there are none)."""
+    if not summary:
+        return ""
+    totals = summary["totals"]
+    since = f" since {totals['first_award'][:10]}" if totals.get("first_award") else ""
+    lines = [
+        "",
+        "",
+        "📜 **XP History**",
+        f"Lifetime XP awarded: {totals['xp']} (including {totals['bonus_xp']} bonus) from {totals['awards']} award{'s' if totals['awards'] != 1 else ''}{since}",
+    ]
+    reasons = sorted(summary["by_reason"].items(), key=lambda item: item[1]["xp"], reverse=True)
+    for reason, reason_totals in reasons[:top]:
+        lines.append(f"- {reason}: {reason_totals['xp']} XP ({reason_totals['awards']} award{'s' if reason_totals['awards'] != 1 else ''})")
+    if len(reasons) > top:
+        lines.append(f"- ...and {len(reasons) - top} other reasons")
+    return "\n".join(lines)
 
 async def improve_attribute(character: str, attribute: str) -> str:
     """
@@ -1011,62 +1108,46 @@ async def improve_attribute(character: str, attribute: str) -> str:
     Returns:
         A formatted string with the result of the attribute improvement
     """
-    # Load character data
-    char_slug = character.lower().replace(" ", "_")
-    char_path = f"characters/{char_slug}.json"
+    def apply():
+        with character_lock(character):
+            # Load character data
+            try:
+                char_model = get_characters().load_character(character)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return f"Could not find character data for {character}."
     
-    try:
-        with open(char_path, "r") as f:
-            char_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return f"Could not find character data for {character}."
+            # Check if character is eligible for attribute improvement
+            current_level = char_model.level
+            if current_level % 4 != 0:
+                return f"{character} is not eligible for attribute improvement at level {current_level}. Attribute improvements are available at levels 4, 8, 12, etc."
     
-    # Check if character is eligible for attribute improvement
-    current_level = char_data.get("level", 1)
-    if current_level % 4 != 0:
-        return f"{character} is not eligible for attribute improvement at level {current_level}. Attribute improvements are available at levels 4, 8, 12, etc."
+            # Check if attribute improvement has already been used
+            if char_model.extra.get("attribute_improvement_used", False):
+                return f"{character} has already used their attribute improvement for level {current_level}."
     
-    # Check if attribute improvement has already been used
-    if char_data.get("attribute_improvement_used", False):
-        return f"{character} has already used their attribute improvement for level {current_level}."
+            # Validate attribute
+            attribute_name = attribute.lower()
+            valid_attrs = ["strength", "intelligence", "wisdom", "constitution", "dexterity", "charisma"]
+            if attribute_name not in valid_attrs:
+                return f"Invalid attribute: {attribute_name}. Must be one of: strength, intelligence, wisdom, constitution, dexterity, charisma."
     
-    # Validate attribute
-    attribute = attribute.lower()
-    valid_attrs = ["strength", "intelligence", "wisdom", "constitution", "dexterity", "charisma"]
-    if attribute not in valid_attrs:
-        return f"Invalid attribute: {attribute}. Must be one of: strength, intelligence, wisdom, constitution, dexterity, charisma."
+            attr = char_model.attribute(attribute_name)
+            if not attr:
+                return f"Attribute {attribute_name} not found in character data."
     
-    # Find the attribute in the character data (case-insensitive)
-    attr_key = next((key for key in char_data["attributes"] if key.lower() == attribute), None)
-    if not attr_key:
-        return f"Attribute {attribute} not found in character data."
+            # Add or increment level_mod and update the total and modifier
+            attr.improve(1)
     
-    # Add or increment level_mod
-    if "level_mod" not in char_data["attributes"][attr_key]:
-        char_data["attributes"][attr_key]["level_mod"] = 1
-    else:
-        char_data["attributes"][attr_key]["level_mod"] += 1
-    
-    # Update total
-    char_data["attributes"][attr_key]["total"] = (
-        char_data["attributes"][attr_key]["base"] + 
-        char_data["attributes"][attr_key]["race_mod"] + 
-        char_data["attributes"][attr_key]["level_mod"]
-    )
-    
-    # Mark attribute improvement as used
-    char_data["attribute_improvement_used"] = True
+            # Mark attribute improvement as used
+            char_model.extra["attribute_improvement_used"] = True
     
-    # Save character data
-    with open(char_path, "w") as f:
-        json.dump(char_data, f, indent=2)
+            # Save character data
+            get_characters().save_character(char_model, character)
     
-    # Format the output
-    new_value = char_data["attributes"][attr_key]["total"]
-    new_modifier = (new_value - 10) // 2
-    modifier_str = f"{new_modifier:+}"
-    
-    return f"🔼 {character}'s {attr_key} has been improved to {new_value} (modifier: {modifier_str})."
+        # Format the output
+        return f"🔼 {character}'s {attr.name} has been improved to {attr.total} (modifier: {attr.modifier:+})."
+
+    return await run_io(apply)
 
 async def show_advancement(character: str) -> str:
     """
@@ -1079,29 +1160,22 @@ async def show_advancement(character: str) -> str:
         A formatted string with the character's class advancement table
     """
     # Load character data
-    char_slug = character.lower().replace(" ", "_")
-    char_path = f"characters/{char_slug}.json"
-    
     try:
-        with open(char_path, "r") as f:
-            char_data = json.load(f)
+        char_model = await run_io(get_characters().get_character, character)
     except (FileNotFoundError, json.JSONDecodeError):
         return f"Could not find character data for {character}."
     
     # Get character class for advancement table
-    char_class = char_data.get("class", "Unknown")
+    char_class = char_model.char_class
     
-    # Load class advancement data
-    advancement_path = f"advancement/{char_class.lower()}_advancement.json"
-    try:
-        with open(advancement_path, "r") as f:
-            advancement_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+    # Compiled class advancement table (re-read only when the file changes)
+    table = await run_io(get_advancement_tables().table, char_class)
+    if not table:
         return f"Could not find advancement data for {char_class}."
     
     # Get current level and XP
-    current_level = char_data.get("level", 1)
-    current_xp = char_data.get("experience", 0)
+    current_level = char_model.level
+    current_xp = char_model.experience
     
     # Format the output
     lines = [f"📈 **Advancement Table for {char_class}**"]
@@ -1109,7 +1183,7 @@ async def show_advancement(character: str) -> str:
     lines.append("Level | XP      | HD    | BHB   | ST")
     lines.append("------|---------|-------|-------|----")
     
-    for level in advancement_data:
+    for level in table.rows():
         # Highlight current level
         prefix = "➤ " if level["level"] == current_level else "  "
         lines.append(f"{prefix}{level['level']:<5} | {level['xp']:<7} | {level['hd']:<5} | {level['bhb']:<5} | {level['st']}")
@@ -1119,14 +1193,41 @@ async def show_advancement(character: str) -> str:
     lines.append(f"Current XP: {current_xp}")
     
     # Find next level threshold
-    next_level_data = next((level for level in advancement_data if level["level"] > current_level), None)
+    next_level_data = table.next_level(current_level)
     if next_level_data:
         lines.append(f"XP needed for next level: {next_level_data['xp'] - current_xp}")
     else:
         lines.append("Maximum level reached!")
     
+    # Meditations (Star Knights, Void Knights) or gifts (Alien Mystics), if the class has them
+    for kind in SLOT_KINDS:
+        slot_table = await run_io(get_advancement_tables().slots, char_class, kind)
+        if slot_table:
+            slots = slot_table.slots(current_level)
+            lines.append(f"{kind.title()}s by rank: " + ", ".join(f"{rank}: {count}" for rank, count in slots.items()))
+    
     return "\n".join(lines)
 
+
+async def show_card(character: str) -> str:
+    """
+    Show a character's summary card: stats, attributes, abilities, inventory and credits.
+    
+    Args:
+        character: The character's name
+    
+    Returns:
+        The character's pre-rendered summary card
+    """
+    def read():
+        with character_lock(character):
+            return get_summary_cards().card(character)
+
+    card = await run_io(read)
+    if card is None:
+        return f"Could not find character data for {character}."
+    return f"🪪 Summary Card\n\n{card}"
+
 async def help_command(command: str = "") -> str:
     """
     Display a list of all available commands or detailed help for a specific command.
@@ -1141,23 +1242,28 @@ async def help_command(command: str = "") -> str:
     commands = {
         "add_inventory": "Add an item to a character's inventory",
         "remove_inventory": "Remove an item from a character's inventory",
+        "apply_inventory_changes": "Add and remove several items at once (e.g. loot)",
         "show_inventory": "Display a character's current inventory",
         "add_credits": "Add credits to a character's balance",
         "spend_credits": "Spend credits from a character's balance",
         "show_credits": "Show a character's current credit balance",
         "buy_item": "Purchase an item using credits",
+        "search_equipment": "Search the equipment catalog for ranked matches with prices",
         "transfer_credits": "Transfer credits between characters",
-        "show_ledger": "View transaction history",
+        "show_ledger": "View transaction history (paged, with optional date range)",
+        "query_ledger": "Search transactions by character, type, item and date range, with totals",
         "roll_dice": "Roll dice using standard RPG notation",
         "start_scenario": "Generate a new adventure scenario",
         "log_scene": "Record an important scene for future reference",
         "summarize_recent_chat": "Get a summary of recent gameplay",
         "summarize_scene_log": "Review all recorded scenes",
         "skill_check": "Perform an attribute check against a difficulty",
+        "group_skill_check": "Make the same attribute check for several characters or a whole party",
         "award_xp": "Give experience points to a character",
         "show_xp": "Display current XP and progress to next level",
         "improve_attribute": "Increase an attribute by 1 point",
         "show_advancement": "View the advancement table for a character's class",
+        "show_card": "Show a character's summary card (stats, gear and credits)",
         "help": "Display this help information",
         "quit": "Save progress and exit the game"
     }
@@ -1272,28 +1378,36 @@ async def quit_game(character: str) -> str:
         "Session End",
         f"End of gaming session for {character}. Their story continues another time..."
     )
+
+    # Write any cached state changes before the session ends
+    await run_io(get_store().flush)
     
     return f"🌟 Saving progress for {character}...\n👋 Until our next adventure! May the stars guide your path."
 
 # ✅ Simpler wrapping for current AIFunction version
 add_inventory = AIFunction(add_inventory)
 remove_inventory = AIFunction(remove_inventory)
+apply_inventory_changes = AIFunction(apply_inventory_changes)
 show_inventory = AIFunction(show_inventory)
 add_credits = AIFunction(add_credits)
 spend_credits = AIFunction(spend_credits)
 show_credits = AIFunction(show_credits)
 buy_item = AIFunction(buy_item)
+search_equipment = AIFunction(search_equipment)
 transfer_credits = AIFunction(transfer_credits)
 show_ledger = AIFunction(show_ledger)
+query_ledger = AIFunction(query_ledger)
 roll_dice = AIFunction(roll_dice)
 start_scenario = AIFunction(start_scenario)
 log_scene = AIFunction(log_scene)
 summarize_recent_chat = AIFunction(summarize_recent_chat)
 summarize_scene_log = AIFunction(summarize_scene_log_function)
 skill_check = AIFunction(skill_check)
+group_skill_check = AIFunction(group_skill_check)
 award_xp = AIFunction(award_xp)
 show_xp = AIFunction(show_xp)
 improve_attribute = AIFunction(improve_attribute)
 show_advancement = AIFunction(show_advancement)
+show_card = AIFunction(show_card)
 help_command = AIFunction(help_command)
 quit_game = AIFunction(quit_game)
@@ -0,0 +1,136 @@
+"""
+Class XP bonus rules compiled into sorted numeric intervals.
+
+A class's xp_bonus (copied into each character file) names a prime
+attribute and the bonus for score ranges:
+
+    {"attribute": "dexterity", "thresholds": {"13-14": "5%", "15+": "10%"}}
+
+compile_xp_bonus() turns that into parallel lists of interval starts, ends
+and percentages once, when the character is loaded, so an award only does
+a bisect. The thresholds mean what they always did: "15+", "+15" and a bare
+"15" run up to a score of 100, and where ranges overlap the one listed
+first applies. Malformed and overlapping thresholds are logged as
+warnings once, when a block is first compiled, rather than raising in the
+middle of an award; malformed ones are skipped.
+"""
+import logging
+import math
+from bisect import bisect_right
+from functools import lru_cache
+
+# Configuration
+OPEN_ENDED_MAX = 100  # Upper bound of "15+", "+15" and "15" style thresholds
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_range(threshold: str) -> tuple:
+    """Parse "13-14" into (13, 14) and "15+", "+15" or "15" into (15, OPEN_ENDED_MAX); raises ValueError."""
+    text = threshold.strip().replace(" ", "")
+    if "-" in text:
+        low, high = text.split("-", 1)
+        low, high = int(low), int(high)
+        if low > high:
+            raise ValueError("range is reversed")
+        return low, high
+    return int(text.strip("+")), OPEN_ENDED_MAX
+
+
+def _parse_percent(bonus: str) -> int:
+    """Parse "10%", "+10%" or "10" into 10; raises ValueError."""
+    return int(bonus.strip().lstrip("+").rstrip("%"))
+
+
+class XpBonusRule:
+    """The XP bonus percentage for each score interval of one prime attribute."""
+
+    __slots__ = ("attribute", "starts", "ends", "percents", "errors")
+
+    def __init__(self, attribute: str = "", intervals: list = (), errors: list = ()):
+        """
+        Args:
+            attribute: The prime attribute (lowercase), or "" for no bonus
+            intervals: (low, high, percent) tuples that do not overlap
+            errors: Problems found while compiling, one message each
+        """
+        intervals = sorted(intervals)
+        self.attribute = attribute
+        self.starts = [low for low, _, _ in intervals]
+        self.ends = [high for _, high, _ in intervals]
+        self.percents = [percent for _, _, percent in intervals]
+        self.errors = list(errors)
+
+    def percent_for(self, score: int) -> int:
+        """Return the bonus percentage for an attribute score (0 outside every interval)."""
+        index = bisect_right(self.starts, score) - 1
+        if index >= 0 and score <= self.ends[index]:
+            return self.percents[index]
+        return 0
+
+    def bonus(self, amount: int, score: int) -> int:
+        """Return the bonus XP on an award for a character with this attribute score."""
+        percent = self.percent_for(score)
+        return math.floor(amount * (percent / 100)) if percent else 0
+
+
+NO_XP_BONUS = XpBonusRule()
+
+
+def _uncovered(low: int, high: int, covered: list) -> list:
+    """Return the parts of [low, high] outside every (low, high, percent) interval in covered."""
+    pieces = [(low, high)]
+    for covered_low, covered_high, _ in covered:
+        remaining = []
+        for piece_low, piece_high in pieces:
+            if piece_low < covered_low:
+                remaining.append((piece_low, min(piece_high, covered_low - 1)))
+            if piece_high > covered_high:
+                remaining.append((max(piece_low, covered_high + 1), piece_high))
+        pieces = remaining
+    return pieces
+
+
+@lru_cache(maxsize=64)
+def _compile(attribute: str, thresholds: tuple) -> XpBonusRule:
+    intervals, errors = [], []
+    for threshold, bonus in thresholds:
+        try:
+            low, high = _parse_range(threshold)
+            percent = _parse_percent(bonus)
+        except ValueError:
+            errors.append(f"malformed XP bonus threshold {threshold!r}: {bonus!r} (ignored)")
+            continue
+        # In file order, so where thresholds overlap the one listed first applies
+        pieces = _uncovered(low, high, intervals)
+        if pieces != [(low, high)]:
+            errors.append(f"XP bonus threshold {threshold!r} overlaps an earlier one (the earlier one applies)")
+        intervals += [(piece_low, piece_high, percent) for piece_low, piece_high in pieces]
+    # Compiled once per distinct block, so each problem is reported once
+    for error in errors:
+        logger.warning("%s (prime attribute: %s)", error, attribute)
+    return XpBonusRule(attribute, intervals, errors)
+
+
+def compile_xp_bonus(xp_bonus: dict) -> XpBonusRule:
+    """
+    Compile an xp_bonus block; identical blocks are compiled once and shared.
+
+    Malformed thresholds are left out of the rule. Malformed and
+    overlapping thresholds are logged as warnings and kept in the rule's
+    errors.
+
+    Args:
+        xp_bonus: {"attribute": ..., "thresholds": {"13-14": "5%", ...}}
+
+    Returns:
+        The compiled XpBonusRule (NO_XP_BONUS if there is no usable bonus)
+    """
+    if not xp_bonus or not isinstance(xp_bonus, dict):
+        return NO_XP_BONUS
+    attribute = str(xp_bonus.get("attribute") or "").strip().lower()
+    thresholds = xp_bonus.get("thresholds") or {}
+    if not attribute or attribute == "none" or not isinstance(thresholds, dict):
+        return NO_XP_BONUS
+
+    return _compile(attribute, tuple((str(threshold), str(bonus)) for threshold, bonus in thresholds.items()))
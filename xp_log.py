@@ -0,0 +1,191 @@
+"""
+Append-only XP award log with running per-character totals.
+
+Every award is one line in ephemeral/xp_log.jsonl; nothing is ever
+rewritten. ephemeral/xp_summary.json holds the totals materialized from
+those lines (XP, bonus XP and award counts per character and per reason)
+and is updated as each award is appended, so questions like "how much XP
+has Zara earned from combat" never read the log. The summary remembers how
+many bytes of the log it covers; if it is missing or behind (e.g. after a
+crash between the two writes) the missing tail is folded in on load.
+"""
+import json
+import os
+import threading
+
+from journal import fsync_directory, fsync_file
+
+# Configuration
+XP_LOG_FILENAME = "xp_log.jsonl"
+XP_SUMMARY_FILENAME = "xp_summary.json"
+
+
+def _slug(character: str) -> str:
+    # Same slug as characters/<slug>.json, so "zara vex" and "Zara Vex" share totals
+    return character.lower().replace(" ", "_")
+
+
+def new_xp_totals() -> dict:
+    """Return empty totals: XP (bonus included), bonus XP, award count and award dates."""
+    return {"xp": 0, "bonus_xp": 0, "awards": 0, "first_award": None, "last_award": None}
+
+
+def add_to_xp_totals(totals: dict, entry: dict):
+    """Fold one XP log entry into a totals dict from new_xp_totals()."""
+    amount = entry.get("amount", 0) or 0
+    bonus = entry.get("bonus", 0) or 0
+    timestamp = entry.get("timestamp")
+    totals["xp"] += amount + bonus
+    totals["bonus_xp"] += bonus
+    totals["awards"] += 1
+    if timestamp:
+        if not totals["first_award"] or timestamp < totals["first_award"]:
+            totals["first_award"] = timestamp
+        if not totals["last_award"] or timestamp > totals["last_award"]:
+            totals["last_award"] = timestamp
+
+
+def merge_xp_totals(totals: dict, other: dict):
+    """Add one totals dict into another."""
+    for key in ("xp", "bonus_xp", "awards"):
+        totals[key] += other[key]
+    if other["first_award"] and (not totals["first_award"] or other["first_award"] < totals["first_award"]):
+        totals["first_award"] = other["first_award"]
+    if other["last_award"] and (not totals["last_award"] or other["last_award"] > totals["last_award"]):
+        totals["last_award"] = other["last_award"]
+
+
+def add_to_xp_summary(characters: dict, entry: dict):
+    """
+    Fold one XP log entry into a per-character summary.
+
+    Args:
+        characters: {slug: {"character", "totals", "by_reason"}}, updated in place
+        entry: An XP log entry (character, amount, bonus, reason, timestamp)
+    """
+    name = entry.get("character") or "Unknown"
+    summary = characters.setdefault(_slug(name), {"character": name, "totals": new_xp_totals(), "by_reason": {}})
+    summary["character"] = name
+    add_to_xp_totals(summary["totals"], entry)
+    reason = entry.get("reason") or "Not specified"
+    add_to_xp_totals(summary["by_reason"].setdefault(reason, new_xp_totals()), entry)
+
+
+class XpLog:
+    """The append-only XP log and its materialized summary."""
+
+    def __init__(self, directory: str):
+        self.log_path = os.path.join(directory, XP_LOG_FILENAME)
+        self.summary_path = os.path.join(directory, XP_SUMMARY_FILENAME)
+        self._lock = threading.RLock()
+        self._summary = None
+        self._unsynced = False
+
+    def _load(self):
+        """Read the summary once and fold in any log lines it does not cover yet."""
+        if self._summary is not None:
+            return
+        try:
+            with open(self.summary_path, "r") as f:
+                summary = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            summary = None
+        if not summary or "log_bytes" not in summary:
+            summary = {"entries": 0, "log_bytes": 0, "characters": {}}
+        self._summary = summary
+        self._catch_up(repair=False)
+
+    def refresh(self, repair: bool = False):
+        """
+        Fold in awards appended by another process since the last look.
+
+        Args:
+            repair: Cut off a torn final line and save the caught-up summary.
+                Only safe while holding the store lock, since another
+                process may be halfway through an append.
+        """
+        with self._lock:
+            self._load()
+            self._catch_up(repair)
+
+    def _catch_up(self, repair):
+        summary = self._summary
+        log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        if log_size < summary["log_bytes"]:
+            # The log was replaced underneath the summary; start over
+            summary = self._summary = {"entries": 0, "log_bytes": 0, "characters": {}}
+        covered = summary["log_bytes"]
+        if log_size > covered:
+            with open(self.log_path, "rb") as f:
+                f.seek(covered)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break  # Not fully written yet (or torn by a crash)
+                    summary["log_bytes"] += len(raw)
+                    try:
+                        entry = json.loads(raw)
+                    except json.JSONDecodeError:
+                        continue
+                    summary["entries"] += 1
+                    add_to_xp_summary(summary["characters"], entry)
+        if repair:
+            if summary["log_bytes"] < log_size:
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(summary["log_bytes"])
+            if summary["log_bytes"] != covered:
+                self._save_summary()
+
+    def _save_summary(self):
+        os.makedirs(os.path.dirname(self.summary_path) or ".", exist_ok=True)
+        temp_path = f"{self.summary_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._summary, f, indent=2)
+        os.replace(temp_path, self.summary_path)
+
+    def append(self, entry: dict):
+        """Append one award to the log and update the summary."""
+        with self._lock:
+            self._load()
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            line = (json.dumps(entry) + "\n").encode("utf-8")
+            with open(self.log_path, "ab") as f:
+                f.write(line)
+            self._unsynced = True
+            self._summary["entries"] += 1
+            self._summary["log_bytes"] += len(line)
+            add_to_xp_summary(self._summary["characters"], entry)
+            self._save_summary()
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def sync(self):
+        """fsync the log if awards were appended since the last call (the summary is rebuilt if lost)."""
+        with self._lock:
+            if self._unsynced:
+                fsync_file(self.log_path)
+                fsync_directory(os.path.dirname(self.log_path))
+                self._unsynced = False
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return self._summary["entries"]
+
+    def read_all(self) -> list:
+        """Return every award in append order."""
+        with self._lock:
+            self._load()
+            try:
+                with open(self.log_path, "r") as f:
+                    return [json.loads(line) for line in f if line.strip()]
+            except FileNotFoundError:
+                return []
+
+    def summary(self, character: str) -> dict:
+        """Return a character's {"character", "totals", "by_reason"} summary, or None."""
+        with self._lock:
+            self._load()
+            found = self._summary["characters"].get(_slug(character))
+            return json.loads(json.dumps(found)) if found else None
@@ -0,0 +1,138 @@
+"""
+XP awards and level advancement, applied to a character held in memory.
+
+apply_xp_award() adds an award (plus the class XP bonus) and walks every
+level threshold it crosses in one pass, rolling HP for each new level, so a
+large award never needs repeated calls or repeated saves. The caller loads
+the character once, applies the award and saves once:
+
+    character = characters.load_character("Zara Vex")
+    result = apply_xp_award(character, 5000, get_advancement_tables().table(character.char_class))
+    characters.save_character(character)
+    for step in result["levels"]:
+        print(step["level"], step["hp_increase"])
+"""
+import re
+
+from advancement_tables import AdvancementTable
+from character_model import Character
+from dice import RollResult, roll
+
+# Configuration
+ATTRIBUTE_IMPROVEMENT_EVERY = 4  # Levels between attribute improvements
+
+
+def calculate_xp_bonus(character: Character, amount: int) -> int:
+    """
+    Return the bonus XP a character earns on an award from their class XP bonus.
+
+    Args:
+        character: The character
+        amount: The base XP awarded
+
+    Returns:
+        The bonus XP (0 if the character has no applicable bonus)
+    """
+    rule = character.xp_bonus_rule
+    attribute = character.attribute(rule.attribute) if rule.attribute else None
+    if not attribute:
+        return 0
+    return rule.bonus(amount, attribute.total)
+
+
+def roll_hit_points(hd: str, character: Character) -> RollResult:
+    """
+    Roll the HP gained for a level: 1d6 per hit die, plus the hit dice bonus and Constitution modifier.
+
+    Args:
+        hd: The hit dice string (e.g., "1+1", "2", "3+2")
+        character: The character
+
+    Returns:
+        The roll, with "bonus" and "constitution" modifiers and a total of at
+        least 1 (the HP gained), or None if hd is not a hit dice string
+    """
+    match = re.match(r"(\d+)(?:\+(\d+))?", hd)
+    if not match:
+        return None
+
+    modifiers = {"bonus": int(match.group(2) or 0), "constitution": character.modifier("constitution")}
+    # Ensure minimum of 1 HP per level
+    return roll(int(match.group(1)), 6, modifiers, minimum=1)
+
+
+def format_hp_roll(hp_roll: RollResult) -> str:
+    """Format a roll_hit_points() result the way level-up messages show it."""
+    con_mod_str = f" {hp_roll.modifiers['constitution']:+}" if hp_roll.modifiers["constitution"] != 0 else ""
+    bonus_str = f" {hp_roll.modifiers['bonus']:+}" if hp_roll.modifiers["bonus"] != 0 else ""
+    return f"🎲 Rolling for HP: {hp_roll.rolls}{bonus_str}{con_mod_str} → HP increase: {hp_roll.total}"
+
+
+def apply_level(character: Character, level_data: dict) -> dict:
+    """
+    Advance a character to the level described by one advancement table row.
+
+    Updates level, base hit bonus, saving throw, HP and max HP in place.
+
+    Args:
+        character: The character, updated in place
+        level_data: The advancement row for the new level (level, hd, bhb, st)
+
+    Returns:
+        {"level", "hp_roll", "hp_increase", "bhb", "st", "attribute_improvement"}
+    """
+    character.level = level_data["level"]
+    character.bhb = level_data["bhb"]
+    character.st = level_data["st"]
+
+    hp_roll = roll_hit_points(str(level_data["hd"]), character)
+    hp_increase = hp_roll.total if hp_roll else 0
+    character.hp += hp_increase
+    character.max_hp += hp_increase
+
+    return {
+        "level": level_data["level"],
+        "hp_roll": hp_roll,
+        "hp_increase": hp_increase,
+        "bhb": level_data["bhb"],
+        "st": level_data["st"],
+        "attribute_improvement": level_data["level"] % ATTRIBUTE_IMPROVEMENT_EVERY == 0,
+    }
+
+
+def apply_xp_award(character: Character, amount: int, table: AdvancementTable) -> dict:
+    """
+    Apply an XP award and every level it earns to a character in memory.
+
+    Args:
+        character: The character, updated in place
+        amount: The base XP awarded
+        table: The character's class advancement table
+
+    Returns:
+        {"amount", "bonus", "old_xp", "experience", "old_level", "level",
+        "levels": [apply_level() result per level gained, lowest first],
+        "next_level_xp": XP needed for the following level, or None at the top of the table}
+    """
+    bonus = calculate_xp_bonus(character, amount)
+    old_xp = character.experience
+    old_level = character.level
+    character.experience += amount + bonus
+
+    levels = []
+    target_level = table.level_for_xp(character.experience)
+    next_level_data = table.next_level(character.level)
+    while next_level_data and next_level_data["level"] <= target_level:
+        levels.append(apply_level(character, next_level_data))
+        next_level_data = table.next_level(character.level)
+
+    return {
+        "amount": amount,
+        "bonus": bonus,
+        "old_xp": old_xp,
+        "experience": character.experience,
+        "old_level": old_level,
+        "level": character.level,
+        "levels": levels,
+        "next_level_xp": next_level_data["xp"] if next_level_data else None,
+    }